@@ -0,0 +1,149 @@
+"""
+Compare the duplicate-detection quality of embedding backends on the tests of logged runs.
+
+Two tests of a run count as duplicates if they cover exactly the same lines of the code under test. For every
+backend, all tests of a run are embedded and the cosine similarity of every pair is scored against these labels:
+ROC AUC over all pairs and the hit rate of the nearest neighbor of tests that have a duplicate. Embedding time per
+test is reported as well. Remote backends are skipped if their API key is missing.
+
+Usage (from the project root):
+    python benchmarks/embedding_quality.py --runs runs --backends local openai jina fake
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from config import APIConfig  # noqa: E402
+from core.backends import create_embedding_model  # noqa: E402
+from utils.code_processing import extract_unit_tests  # noqa: E402
+from utils.metrics import compute_test_coverage, get_covered_lines  # noqa: E402
+
+
+def load_runs(runs_dir: Path, min_tests: int) -> List[dict[str, Any]]:
+    """Load the code and extracted tests of every logged run with enough tests"""
+    runs = []
+    for run_data_file in sorted(runs_dir.glob("*/run_data.json")):
+        run_data = json.loads(run_data_file.read_text())
+        tests = extract_unit_tests(run_data.get("combined_test_script") or "")
+        if len(tests) >= min_tests:
+            runs.append({"run": run_data_file.parent.name, "code_to_test": run_data["code_to_test"], "tests": tests})
+    return runs
+
+
+def duplicate_labels(code_to_test: str, tests: List[str]) -> np.ndarray:
+    """Matrix of test pairs covering exactly the same (non-empty) set of lines"""
+    _, raw_results = compute_test_coverage(code_to_test, tests)
+    covered = [frozenset(get_covered_lines(raw_results, i)) for i in range(len(tests))]
+    return np.array([[bool(a) and a == b for b in covered] for a in covered])
+
+
+def roc_auc(scores: np.ndarray, labels: np.ndarray) -> Optional[float]:
+    """ROC AUC of scores for binary labels (Mann-Whitney U with average ranks for ties)"""
+    positives, negatives = labels.sum(), (~labels).sum()
+    if not positives or not negatives:
+        return None
+    order = scores.argsort(kind="mergesort")
+    _, first, counts = np.unique(scores[order], return_index=True, return_counts=True)
+    ranks = np.empty(len(scores))
+    ranks[order] = np.repeat(first + (counts + 1) / 2, counts)
+    return float((ranks[labels].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def evaluate(embeddings: np.ndarray, labels: np.ndarray) -> dict[str, Any]:
+    """Score the cosine similarities of all test pairs against the duplicate labels"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.where(norms > 0, norms, 1)
+    similarities = normalized @ normalized.T
+    pairs = np.triu_indices(len(labels), k=1)
+
+    np.fill_diagonal(similarities, -np.inf)
+    nearest = similarities.argmax(axis=1)
+    with_duplicate = labels.sum(axis=1) > 1  # the diagonal counts as a duplicate
+    hits = labels[np.arange(len(labels)), nearest][with_duplicate]
+    return {
+        "duplicate_pairs": int(labels[pairs].sum()),
+        "roc_auc": roc_auc(similarities[pairs], labels[pairs]),
+        "nearest_neighbor_hit_rate": float(hits.mean()) if len(hits) else None,
+    }
+
+
+def build_settings(backend: str) -> dict[str, Any]:
+    """Build settings selecting an embedding backend"""
+    api_config = APIConfig.from_env()
+    return {
+        "llm": {"model_name": "gpt-4o-mini", "embedding_backend": backend},
+        "api": {
+            "openai_api_key": api_config.openai_api_key.get_secret_value(),
+            "groq_api_key": api_config.groq_api_key.get_secret_value(),
+            "jina_api_key": api_config.jina_api_key.get_secret_value(),
+        },
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Embed the tests of every run with every backend and collect one row per run and backend"""
+    runs = load_runs(Path(args.runs), args.min_tests)
+    if not runs:
+        print(f"No logged runs with at least {args.min_tests} tests found in {args.runs}")
+    rows = []
+    for run in runs:
+        labels = duplicate_labels(run["code_to_test"], run["tests"])
+        for backend in args.backends:
+            try:
+                model = create_embedding_model(build_settings(backend))
+                start = time.perf_counter()
+                if hasattr(model, "fit"):
+                    model.fit(run["tests"])
+                embeddings = np.array(model.embed_documents(run["tests"]))
+                embedding_time = time.perf_counter() - start
+            except Exception as e:
+                print(f"Skipping {backend} on {run['run']}: {e}")
+                continue
+            rows.append(
+                {
+                    "run": run["run"],
+                    "backend": backend,
+                    "tests": len(run["tests"]),
+                    **evaluate(embeddings, labels),
+                    "embedding_time_per_test_ms": 1000 * embedding_time / len(run["tests"]),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", default="runs", help="Directory with the logged runs of the app")
+    parser.add_argument("--backends", nargs="+", default=["local", "openai"])
+    parser.add_argument("--min-tests", type=int, default=4, help="Skip runs with fewer tests")
+    parser.add_argument("--output", default="benchmarks/results/embedding_quality.csv")
+    args = parser.parse_args()
+
+    load_dotenv()
+    results = run_benchmark(args)
+    if results.empty:
+        return
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+    print(
+        results.groupby("backend")[["roc_auc", "nearest_neighbor_hit_rate", "embedding_time_per_test_ms"]]
+        .mean()
+        .to_markdown()
+    )
+
+
+if __name__ == "__main__":
+    main()
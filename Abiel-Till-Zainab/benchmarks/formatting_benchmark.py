@@ -0,0 +1,116 @@
+"""
+Measure the cost of assembling the combined test script for growing test suites.
+
+Tests are simulated unittest methods with unformatted layout (calls of a gridworld function with random moves, long
+assertion lines, docstrings, blank lines). Reported per suite size: the latency of assembling with whole-script isort
+and black (the previous behavior, now only used for exports), of assembling from formatted tests with an empty cache
+and of assembling again after adding one test (the typical call in the generation loop), plus whether the assembled
+script matches the whole-script formatted one.
+
+Usage (from the project root):
+    python benchmarks/formatting_benchmark.py
+    python benchmarks/formatting_benchmark.py --sizes 100 500 1000 --repetitions 5
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.code_processing import assemble_test_script  # noqa: E402
+
+MOVES = ["north", "south", "east", "west"]
+
+
+def random_test(rng: random.Random, index: int) -> str:
+    """Unformatted test method calling a gridworld function"""
+    moves = [rng.choice(MOVES) for _ in range(rng.randint(1, 8))]
+    start = (rng.randint(0, 4), rng.randint(0, 4))
+    lines = [
+        f"def test_path_{index}_{'_'.join(moves[:3])}(self):",
+        f"    '''Moves {len(moves)} steps from {start}'''",
+        f"    result = gridworld_5_cases_30_percent_returns( {start}, {moves!r} )",
+    ]
+    if rng.random() < 0.5:
+        lines.append("")
+    lines.append("    self.assertIsInstance(result,dict)")
+    lines.append(
+        f"    self.assertEqual(result.get('position'), {start}, 'Expected the agent to stay at {start} after the moves "
+        f"{', '.join(moves)}')"
+    )
+    return "\n".join(lines)
+
+
+def mean_latency(assemble, repetitions: int) -> float:
+    """Mean latency of an assembly in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        assemble()
+    return 1000 * (time.perf_counter() - start) / repetitions
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Assemble suites of every size with and without whole-script formatting"""
+    rng = random.Random(args.seed)
+    rows = []
+    for size in args.sizes:
+        tests: List[str] = [random_test(rng, i) for i in range(size)]
+        new_tests = [random_test(rng, size + i) for i in range(args.repetitions)]
+
+        whole_script_ms = mean_latency(
+            lambda: assemble_test_script("code_to_test.py", tests, new_tests[0], format_script=True), args.repetitions
+        )
+
+        # Fresh suites, so no test is cached yet
+        cold_suites = iter([[random_test(rng, i) for i in range(size)] for _ in range(args.repetitions)])
+        cold_ms = mean_latency(lambda: assemble_test_script("code_to_test.py", next(cold_suites), ""), args.repetitions)
+
+        # Generation loop: the existing tests are cached, only the new test is formatted
+        assemble_test_script("code_to_test.py", tests, "")
+        new_test_iterator = iter(new_tests)
+        warm_ms = mean_latency(
+            lambda: assemble_test_script("code_to_test.py", tests, next(new_test_iterator)), args.repetitions
+        )
+
+        new_test = new_tests[0]
+        identical = assemble_test_script("code_to_test.py", tests, new_test) == assemble_test_script(
+            "code_to_test.py", tests, new_test, format_script=True
+        )
+        rows.append(
+            {
+                "tests": size,
+                "whole_script_ms": whole_script_ms,
+                "fragments_cold_ms": cold_ms,
+                "fragments_warm_ms": warm_ms,
+                "speedup_warm": whole_script_ms / warm_ms,
+                "identical": identical,
+            }
+        )
+        print(f"{size} tests: {whole_script_ms:.1f} ms whole script, {warm_ms:.2f} ms with cached tests")
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/formatting_benchmark.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmark(args)
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Minimize test suites by coverage: keep the smallest subset of tests that covers the same lines (and arcs).
+
+The suites are the combined test scripts of logged runs (runs/*/run_data.json) or a test script given with --code and
+--tests. Every suite is analyzed once (coverage, arcs and duration of every test), then minimized with greedy set
+cover and the exact solver. Reported per suite and method: the kept tests, the minimization runtime, the execution
+time saved and the line coverage of the kept tests, re-measured to confirm it is preserved.
+
+Usage (from the project root):
+    python benchmarks/minimize_suite.py --runs runs
+    python benchmarks/minimize_suite.py --code code_to_test.py --tests test_suite.py --arcs --minimized minimized.py
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.metrics import compute_test_coverage  # noqa: E402
+from utils.minimization import MINIMIZATION_METHODS  # noqa: E402
+from utils.test_suite import TestSuite  # noqa: E402
+
+
+def load_suites(args: argparse.Namespace) -> List[Tuple[str, str, TestSuite]]:
+    """(name, code under test, suite) of the given test script or of every logged run"""
+    if args.code and args.tests:
+        suite = TestSuite()
+        suite.add(Path(args.tests).read_text())
+        return [(Path(args.tests).stem, Path(args.code).read_text(), suite)]
+    suites = []
+    for run_data_file in sorted(Path(args.runs).glob("*/run_data.json")):
+        run_data = json.loads(run_data_file.read_text())
+        suite = TestSuite()
+        suite.add(run_data.get("combined_test_script") or "")
+        if len(suite) >= args.min_tests:
+            suites.append((run_data_file.parent.name, run_data["code_to_test"], suite))
+    return suites
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Analyze and minimize every suite with every method and collect one row per suite and method"""
+    rows = []
+    for name, code_to_test, suite in load_suites(args):
+        _, raw_results = compute_test_coverage(code_to_test, suite.sources, test_names=suite.names)
+        suite.update_coverage(raw_results)
+        tests = list(suite)
+        for method in args.methods:
+            result = suite.minimize(args.arcs, method)
+            _, kept_results = compute_test_coverage(
+                code_to_test,
+                [tests[i].source for i in result.selected],
+                test_names=[tests[i].name for i in result.selected],
+            )
+            rows.append(
+                {
+                    "suite": name,
+                    "method": result.method,
+                    "tests": len(tests),
+                    "kept": len(result.selected),
+                    "reduction": result.reduction,
+                    "requirements": result.requirements,
+                    "runtime_ms": 1000 * result.runtime_s,
+                    "execution_time_s": result.execution_time_s,
+                    "saved_execution_time_s": result.saved_execution_time_s,
+                    "line_coverage": raw_results["line_coverage"],
+                    "kept_line_coverage": kept_results["line_coverage"],
+                }
+            )
+            print(f"{name} ({method}): {len(result.selected)} of {len(tests)} tests kept")
+            if args.minimized and method == args.methods[-1]:
+                minimized = TestSuite()
+                for i in result.selected:
+                    minimized.add(tests[i].source)
+                Path(args.minimized).write_text(minimized.script(format_script=True))
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", default="runs", help="Directory with the logged runs")
+    parser.add_argument("--code", help="Code under test (with --tests instead of the logged runs)")
+    parser.add_argument("--tests", help="Test script to minimize")
+    parser.add_argument("--minimized", help="Write the minimized test script of --tests to this file")
+    parser.add_argument("--arcs", action="store_true", help="Also preserve every executed arc (branch coverage)")
+    parser.add_argument("--methods", nargs="+", default=["greedy", "exact"], choices=MINIMIZATION_METHODS)
+    parser.add_argument("--min-tests", type=int, default=2)
+    parser.add_argument("--output", default="benchmarks/results/minimize_suite.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmark(args)
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Run the generate-until-coverage loop offline with the fake chat and embedding backends.
+
+With zero latency the measured wall time is the non-LLM overhead of the pipeline (graph execution, vector store,
+coverage analysis, formatting). A latency distribution can be configured to simulate a provider.
+
+Usage (from the project root):
+    python benchmarks/offline_pipeline.py --max-tests 10
+    python benchmarks/offline_pipeline.py --latency lognormal --latency-mean 2.0 --latency-sigma 0.5
+    python benchmarks/offline_pipeline.py --profile benchmarks/results/offline_pipeline.prof
+"""
+
+import argparse
+import cProfile
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from core.generator import UnitTestGenerator  # noqa: E402
+from core.langchain_graph import GRAPH_TOPOLOGIES  # noqa: E402
+
+
+def build_settings(args: argparse.Namespace) -> dict[str, Any]:
+    """Build generator settings for the fake backends"""
+    responses = [Path(path).read_text() for path in args.responses] if args.responses else []
+    return {
+        "llm": {
+            "model_name": "fake",
+            "backend": "fake",
+            "max_improvements": args.max_improvements,
+            "similarity_comparison_count": args.similarity_count,
+            "batch_size": args.batch_size,
+            "graph_topology": args.topology,
+            "synthesize_tests": args.synthesize,
+            "fuzz_tests": args.fuzz,
+            "duplicate_check": not args.no_duplicate_check,
+            "similarity_retrieval": args.similarity_retrieval,
+            "few_shot_retrieval": args.few_shot_retrieval,
+            "few_shot_count": args.few_shot_count,
+            "node_models": dict(assignment.split("=", 1) for assignment in args.node_model),
+            "escalation_model": args.escalation_model,
+            "embedding_cache_dir": args.embedding_cache,
+        },
+        "api": {},
+        "fake": {
+            "responses": responses,
+            "latency": {
+                "distribution": args.latency,
+                "mean": args.latency_mean,
+                "sigma": args.latency_sigma,
+                "std": args.latency_sigma,
+                "low": 0.0,
+                "high": 2 * args.latency_mean,
+            },
+            "seed": args.seed,
+        },
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Run the generation loop on every function and collect one row per function"""
+    logger = logging.getLogger("offline_pipeline")
+    rows = []
+    for function_file in sorted(Path(args.functions).glob("*.py")):
+        generator = UnitTestGenerator(build_settings(args), (logger, logger))
+
+        start = time.perf_counter()
+        result = generator.generate_until_coverage(function_file.read_text(), max_tests=args.max_tests)
+        wall_time = time.perf_counter() - start
+
+        rows.append(
+            {
+                "function": function_file.stem,
+                "wall_time_s": wall_time,
+                "rounds": result["rounds"],
+                "time_per_round_s": wall_time / result["rounds"] if result["rounds"] else 0.0,
+                "tests": len(result["tests"]),
+                "skipped_llm_calls": int(generator.node_metrics.per_node()["skipped_llm_calls"].sum()),
+                "escalations": int(generator.node_metrics.per_node()["escalations"].sum()),
+                "duplicate_rate": generator.node_metrics.duplicate_rate(),
+                "line_coverage": result["raw_results"]["line_coverage"],
+            }
+        )
+        print(f"{function_file.stem}: {wall_time:.2f}s for {result['rounds']} rounds")
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--functions", default="generated_functions", help="Directory with the functions to test")
+    parser.add_argument("--responses", nargs="*", help="Files with scripted LLM responses (cycled in order)")
+    parser.add_argument("--topology", default="default", choices=GRAPH_TOPOLOGIES)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--synthesize", action="store_true", help="Synthesize solvable tests before calling the LLM")
+    parser.add_argument("--fuzz", action="store_true", help="Fuzz uncovered functions before calling the LLM")
+    parser.add_argument(
+        "--no-duplicate-check", action="store_true", help="Skip the structural duplicate check of new tests"
+    )
+    parser.add_argument(
+        "--similarity-retrieval",
+        default="embedding",
+        choices=["embedding", "coverage"],
+        help="Retrieve the similarity context by test embeddings or by covered lines",
+    )
+    parser.add_argument(
+        "--few-shot-retrieval",
+        default="edge_case",
+        choices=["edge_case", "coverage"],
+        help="Retrieve the prompt examples by the edge case query or by the lines leading to the target",
+    )
+    parser.add_argument("--few-shot-count", type=int, default=3, help="Prompt examples with coverage retrieval")
+    parser.add_argument(
+        "--node-model", action="append", default=[], metavar="NODE=MODEL", help="Assign a (fake) model to a node"
+    )
+    parser.add_argument("--escalation-model", help="Regenerate failing or non-covering tests with this (fake) model")
+    parser.add_argument(
+        "--embedding-cache", help="Persist embeddings in this directory (disabled by default for reproducible runs)"
+    )
+    parser.add_argument("--max-tests", type=int, default=10)
+    parser.add_argument("--max-improvements", type=int, default=2)
+    parser.add_argument("--similarity-count", type=int, default=20)
+    parser.add_argument("--latency", default="constant", choices=["constant", "uniform", "normal", "lognormal"])
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="Mean latency per LLM call in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Sigma (lognormal) or std (normal)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", help="Write cProfile statistics of the whole run to this file")
+    parser.add_argument("--output", default="benchmarks/results/offline_pipeline.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        results = profiler.runcall(run_benchmark, args)
+        profiler.dump_stats(args.profile)
+    else:
+        results = run_benchmark(args)
+
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
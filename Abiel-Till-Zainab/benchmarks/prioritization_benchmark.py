@@ -0,0 +1,116 @@
+"""
+Compare test prioritization strategies by how early they cover the code and reveal failures.
+
+The suites are the combined test scripts of logged runs (runs/*/run_data.json) or a test script given with --code and
+--tests. Every suite is analyzed once (coverage, outcome and duration of every test), then every strategy orders it.
+Reported per suite and strategy: APFC (average percentage of line coverage), APFD and cost-cognizant APFDc (failing
+tests as faults, empty without failures), the execution time until the first failure and until full coverage of the
+suite, and the time a run stopping at the coverage target saves.
+
+Usage (from the project root):
+    python benchmarks/prioritization_benchmark.py --runs runs
+    python benchmarks/prioritization_benchmark.py --code code_to_test.py --tests test_suite.py --coverage-target 0.9
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.metrics import compute_test_coverage  # noqa: E402
+from utils.prioritization import PRIORITIZATION_STRATEGIES, execution_report  # noqa: E402
+from utils.test_suite import SuiteTest, TestSuite  # noqa: E402
+
+
+def load_suites(args: argparse.Namespace) -> List[Tuple[str, str, TestSuite]]:
+    """(name, code under test, suite) of the given test script or of every logged run"""
+    if args.code and args.tests:
+        suite = TestSuite()
+        suite.add(Path(args.tests).read_text())
+        return [(Path(args.tests).stem, Path(args.code).read_text(), suite)]
+    suites = []
+    for run_data_file in sorted(Path(args.runs).glob("*/run_data.json")):
+        run_data = json.loads(run_data_file.read_text())
+        suite = TestSuite()
+        suite.add(run_data.get("combined_test_script") or "")
+        if len(suite) >= args.min_tests:
+            suites.append((run_data_file.parent.name, run_data["code_to_test"], suite))
+    return suites
+
+
+def time_to_coverage(tests: List[SuiteTest], target: float, line_count: int) -> Optional[float]:
+    """Execution time of the order until the covered lines reach the target share of the code lines"""
+    covered, elapsed = set(), 0.0
+    for test in tests:
+        covered |= test.covered_lines
+        elapsed += test.duration_s or 0.0
+        if line_count and len(covered) / line_count >= target:
+            return elapsed
+    return None
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Analyze every suite and order it with every strategy, one row per suite and strategy"""
+    rows = []
+    for name, code_to_test, suite in load_suites(args):
+        _, raw_results = compute_test_coverage(code_to_test, suite.sources, test_names=suite.names)
+        suite.update_coverage(raw_results)
+        line_count = len(raw_results["line_numbers"])
+        suite_coverage = raw_results["line_coverage"]
+        for strategy in args.strategies:
+            tests = suite.prioritize(strategy)
+            report = execution_report(
+                strategy,
+                [test.outcome or "error" for test in tests],
+                [test.covered_lines for test in tests],
+                [test.duration_s for test in tests],
+                len(tests),
+            )
+            target_time = time_to_coverage(tests, args.coverage_target * suite_coverage, line_count)
+            rows.append(
+                {
+                    "suite": name,
+                    "strategy": strategy,
+                    "tests": len(tests),
+                    "failures": report.failures,
+                    "apfc": report.apfc,
+                    "apfd": report.apfd,
+                    "apfd_c": report.apfd_c,
+                    "time_to_first_failure_s": report.time_to_first_failure_s,
+                    "time_to_suite_coverage_s": time_to_coverage(tests, suite_coverage, line_count),
+                    "saved_at_target_s": report.execution_time_s - target_time if target_time is not None else None,
+                    "execution_time_s": report.execution_time_s,
+                }
+            )
+            print(f"{name} ({strategy}): APFC {report.apfc:.3f}")
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", default="runs", help="Directory with the logged runs")
+    parser.add_argument("--code", help="Code under test (with --tests instead of the logged runs)")
+    parser.add_argument("--tests", help="Test script to prioritize")
+    parser.add_argument("--strategies", nargs="+", default=PRIORITIZATION_STRATEGIES, choices=PRIORITIZATION_STRATEGIES)
+    parser.add_argument(
+        "--coverage-target", type=float, default=1.0, help="Share of the suite's line coverage a stopped run reaches"
+    )
+    parser.add_argument("--min-tests", type=int, default=2)
+    parser.add_argument("--output", default="benchmarks/results/prioritization_benchmark.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmark(args)
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
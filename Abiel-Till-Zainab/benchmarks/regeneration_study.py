@@ -0,0 +1,132 @@
+"""
+Rerun the delete-and-regenerate study (report_data/regenetation_report/) headless on the gridworld functions.
+
+For every function and repetition, tests are generated until full line coverage (or --max-tests). Then the test with
+the maximum, median and minimum number of uniquely covered lines is deleted in turn, and tests are regenerated until
+the coverage is restored (or --regeneration-rounds are spent). Every run writes an event CSV in the schema of the study
+(<model>_<function>_<run_id>.csv). The summary has one row per run and deletion: the deleted test's unique lines, the
+coverage lost and the tests generated until the coverage was restored.
+
+Usage (from the project root):
+    python benchmarks/regeneration_study.py --model fake --max-tests 10
+    python benchmarks/regeneration_study.py --model gpt-4o-mini --max-tests 25 --repetitions 3
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from config import APIConfig  # noqa: E402
+from core.generator import UnitTestGenerator  # noqa: E402
+from core.regeneration import DELETION_RANKINGS, RegenerationExperiment  # noqa: E402
+
+
+def build_settings(args: argparse.Namespace) -> dict[str, Any]:
+    """Build generator settings like the Streamlit app does (the model "fake" runs offline)"""
+    settings = {
+        "llm": {
+            "model_name": args.model,
+            "max_improvements": args.max_improvements,
+            "similarity_comparison_count": args.similarity_count,
+            "batch_size": 1,
+            "embedding_cache_dir": args.embedding_cache,
+        },
+        "api": {},
+    }
+    if args.model == "fake":
+        settings["llm"]["backend"] = "fake"
+        settings["fake"] = {"seed": args.seed}
+    else:
+        api_config = APIConfig.from_env()
+        settings["api"] = {
+            "openai_api_key": api_config.openai_api_key.get_secret_value(),
+            "groq_api_key": api_config.groq_api_key.get_secret_value(),
+            "jina_api_key": api_config.jina_api_key.get_secret_value(),
+        }
+    return settings
+
+
+def summarize(events: pd.DataFrame) -> list[dict[str, Any]]:
+    """One row per deletion: unique lines of the deleted test, coverage lost and tests generated to restore it"""
+    rows = []
+    deletions = events.index[events["event"] == "deleted_test"].tolist()
+    for position, index in enumerate(deletions):
+        end = deletions[position + 1] if position + 1 < len(deletions) else len(events)
+        # The deletion row holds the coverage before the deletion, the first regeneration round starts from the
+        # coverage after it
+        before = float(events.loc[index, "coverage"])
+        regeneration = events.loc[index + 1 : end - 1]
+        after = float(regeneration["coverage"].iloc[0]) if len(regeneration) else before
+        restored = after >= before
+        tests_to_restore = 0
+        for _, event in regeneration.iterrows():
+            if restored:
+                break
+            if event["event"] == "generated_test":
+                tests_to_restore += 1
+            restored = float(event["coverage"]) >= before
+        rows.append(
+            {
+                "ranking": events.loc[index, "ranking_info"],
+                "unique_lines": events.loc[index, "unique_lines_covered_deleted_test"],
+                "coverage_lost": before - after,
+                "tests_to_restore": tests_to_restore,
+                "restored": restored,
+            }
+        )
+    return rows
+
+
+def run_study(args: argparse.Namespace) -> pd.DataFrame:
+    """Run the study on every function and write the event CSVs, returns the summary"""
+    logger = logging.getLogger("regeneration_study")
+    output_dir = Path(args.output_dir)
+    rows = []
+    for function_file in sorted(Path(args.functions).glob("*.py")):
+        for repetition in range(args.repetitions):
+            generator = UnitTestGenerator(build_settings(args), (logger, logger))
+            experiment = RegenerationExperiment(
+                generator, function_file.read_text(), args.max_tests, args.regeneration_rounds
+            )
+            events = experiment.run(args.rankings)
+            events.to_csv(output_dir / f"{args.model}_{function_file.stem}_{experiment.run_id}.csv", index=False)
+
+            run = {"function": function_file.stem, "repetition": repetition, "run_id": experiment.run_id}
+            rows += [{**run, **deletion} for deletion in summarize(events)]
+            print(f"{function_file.stem} ({experiment.run_id}): {len(events)} events")
+    return pd.DataFrame(rows)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--functions", default="generated_functions", help="Directory with the functions to test")
+    parser.add_argument("--model", default="fake", help="Chat model, fake runs offline with the fake backends")
+    parser.add_argument("--rankings", nargs="+", default=DELETION_RANKINGS, choices=DELETION_RANKINGS)
+    parser.add_argument("--repetitions", type=int, default=1)
+    parser.add_argument("--max-tests", type=int, default=25)
+    parser.add_argument("--regeneration-rounds", type=int, default=10)
+    parser.add_argument("--max-improvements", type=int, default=2)
+    parser.add_argument("--similarity-count", type=int, default=20)
+    parser.add_argument("--embedding-cache", help="Persist embeddings in this directory (disabled by default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="benchmarks/results/regeneration_study")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    summary = run_study(args)
+    summary.to_csv(output_dir / "summary.csv", index=False)
+    print(summary.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Measure the sustained throughput of concurrent generation runs sharing one provider scheduler.
+
+Every function is generated in its own thread, all threads share the scheduler of the provider. The sweep over the
+in-flight bound shows where queue wait starts to dominate and where rate limit errors eat the gained concurrency.
+Runs offline with the fake backend; simulated rate limit errors can be injected with --error-rate.
+
+Usage (from the project root):
+    python benchmarks/scheduler_throughput.py --max-in-flight 1 2 4 8 --latency-mean 1.0
+    python benchmarks/scheduler_throughput.py --requests-per-minute 60 --error-rate 0.1
+"""
+
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from core.generator import UnitTestGenerator  # noqa: E402
+from core.scheduler import get_scheduler, reset_schedulers  # noqa: E402
+
+
+def build_settings(args: argparse.Namespace, max_in_flight: int) -> dict[str, Any]:
+    """Build generator settings for the fake backends with the given in-flight bound"""
+    return {
+        "llm": {
+            "model_name": "fake",
+            "backend": "fake",
+            "max_improvements": args.max_improvements,
+            "similarity_comparison_count": args.similarity_count,
+            "batch_size": 1,
+        },
+        "api": {},
+        "fake": {
+            "latency": {"distribution": "lognormal", "mean": args.latency_mean, "sigma": args.latency_sigma},
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+        },
+        "rate_limits": {
+            "fake": {
+                "requests_per_minute": args.requests_per_minute,
+                "tokens_per_minute": args.tokens_per_minute,
+                "max_in_flight": max_in_flight,
+                "base_delay_s": args.base_delay,
+            }
+        },
+    }
+
+
+def run_sweep_point(args: argparse.Namespace, max_in_flight: int) -> dict[str, Any]:
+    """Generate tests for all functions concurrently and collect the scheduler statistics"""
+    logger = logging.getLogger("scheduler_throughput")
+    reset_schedulers()
+    settings = build_settings(args, max_in_flight)
+    functions = sorted(Path(args.functions).glob("*.py"))[: args.function_count]
+
+    def generate(function_file: Path) -> int:
+        generator = UnitTestGenerator(settings, (logger, logger))
+        return len(generator.generate_until_coverage(function_file.read_text(), max_tests=args.max_tests)["tests"])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        tests = sum(executor.map(generate, functions))
+    wall_time = time.perf_counter() - start
+
+    stats = get_scheduler("fake").stats()
+    print(f"max_in_flight={max_in_flight}: {wall_time:.2f}s, {stats['completed_per_minute']:.1f} requests/min")
+    return {"wall_time_s": wall_time, "tests": tests, "tests_per_minute": tests / wall_time * 60, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--functions", default="generated_functions", help="Directory with the functions to test")
+    parser.add_argument("--function-count", type=int, default=9, help="Number of concurrent generation runs")
+    parser.add_argument("--max-in-flight", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests-per-minute", type=float, default=None)
+    parser.add_argument("--tokens-per-minute", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of simulated rate limit errors")
+    parser.add_argument("--base-delay", type=float, default=0.5, help="Base delay of the retry backoff in seconds")
+    parser.add_argument("--max-tests", type=int, default=5)
+    parser.add_argument("--max-improvements", type=int, default=2)
+    parser.add_argument("--similarity-count", type=int, default=20)
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="Mean latency per LLM call in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/scheduler_throughput.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = pd.DataFrame([run_sweep_point(args, max_in_flight) for max_in_flight in args.max_in_flight])
+    results.to_csv(output, index=False)
+    print(
+        results[
+            [
+                "max_in_flight",
+                "wall_time_s",
+                "tests_per_minute",
+                "completed_per_minute",
+                "mean_queue_wait_s",
+                "p95_queue_wait_s",
+                "retries",
+                "rate_limit_errors",
+                "peak_in_flight",
+            ]
+        ].to_markdown(index=False)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare re-running the whole suite with change-aware re-execution after edits of the code under test.
+
+The suites are the combined test scripts of logged runs (runs/*/run_data.json) or a test script given with --code and
+--tests. Every suite is analyzed once, then edits are applied to its code one at a time: a statement inserted before a
+code line, a comment inserted before it or the line deleted (edits that break the syntax are skipped). Every edited
+version is analyzed in full and selectively (only the tests covering lines next to the edit run, the coverage of the
+other tests is remapped). Reported per edit: the tests re-executed, the wall time of both analyses and whether the
+selective coverage matrix equals the full one.
+
+Usage (from the project root):
+    python benchmarks/selective_coverage_benchmark.py --runs runs
+    python benchmarks/selective_coverage_benchmark.py --code code_to_test.py --tests test_suite.py --edits 20
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.metrics import compute_test_coverage  # noqa: E402
+from utils.regression_selection import compute_selective_coverage  # noqa: E402
+from utils.test_suite import TestSuite  # noqa: E402
+
+EDIT_KINDS = ["statement", "comment", "delete"]
+
+
+def load_suites(args: argparse.Namespace) -> List[Tuple[str, str, TestSuite]]:
+    """(name, code under test, suite) of the given test script or of every logged run"""
+    if args.code and args.tests:
+        suite = TestSuite()
+        suite.add(Path(args.tests).read_text())
+        return [(Path(args.tests).stem, Path(args.code).read_text(), suite)]
+    suites = []
+    for run_data_file in sorted(Path(args.runs).glob("*/run_data.json")):
+        run_data = json.loads(run_data_file.read_text())
+        suite = TestSuite()
+        suite.add(run_data.get("combined_test_script") or "")
+        if len(suite) >= args.min_tests:
+            suites.append((run_data_file.parent.name, run_data["code_to_test"], suite))
+    return suites
+
+
+def edits(code: str, kinds: List[str], count: int, rng: random.Random) -> Iterator[Tuple[str, int, str]]:
+    """(kind, edited line, edited code) of up to `count` random edits that keep the code compilable"""
+    lines = code.splitlines()
+    code_lines = [i for i, line in enumerate(lines) if line.strip() and not line.strip().startswith("#")]
+    candidates = [(kind, i) for kind in kinds for i in code_lines]
+    rng.shuffle(candidates)
+    produced = 0
+    for kind, i in candidates:
+        if produced >= count:
+            break
+        indent = lines[i][: len(lines[i]) - len(lines[i].lstrip())]
+        if kind == "statement":
+            edited = lines[:i] + [f"{indent}_edited = None"] + lines[i:]
+        elif kind == "comment":
+            edited = lines[:i] + [f"{indent}# edited"] + lines[i:]
+        else:
+            edited = lines[:i] + lines[i + 1 :]
+        edited_code = "\n".join(edited) + "\n"
+        try:
+            compile(edited_code, "code_to_test.py", "exec")
+        except SyntaxError:
+            continue
+        produced += 1
+        yield kind, i + 1, edited_code
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Analyze every edit of every suite in full and selectively, one row per edit"""
+    rng = random.Random(args.seed)
+    rows = []
+    for name, code_to_test, suite in load_suites(args):
+        _, raw_results = compute_test_coverage(code_to_test, suite.sources, test_names=suite.names)
+        suite.update_coverage(raw_results)
+        for kind, line, edited_code in edits(code_to_test, args.kinds, args.edits, rng):
+            start = time.perf_counter()
+            full_df, _ = compute_test_coverage(edited_code, suite.sources, test_names=suite.names)
+            full_time = time.perf_counter() - start
+
+            edited_suite = TestSuite.from_records(suite.to_records())
+            selective_df, selective_results = compute_selective_coverage(edited_suite, code_to_test, edited_code)
+            report = selective_results["selection_report"]
+            rows.append(
+                {
+                    "suite": name,
+                    "edit": kind,
+                    "line": line,
+                    "tests": report.total,
+                    "executed": report.executed,
+                    "affected_lines": report.affected_lines,
+                    "full_time_s": full_time,
+                    "selective_time_s": report.runtime_s,
+                    "saved_share": 1 - report.runtime_s / full_time if full_time else 0.0,
+                    "matrix_equal": selective_df.equals(full_df),
+                }
+            )
+        print(f"{name}: {sum(row['suite'] == name for row in rows)} edits")
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", default="runs", help="Directory with the logged runs")
+    parser.add_argument("--code", help="Code under test (with --tests instead of the logged runs)")
+    parser.add_argument("--tests", help="Test script to analyze")
+    parser.add_argument("--kinds", nargs="+", default=EDIT_KINDS, choices=EDIT_KINDS)
+    parser.add_argument("--edits", type=int, default=10, help="Edits per suite")
+    parser.add_argument("--min-tests", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/selective_coverage_benchmark.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmark(args)
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark end-to-end latency and token use of the graph topologies on the gridworld functions.
+
+For every function in the functions directory and every topology, tests are generated from scratch until full line
+coverage (or --max-tests) is reached.
+
+Usage (from the project root):
+    python benchmarks/topology_benchmark.py --model gpt-4o-mini --max-tests 25 --repetitions 1
+    python benchmarks/topology_benchmark.py --model gpt-4o-mini --node-model has_test_smell_router=gpt-4o \
+        --escalation-model gpt-4o
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from config import APIConfig  # noqa: E402
+from core.generator import UnitTestGenerator  # noqa: E402
+from core.langchain_graph import GRAPH_TOPOLOGIES  # noqa: E402
+
+
+def build_settings(model_name: str, topology: str, args: argparse.Namespace) -> dict[str, Any]:
+    """Build generator settings like the Streamlit app does"""
+    api_config = APIConfig.from_env()
+    return {
+        "llm": {
+            "model_name": model_name,
+            "max_improvements": args.max_improvements,
+            "similarity_comparison_count": args.similarity_count,
+            "batch_size": 1,
+            "graph_topology": topology,
+            "static_smell_check": not args.no_static_smell_check,
+            "synthesize_tests": args.synthesize,
+            "fuzz_tests": args.fuzz,
+            "duplicate_check": not args.no_duplicate_check,
+            "similarity_retrieval": args.similarity_retrieval,
+            "few_shot_retrieval": args.few_shot_retrieval,
+            "few_shot_count": args.few_shot_count,
+            "node_models": dict(assignment.split("=", 1) for assignment in args.node_model),
+            "escalation_model": args.escalation_model,
+        },
+        "api": {
+            "openai_api_key": api_config.openai_api_key.get_secret_value(),
+            "groq_api_key": api_config.groq_api_key.get_secret_value(),
+            "jina_api_key": api_config.jina_api_key.get_secret_value(),
+        },
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Run every topology on every function
+
+    Returns:
+        Tuple of (one row per run, one row per run and model)
+    """
+    logger = logging.getLogger("topology_benchmark")
+    rows, model_rows = [], []
+    for function_file in sorted(Path(args.functions).glob("*.py")):
+        code_to_test = function_file.read_text()
+        for topology in args.topologies:
+            for repetition in range(args.repetitions):
+                generator = UnitTestGenerator(build_settings(args.model, topology, args), (logger, logger))
+
+                start = time.perf_counter()
+                result = generator.generate_until_coverage(code_to_test, max_tests=args.max_tests)
+                wall_time = time.perf_counter() - start
+
+                per_node = generator.node_metrics.per_node()
+                run = {"function": function_file.stem, "topology": topology, "repetition": repetition}
+                model_rows += [
+                    {**run, "model": model, **metrics}
+                    for model, metrics in generator.node_metrics.per_model().to_dict(orient="index").items()
+                ]
+                rows.append(
+                    {
+                        "function": function_file.stem,
+                        "topology": topology,
+                        "repetition": repetition,
+                        "wall_time_s": wall_time,
+                        "llm_calls": int(per_node["llm_calls"].sum()),
+                        "skipped_llm_calls": int(per_node["skipped_llm_calls"].sum()),
+                        "escalations": int(per_node["escalations"].sum()),
+                        "duplicate_rate": generator.node_metrics.duplicate_rate(),
+                        "prompt_tokens": int(per_node["prompt_tokens"].sum()),
+                        "completion_tokens": int(per_node["completion_tokens"].sum()),
+                        "tests": len(result["tests"]),
+                        "rounds": result["rounds"],
+                        "line_coverage": result["raw_results"]["line_coverage"],
+                    }
+                )
+                print(
+                    f"{function_file.stem} [{topology}] {wall_time:.1f}s, {int(per_node['llm_calls'].sum())} LLM calls, "
+                    f"{result['raw_results']['line_coverage']:.1%} coverage"
+                )
+    return pd.DataFrame(rows), pd.DataFrame(model_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--functions", default="generated_functions", help="Directory with the functions to test")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--topologies", nargs="+", default=GRAPH_TOPOLOGIES, choices=GRAPH_TOPOLOGIES)
+    parser.add_argument("--max-tests", type=int, default=25)
+    parser.add_argument("--max-improvements", type=int, default=2)
+    parser.add_argument("--similarity-count", type=int, default=20)
+    parser.add_argument("--repetitions", type=int, default=1)
+    parser.add_argument("--synthesize", action="store_true", help="Synthesize solvable tests before calling the LLM")
+    parser.add_argument("--fuzz", action="store_true", help="Fuzz uncovered functions before calling the LLM")
+    parser.add_argument(
+        "--no-duplicate-check", action="store_true", help="Skip the structural duplicate check of new tests"
+    )
+    parser.add_argument(
+        "--similarity-retrieval",
+        default="embedding",
+        choices=["embedding", "coverage"],
+        help="Retrieve the similarity context by test embeddings or by covered lines",
+    )
+    parser.add_argument(
+        "--few-shot-retrieval",
+        default="edge_case",
+        choices=["edge_case", "coverage"],
+        help="Retrieve the prompt examples by the edge case query or by the lines leading to the target",
+    )
+    parser.add_argument("--few-shot-count", type=int, default=3, help="Prompt examples with coverage retrieval")
+    parser.add_argument(
+        "--no-static-smell-check", action="store_true", help="Always ask the LLM router (no static smell pre-screen)"
+    )
+    parser.add_argument(
+        "--node-model", action="append", default=[], metavar="NODE=MODEL", help="Assign a model to a node"
+    )
+    parser.add_argument("--escalation-model", help="Regenerate failing or non-covering tests with this model")
+    parser.add_argument("--output", default="benchmarks/results/topology_benchmark.csv")
+    args = parser.parse_args()
+
+    load_dotenv()
+    results, model_results = run_benchmark(args)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(output, index=False)
+    model_results.to_csv(output.with_name(f"{output.stem}_models.csv"), index=False)
+
+    summary = results.groupby("topology")[
+        [
+            "wall_time_s",
+            "llm_calls",
+            "skipped_llm_calls",
+            "escalations",
+            "duplicate_rate",
+            "prompt_tokens",
+            "completion_tokens",
+            "tests",
+            "line_coverage",
+        ]
+    ].mean()
+    print(summary.to_markdown())
+    if not model_results.empty:
+        print(model_results.groupby(["topology", "model"])[["llm_calls", "prompt_tokens", "completion_tokens"]].sum())
+
+
+if __name__ == "__main__":
+    main()
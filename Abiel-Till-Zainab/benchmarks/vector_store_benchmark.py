@@ -0,0 +1,116 @@
+"""
+Compare the query latency of InMemoryVectorStore with the matrix-backed vector store (exact and IVF search).
+
+Stored tests are simulated by clustered random unit vectors (tests of one suite are similar to each other), the
+queries are perturbed stored vectors. Reported per store size: the mean latency of a single query for every store,
+the latency per query of batched queries and the recall@k of the approximate (IVF) search against the exact top k.
+
+Usage (from the project root):
+    python benchmarks/vector_store_benchmark.py
+    python benchmarks/vector_store_benchmark.py --sizes 1000 10000 50000 --dimension 1536 --probes 4 8 16
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from core.vector_store import MatrixVectorStore  # noqa: E402
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns precomputed vectors for texts of the form "test-<index>\""""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[int(text.split("-")[1])].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def clustered_vectors(rng: np.random.Generator, size: int, dimension: int, clusters: int) -> np.ndarray:
+    """Unit vectors scattered around random cluster centers"""
+    centers = rng.normal(size=(clusters, dimension))
+    vectors = centers[rng.integers(clusters, size=size)] + 0.8 * rng.normal(size=(size, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def mean_latency(search, queries: np.ndarray) -> float:
+    """Mean latency of single queries in milliseconds"""
+    start = time.perf_counter()
+    for query in queries:
+        search(query.tolist())
+    return 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def run_benchmark(args: argparse.Namespace) -> pd.DataFrame:
+    """Build every store for every size and collect one row per size and store configuration"""
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for size in args.sizes:
+        vectors = clustered_vectors(rng, size, args.dimension, args.clusters)
+        embeddings = LookupEmbeddings(vectors)
+        texts = [f"test-{i}" for i in range(size)]
+        queries = vectors[rng.integers(size, size=args.queries)] + 0.05 * rng.normal(
+            size=(args.queries, args.dimension)
+        ).astype(np.float32)
+
+        stores = {"in_memory": InMemoryVectorStore(embeddings), "matrix": MatrixVectorStore(embeddings, size + 1)}
+        stores.update({f"ivf_probes_{probes}": MatrixVectorStore(embeddings, 0, probes) for probes in args.probes})
+        for store in stores.values():
+            store.add_texts(texts, ids=texts)
+
+        exact = [
+            {document.id for document, _ in result}
+            for result in stores["matrix"].similarity_search_with_score_by_vectors(queries.tolist(), args.k)
+        ]
+        for name, store in stores.items():
+            row = {
+                "size": size,
+                "store": name,
+                "query_ms": mean_latency(lambda query: store.similarity_search_by_vector(query, args.k), queries),
+            }
+            if isinstance(store, MatrixVectorStore):
+                start = time.perf_counter()
+                results = store.similarity_search_with_score_by_vectors(queries.tolist(), args.k)
+                row["batched_query_ms"] = 1000 * (time.perf_counter() - start) / len(queries)
+                found = [{document.id for document, _ in result} for result in results]
+                row[f"recall_at_{args.k}"] = float(np.mean([len(a & b) / args.k for a, b in zip(found, exact)]))
+            rows.append(row)
+            print(f"{size} tests, {name}: {row['query_ms']:.3f} ms per query")
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--dimension", type=int, default=1536, help="Embedding dimension (1536 for OpenAI)")
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[8], help="Probed lists of the IVF search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/vector_store_benchmark.csv")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmark(args)
+    results.to_csv(output, index=False)
+    print(results.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main()
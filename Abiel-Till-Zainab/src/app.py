@@ -3,21 +3,28 @@ import json
 import os
 import subprocess
 import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import pandas as pd
 import streamlit as st
 
 from config import APIConfig
 from core.generator import UnitTestGenerator
-from utils.code_processing import (assemble_test_script, extract_unit_tests,
-                                   sanitize_code_output,
+from core.langchain_graph import GRAPH_TOPOLOGIES
+from core.model_pool import LLM_NODES
+from utils.code_processing import (TEST_CLASS_NAME, sanitize_code_output,
                                    validate_python_syntax)
 from utils.logging import (get_next_run_dir, log_node_execution,
                            save_code_files, setup_logging)
-from utils.metrics import analyze_test_coverage
+from utils.metrics import analyze_test_coverage, compute_test_coverage
+from utils.minimization import EXACT_LIMIT, MINIMIZATION_METHODS
+from utils.node_metrics import NodeMetrics
+from utils.prioritization import PRIORITIZATION_STRATEGIES, execution_report
+from utils.regression_selection import compute_selective_coverage, select_tests
+from utils.test_suite import TestSuite
 
 
 def load_config() -> Dict[Any, Any]:
@@ -30,6 +37,21 @@ def load_config() -> Dict[Any, Any]:
             "model_choice": "gpt-4o-mini",
             "max_improvements": 2,
             "similarity_comparison_count": 10,
+            "batch_size": 1,
+            "graph_topology": "default",
+            "streaming": False,
+            "static_smell_check": True,
+            "path_targeting": True,
+            "synthesize_tests": True,
+            "fuzz_tests": True,
+            "duplicate_check": True,
+            "similarity_retrieval": "embedding",
+            "few_shot_retrieval": "edge_case",
+            "few_shot_count": 3,
+            "node_models": {},
+            "escalation_model": None,
+            "embedding_backend": "auto",
+            "selective_reexecution": True,
         }
 
 
@@ -46,6 +68,9 @@ def save_run(
     generated_test_case: str,
     combined_test_script: str,
     logs: str,
+    node_metrics: Optional[NodeMetrics] = None,
+    test_suite: Optional[TestSuite] = None,
+    generated_test_origins: Optional[Dict[str, str]] = None,
 ):
     """Save the current run to history"""
     # Use the same run directory that was created for logging
@@ -64,13 +89,24 @@ def save_run(
         "existing_tests": existing_tests,
         "generated_test_case": generated_test_case,
         "combined_test_script": combined_test_script,
+        "generated_test_origins": generated_test_origins or {},
         "validation_error": validation_error,
         "logs": logs,
         "model": cfg["llm"]["model_name"],
+        "node_models": cfg["llm"].get("node_models", {}),
+        "escalation_model": cfg["llm"].get("escalation_model"),
         "max_improvements": cfg["llm"]["max_improvements"],
         "similarity_comparison_count": cfg["llm"]["similarity_comparison_count"],
     }
 
+    # Save the tests with their ids, origin, coverage column, outcome and duration
+    if test_suite is not None:
+        run_data["test_suite"] = test_suite.to_records()
+
+    # Save per node latency and token metrics as tables next to run_data.json
+    if node_metrics is not None:
+        run_data["node_metrics_summary"] = node_metrics.save(run_dir)
+
     # Save to file in the run directory
     filename = run_dir / "run_data.json"
     with open(filename, "w") as f:
@@ -91,12 +127,16 @@ def init_session_state():
 
     if "existing_tests" not in st.session_state:
         st.session_state.existing_tests = [""]
+    if "test_suite" not in st.session_state:
+        st.session_state.test_suite = TestSuite()
     if "model_choice" not in st.session_state:
         st.session_state.model_choice = config["model_choice"]
     if "max_improvements" not in st.session_state:
         st.session_state.max_improvements = config["max_improvements"]
     if "max_tests" not in st.session_state:
         st.session_state.max_tests = config.get("max_tests", 10)
+    if "selective_reexecution" not in st.session_state:
+        st.session_state.selective_reexecution = config.get("selective_reexecution", True)
     if "settings" not in st.session_state:
         st.session_state.settings = {
             "llm": {
@@ -105,7 +145,28 @@ def init_session_state():
                 "similarity_comparison_count": config.get(
                     "similarity_comparison_count", 1
                 ),
+                "batch_size": config.get("batch_size", 1),
+                "graph_topology": config.get("graph_topology", "default"),
+                "backend": config.get("backend", "auto"),
+                "streaming": config.get("streaming", False),
+                "static_smell_check": config.get("static_smell_check", True),
+                "path_targeting": config.get("path_targeting", True),
+                "synthesize_tests": config.get("synthesize_tests", True),
+                "fuzz_tests": config.get("fuzz_tests", True),
+                "fuzz_time_budget_s": config.get("fuzz_time_budget_s", 2.0),
+                "duplicate_check": config.get("duplicate_check", True),
+                "duplicate_threshold": config.get("duplicate_threshold", 0.85),
+                "similarity_retrieval": config.get("similarity_retrieval", "embedding"),
+                "few_shot_retrieval": config.get("few_shot_retrieval", "edge_case"),
+                "few_shot_count": config.get("few_shot_count", 3),
+                "node_models": config.get("node_models", {}),
+                "escalation_model": config.get("escalation_model"),
+                "embedding_backend": config.get("embedding_backend", "auto"),
+                "embedding_cache_dir": config.get("embedding_cache_dir", ".cache/embeddings"),
             },
+            "rate_limits": config.get("rate_limits", {}),
+            "vector_store": config.get("vector_store", {}),
+            "model_prices": config.get("model_prices", {}),
             "api": {
                 "openai_api_key": api_config.openai_api_key.get_secret_value(),
                 "groq_api_key": api_config.groq_api_key.get_secret_value(),
@@ -154,6 +215,40 @@ def remove_test_input(index: int):
         st.session_state.existing_tests = [""]
 
 
+def get_test_suite() -> TestSuite:
+    """Sync the test suite with the test inputs (only changed inputs are parsed, metadata of kept tests remains)"""
+    return st.session_state.test_suite.sync(st.session_state.existing_tests)
+
+
+def accept_test(test: str, origins: Optional[Dict[str, str]] = None):
+    """
+    Add a generated test to the test inputs and to the suite with its origin (the synthesizer, the fuzzer or the model
+    that wrote it, from the "origins" of the generation result)
+    """
+    st.session_state.test_suite.add(
+        test, origin=st.session_state.settings["llm"]["model_name"], origins=origins
+    )
+    st.session_state.existing_tests.append(test)
+
+
+def analyze_suite_coverage(test_suite: TestSuite, code_to_test: str) -> tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Coverage matrix of the suite for the code under test
+
+    With change-aware re-execution, only the tests without coverage data (e.g. new tests) and the tests covering
+    lines changed since the last analysis run, the coverage of the other tests is moved to the new line numbers.
+    """
+    analyzed_code = st.session_state.get("analyzed_code")
+    if st.session_state.selective_reexecution and analyzed_code is not None:
+        matrix_df, raw_results = compute_selective_coverage(test_suite, analyzed_code, code_to_test)
+    else:
+        matrix_df, raw_results = compute_test_coverage(code_to_test, test_suite.sources, test_names=test_suite.names)
+        test_suite.update_coverage(raw_results)
+    st.session_state.analyzed_code = code_to_test
+    st.session_state.selection_report = raw_results.get("selection_report")
+    return matrix_df, raw_results
+
+
 def get_available_runs():
     """Get a list of all available runs with their data"""
     runs_dir = Path("runs")
@@ -204,9 +299,18 @@ def load_run_data(run_data: dict):
     """Load code and tests from a previous run and reset output state"""
     # Load code and tests
     st.session_state.existing_tests = run_data["existing_tests"].copy()
+    # Runs saved with their test suite keep the ids and metadata of the tests
+    st.session_state.test_suite = TestSuite.from_records(run_data.get("test_suite", []))
+    # The saved coverage belongs to the saved code
+    st.session_state.analyzed_code = run_data["code_to_test"]
 
     # Add the generated test case to existing tests if it exists
     if "generated_test_case" in run_data and run_data["generated_test_case"]:
+        st.session_state.test_suite.add(
+            run_data["generated_test_case"],
+            origin=run_data.get("model", "user"),
+            origins=run_data.get("generated_test_origins"),
+        )
         st.session_state.existing_tests.append(run_data["generated_test_case"])
 
     # Create a mock test case to enable the test execution functionality
@@ -219,46 +323,34 @@ def load_run_data(run_data: dict):
 
 def execute_test_script(
     test_script: str,
+    strategy: str = "declaration",
+    stop_on_failure: bool = False,
+    coverage_target: Optional[float] = None,
 ) -> tuple[bool, str, pd.DataFrame, Dict[str, Any]]:
-    """Execute a test script and return the results, coverage matrix, and raw metrics"""
+    """
+    Execute a test script and return the results, coverage matrix, and raw metrics
+
+    The tests run in the order of the prioritization strategy (by the coverage and durations of the last run) and
+    stop after the first failing test or once the coverage target is reached if requested. The raw metrics hold the
+    execution report (APFD, APFC, ...) under "execution_report".
+    """
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_dir_path = Path(temp_dir)
 
         # Get current code and tests
         current_code = st.session_state["code_to_test_input"]
-        existing_tests = [
-            test for test in st.session_state.existing_tests if test.strip()
-        ]
-
-        # Process existing tests and ensure proper indentation
-        processed_tests = []
-        for test in existing_tests:
-            extracted_tests = extract_unit_tests(test)
-            for extracted_test in extracted_tests:
-                # Ensure consistent indentation for the test body
-                lines = extracted_test.split("\n")
-                if len(lines) > 1:
-                    # Keep first line (def statement) as is
-                    indented_lines = [lines[0]]
-                    # Indent all other lines with 4 spaces if they're not empty
-                    for line in lines[1:]:
-                        if line.strip():
-                            # Calculate original indentation
-                            original_indent = len(line) - len(line.lstrip())
-                            # Add 4 spaces plus original indentation
-                            indented_lines.append(
-                                "    " + " " * original_indent + line.lstrip()
-                            )
-                        else:
-                            indented_lines.append("")
-                    processed_tests.append("\n".join(indented_lines))
-                else:
-                    processed_tests.append(extracted_test)
+        test_suite = get_test_suite()
+        # Coverage of the last analysis: tests touching edited lines have none (and run first), the others are remapped
+        analyzed_code = st.session_state.get("analyzed_code")
+        if analyzed_code is not None and analyzed_code != current_code:
+            select_tests(test_suite, analyzed_code, current_code)
+        st.session_state.analyzed_code = current_code
+        ordered_tests = test_suite.prioritize(strategy)
+        # Durations recorded in the last run, for the cost-cognizant APFD of the tests that do not run
+        recorded_durations = [test.duration_s for test in ordered_tests]
 
         # Create the combined test script
-        combined_test_script = assemble_test_script(
-            "code_to_test.py", processed_tests, ""
-        )
+        combined_test_script = test_suite.script()
 
         # Write files
         code_file = temp_dir_path / "code_to_test.py"
@@ -279,26 +371,38 @@ def execute_test_script(
             current_dir = os.getcwd()
             os.chdir(temp_dir_path)
 
-            # Run tests and get results
+            # Generate coverage matrix, the tests run one by one in prioritized order until a stop condition holds
+            matrix_df, raw_results = analyze_test_coverage(
+                str(code_file),
+                "combined_test_script",
+                [test.name for test in ordered_tests],
+                stop_on_failure,
+                coverage_target,
+            )
+            executed_tests = ordered_tests[: len(raw_results["test_names"])]
+            test_suite.update_coverage(raw_results, executed_tests)
+            raw_results["execution_report"] = execution_report(
+                strategy,
+                raw_results["outcomes"],
+                [test.covered_lines for test in executed_tests],
+                raw_results["durations"],
+                len(ordered_tests),
+                raw_results["stopped"],
+                raw_results["durations"] + recorded_durations[len(executed_tests) :],
+            )
+
+            # Run the executed tests in the same order and get results
+            test_names = [
+                f"combined_test_script.{TEST_CLASS_NAME}.{test.name}"
+                for test in executed_tests
+            ]
             result = subprocess.run(
-                ["python", "-m", "unittest", "combined_test_script.py"],
+                ["python", "-m", "unittest", *(test_names or ["combined_test_script.py"])],
                 capture_output=True,
                 text=True,
                 env=env,
             )
-
-            # Get test case names from the combined script
-            test_cases = []
-            for test in processed_tests:
-                if test.startswith("def test_"):
-                    test_name = test.split("(")[0].replace("def ", "")
-                    test_cases.append(test_name)
-
-            # Generate coverage matrix
             success = result.returncode == 0
-            matrix_df, raw_results = analyze_test_coverage(
-                str(code_file), "combined_test_script", test_cases
-            )
 
             # Extract uncovered lines
             uncovered_lines = []
@@ -318,6 +422,32 @@ def execute_test_script(
             return False, str(e), pd.DataFrame(), {}
 
 
+def execution_options(key: str) -> tuple[str, bool, Optional[float]]:
+    """Execution order and early stop conditions for running the existing tests"""
+    cols = st.columns(3)
+    strategy = cols[0].selectbox(
+        "Execution Order",
+        PRIORITIZATION_STRATEGIES,
+        key=f"{key}_strategy",
+        help="declaration: suite order, additional_coverage: most not yet covered lines first, "
+        "coverage_per_time: most not yet covered lines per second of the last run first",
+    )
+    stop_on_failure = cols[1].checkbox(
+        "Stop on First Failure", key=f"{key}_stop_on_failure"
+    )
+    coverage_target = None
+    if cols[2].checkbox("Stop at Coverage Target", key=f"{key}_stop_at_target"):
+        coverage_target = cols[2].slider(
+            "Coverage Target",
+            min_value=0.1,
+            max_value=1.0,
+            value=1.0,
+            step=0.05,
+            key=f"{key}_coverage_target",
+        )
+    return strategy, stop_on_failure, coverage_target
+
+
 def format_test_code(test_code: str) -> str:
     """Format test code using black."""
     if not test_code.strip():
@@ -335,11 +465,14 @@ def format_test_code(test_code: str) -> str:
 def clear_input_fields():
     """Clear all input fields and start a new run"""
     st.session_state.existing_tests = [""]  # Reset to single empty test
+    st.session_state.test_suite = TestSuite()
     st.session_state.code_to_test_input = ""  # Clear code input
     st.session_state.last_generated_test = None
     st.session_state.last_validation_error = None
     st.session_state.pending_test = None
     st.session_state.auto_generating = False
+    st.session_state.analyzed_code = None
+    st.session_state.selection_report = None
     if "loaded_code" in st.session_state:
         del st.session_state.loaded_code
     if "loaded_combined_test" in st.session_state:
@@ -349,6 +482,10 @@ def clear_input_fields():
     if hasattr(setup_logging, 'current_run_dir'):
         delattr(setup_logging, 'current_run_dir')
 
+    # Node metrics are collected per run
+    if st.session_state.generator:
+        st.session_state.generator.node_metrics.reset()
+
 
 def main():
     """Main Streamlit application"""
@@ -398,10 +535,40 @@ def main():
         st.divider()
 
         st.subheader("Model")
+        model_options = ["gpt-4o", "gpt-4o-mini", "o1-mini", "o1"]
         model_choice = st.selectbox(
             "Select Model",
-            ["gpt-4o", "gpt-4o-mini", "o1-mini", "o1"],
-            index=["gpt-4o", "gpt-4o-mini", "o1-mini", "o1"].index(st.session_state.model_choice),
+            model_options,
+            index=model_options.index(st.session_state.model_choice),
+        )
+        with st.expander("Models per Node", expanded=False):
+            node_models = {}
+            for node in LLM_NODES:
+                current = st.session_state.settings["llm"]["node_models"].get(node)
+                choice = st.selectbox(
+                    node,
+                    ["Default"] + model_options,
+                    index=model_options.index(current) + 1 if current in model_options else 0,
+                    key=f"node_model_{node}",
+                )
+                if choice != "Default":
+                    node_models[node] = choice
+            escalation_options = ["None"] + model_options
+            current_escalation = st.session_state.settings["llm"]["escalation_model"]
+            escalation_choice = st.selectbox(
+                "Escalation Model",
+                escalation_options,
+                index=escalation_options.index(current_escalation) if current_escalation in model_options else 0,
+                help="Regenerate a test with this model only if it fails or adds no coverage",
+            )
+            escalation_model = None if escalation_choice == "None" else escalation_choice
+        embedding_options = ["auto", "local", "openai", "jina"]
+        embedding_backend = st.selectbox(
+            "Embedding Model",
+            embedding_options,
+            index=embedding_options.index(st.session_state.settings["llm"]["embedding_backend"]),
+            help="auto uses the embeddings of the model provider, local computes code embeddings offline "
+            "(token and AST n-grams with TF-IDF weighting)",
         )
         max_improvements = st.slider(
             "Maximum Test Improvements",
@@ -424,6 +591,82 @@ def main():
             value=25,
             help="Maximum number of tests to generate when aiming for 100% coverage",
         )
+        batch_size = st.slider(
+            "Tests per LLM Call",
+            min_value=1,
+            max_value=5,
+            value=st.session_state.settings["llm"]["batch_size"],
+            help="Number of tests requested per LLM call, each targeting a different uncovered region (1 uses the regular single test graph)",
+        )
+        graph_topology = st.selectbox(
+            "Graph Topology",
+            GRAPH_TOPOLOGIES,
+            index=GRAPH_TOPOLOGIES.index(st.session_state.settings["llm"]["graph_topology"]),
+            help="merged_review fixes similarities and routes on test smells in a single structured LLM call",
+        )
+        streaming = st.checkbox(
+            "Stream LLM Output",
+            value=st.session_state.settings["llm"]["streaming"],
+            help="Show partial tests in the generation progress while the LLM is still writing them",
+        )
+        static_smell_check = st.checkbox(
+            "Static Smell Pre-Screen",
+            value=st.session_state.settings["llm"]["static_smell_check"],
+            help="Detect mechanically checkable test smells locally, tests with such smells are fixed without asking the LLM router",
+        )
+        path_targeting = st.checkbox(
+            "Target Control-Flow Paths",
+            value=st.session_state.settings["llm"]["path_targeting"],
+            help="Let every test target a whole feasible path through the code instead of the first uncovered line",
+        )
+        synthesize = st.checkbox(
+            "Synthesize Tests Locally",
+            value=st.session_state.settings["llm"]["synthesize_tests"],
+            help="Solve simple branch conditions (equalities, comparisons, popped inputs) without the LLM, "
+            "the LLM only writes tests for the remaining branches",
+        )
+        fuzz = st.checkbox(
+            "Fuzz Before LLM Calls",
+            value=st.session_state.settings["llm"]["fuzz_tests"],
+            help="Run a coverage-guided fuzzer on the functions with uncovered lines and keep a minimized set of "
+            "inputs as tests before asking the LLM",
+        )
+        duplicate_check = st.checkbox(
+            "Reject Duplicate Tests",
+            value=st.session_state.settings["llm"]["duplicate_check"],
+            help="Compare new tests with the stored tests by their normalized syntax tree and write exact or near "
+            "duplicates again before spending embedding and LLM calls on them",
+        )
+        retrieval_options = ["embedding", "coverage"]
+        similarity_retrieval = st.selectbox(
+            "Similarity Retrieval",
+            retrieval_options,
+            index=retrieval_options.index(st.session_state.settings["llm"]["similarity_retrieval"]),
+            help="coverage executes the new test and shows the LLM the existing tests covering the most similar "
+            "lines (no embedding calls) instead of the most similar test code",
+        )
+        few_shot_options = ["edge_case", "coverage"]
+        few_shot_retrieval = st.selectbox(
+            "Prompt Example Retrieval",
+            few_shot_options,
+            index=few_shot_options.index(st.session_state.settings["llm"]["few_shot_retrieval"]),
+            help="coverage shows the LLM the existing tests covering the lines just before the targeted lines "
+            "(e.g. the prefix of the same path), which the LLM can extend by one step, instead of edge case tests",
+        )
+        few_shot_count = st.slider(
+            "Prompt Examples",
+            min_value=1,
+            max_value=10,
+            value=st.session_state.settings["llm"]["few_shot_count"],
+            disabled=few_shot_retrieval != "coverage",
+            help="Number of prompt examples retrieved by coverage (the edge case query uses the similarity count)",
+        )
+        selective_reexecution = st.checkbox(
+            "Change-Aware Re-Execution",
+            value=st.session_state.selective_reexecution,
+            help="After the code under test is edited, re-run only the tests covering changed lines and move the "
+            "coverage of the other tests to the new line numbers",
+        )
 
         # Save config when changed
         if (
@@ -435,12 +678,43 @@ def main():
                 "max_tests" not in st.session_state
                 or max_tests != st.session_state.max_tests
             )
+            or batch_size != st.session_state.settings["llm"]["batch_size"]
+            or graph_topology != st.session_state.settings["llm"]["graph_topology"]
+            or streaming != st.session_state.settings["llm"]["streaming"]
+            or static_smell_check != st.session_state.settings["llm"]["static_smell_check"]
+            or path_targeting != st.session_state.settings["llm"]["path_targeting"]
+            or synthesize != st.session_state.settings["llm"]["synthesize_tests"]
+            or fuzz != st.session_state.settings["llm"]["fuzz_tests"]
+            or duplicate_check != st.session_state.settings["llm"]["duplicate_check"]
+            or similarity_retrieval != st.session_state.settings["llm"]["similarity_retrieval"]
+            or few_shot_retrieval != st.session_state.settings["llm"]["few_shot_retrieval"]
+            or few_shot_count != st.session_state.settings["llm"]["few_shot_count"]
+            or node_models != st.session_state.settings["llm"]["node_models"]
+            or escalation_model != st.session_state.settings["llm"]["escalation_model"]
+            or embedding_backend != st.session_state.settings["llm"]["embedding_backend"]
+            or selective_reexecution != st.session_state.selective_reexecution
         ):
             config = {
+                **load_config(),  # keep settings without a sidebar control (e.g. rate_limits)
                 "model_choice": model_choice,
                 "max_improvements": max_improvements,
                 "similarity_comparison_count": similarity_count,
                 "max_tests": max_tests,
+                "batch_size": batch_size,
+                "graph_topology": graph_topology,
+                "streaming": streaming,
+                "static_smell_check": static_smell_check,
+                "path_targeting": path_targeting,
+                "synthesize_tests": synthesize,
+                "fuzz_tests": fuzz,
+                "duplicate_check": duplicate_check,
+                "similarity_retrieval": similarity_retrieval,
+                "few_shot_retrieval": few_shot_retrieval,
+                "few_shot_count": few_shot_count,
+                "node_models": node_models,
+                "escalation_model": escalation_model,
+                "embedding_backend": embedding_backend,
+                "selective_reexecution": selective_reexecution,
             }
             save_config(config)
             st.session_state.model_choice = model_choice
@@ -449,6 +723,24 @@ def main():
                 "similarity_comparison_count"
             ] = similarity_count
             st.session_state.max_tests = max_tests
+            st.session_state.settings["llm"]["batch_size"] = batch_size
+            st.session_state.settings["llm"]["graph_topology"] = graph_topology
+            st.session_state.settings["llm"]["streaming"] = streaming
+            st.session_state.settings["llm"]["static_smell_check"] = static_smell_check
+            st.session_state.settings["llm"]["path_targeting"] = path_targeting
+            st.session_state.settings["llm"]["synthesize_tests"] = synthesize
+            st.session_state.settings["llm"]["fuzz_tests"] = fuzz
+            st.session_state.settings["llm"]["duplicate_check"] = duplicate_check
+            st.session_state.settings["llm"]["similarity_retrieval"] = similarity_retrieval
+            st.session_state.settings["llm"]["few_shot_retrieval"] = few_shot_retrieval
+            st.session_state.settings["llm"]["few_shot_count"] = few_shot_count
+            st.session_state.settings["llm"]["node_models"] = node_models
+            st.session_state.settings["llm"]["escalation_model"] = escalation_model
+            if embedding_backend != st.session_state.settings["llm"]["embedding_backend"]:
+                # The vector store has to be rebuilt with the new embedding model
+                st.session_state.generator = None
+            st.session_state.settings["llm"]["embedding_backend"] = embedding_backend
+            st.session_state.selective_reexecution = selective_reexecution
 
     # Main content
     col1, col2 = st.columns([1, 1])
@@ -530,8 +822,9 @@ def main():
                             for test in st.session_state.existing_tests
                             if test.strip()
                         ]
-                        st.session_state.existing_tests.append(
-                            st.session_state.pending_test
+                        accept_test(
+                            st.session_state.pending_test,
+                            st.session_state.get("pending_origins"),
                         )
                         st.session_state.pending_test = "Applied"
                         st.rerun()
@@ -553,13 +846,14 @@ def main():
                 st.code(st.session_state.loaded_combined_test, language="python")
 
             # Add the "Run Existing Unit Tests" button when a run is loaded
+            loaded_options = execution_options("loaded_run")
             run_tests_loaded = st.button(
                 "Run Existing Unit Tests", type="secondary", icon="▶️"
             )
             if run_tests_loaded:
                 with st.spinner("Running tests..."):
                     success, output, matrix_df, raw_results = execute_test_script(
-                        st.session_state.loaded_combined_test
+                        st.session_state.loaded_combined_test, *loaded_options
                     )
                 if success:
                     st.success("✅ All tests passed!")
@@ -581,14 +875,8 @@ def main():
                 )
 
                 # Process existing tests
-                existing_tests = [
-                    test for test in st.session_state.existing_tests if test.strip()
-                ]
-                processed_tests = []
-                for test in existing_tests:
-                    processed_tests.extend(extract_unit_tests(test))
-
-                existing_tests_str = "\n".join(processed_tests)
+                test_suite = get_test_suite()
+                processed_tests = test_suite.sources
 
                 # Initialize generator
                 if not st.session_state.generator:
@@ -596,46 +884,20 @@ def main():
                         settings, (detailed_logger, minimal_logger)
                     )
 
-                st.session_state.generator.initialize_vector_store(existing_tests_str)
+                st.session_state.generator.initialize_vector_store(test_suite.records)
 
                 # Get coverage matrix and uncovered lines before generating test
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    temp_dir_path = Path(temp_dir)
-
-                    # Create the combined test script
-                    combined_test_script = assemble_test_script(
-                        "code_to_test.py", processed_tests, ""
-                    )
-
-                    # Write files
-                    code_file = temp_dir_path / "code_to_test.py"
-                    test_file = temp_dir_path / "combined_test_script.py"
-
-                    with open(code_file, "w") as f:
-                        f.write(code_to_test)
-
-                    with open(test_file, "w") as f:
-                        f.write(combined_test_script)
+                matrix_df, raw_results = analyze_suite_coverage(test_suite, code_to_test)
+                uncovered_lines = raw_results["uncovered_lines"]
 
-                    # Get test case names
-                    test_cases = []
-                    for test in processed_tests:
-                        if test.startswith("def test_"):
-                            test_name = test.split("(")[0].replace("def ", "")
-                            test_cases.append(test_name)
-
-                    # Generate coverage matrix
-                    matrix_df, raw_results = analyze_test_coverage(
-                        str(code_file), "combined_test_script", test_cases
-                    )
+                # Batch mode asks for several tests per LLM call
+                if settings["llm"]["batch_size"] > 1:
+                    generate = st.session_state.generator.generate_test_batch
+                else:
+                    generate = st.session_state.generator.generate_test
 
-                    # Extract uncovered lines
-                    uncovered_lines = []
-                    for idx, row in matrix_df.iterrows():
-                        if idx != "Col Sum" and row["Coverage"] == 0:
-                            uncovered_lines.append(
-                                {"line_number": idx, "line": row["Code"].strip()}
-                            )
+                # Partial LLM output of the currently streaming node
+                streamed_output = {"node": "", "text": "", "rendered_at": 0.0}
 
                 # Move result storage outside the spinner
                 result = None
@@ -645,12 +907,30 @@ def main():
                         with log_placeholder.container():
                             with st.expander("🔄 Generation Progress", expanded=True):
                                 st.text(log_stream.getvalue())
+                                if streamed_output["text"]:
+                                    st.caption(f"Streaming output of {streamed_output['node']}")
+                                    st.code(
+                                        sanitize_code_output(streamed_output["text"]),
+                                        language="python",
+                                    )
+
+                    def show_streamed_output(node: str, text: str):
+                        """Render the partial LLM output at most every 100ms"""
+                        streamed_output["node"], streamed_output["text"] = node, text
+                        if time.perf_counter() - streamed_output["rendered_at"] >= 0.1:
+                            streamed_output["rendered_at"] = time.perf_counter()
+                            update_logs()
 
-                    result = st.session_state.generator.generate_test(
+                    token_callback = (
+                        show_streamed_output if settings["llm"]["streaming"] else None
+                    )
+
+                    result = generate(
                         code_to_test,
                         matrix_df.to_markdown(index=True),
                         uncovered_lines,
                         log_callback=update_logs,
+                        token_callback=token_callback,
                     )
                     update_logs()
 
@@ -668,6 +948,9 @@ def main():
                         generated_test_case,
                         combined_test_script,
                         log_stream.getvalue(),
+                        st.session_state.generator.node_metrics,
+                        test_suite,
+                        result.get("origins"),
                     )
 
                     # Store results in session state
@@ -681,6 +964,7 @@ def main():
                         st.session_state.auto_generating = True
                         current_coverage = 0.0
                         tests_generated = 0
+                        generation_rounds = 1
 
                         # Initialize with empty list and remove any empty tests
                         st.session_state.existing_tests = [
@@ -694,83 +978,40 @@ def main():
                                 current_coverage < 1.0
                                 and tests_generated < st.session_state.max_tests
                             ):
-                                # Auto-accept the test
-                                st.session_state.existing_tests.append(
-                                    generated_test_case
-                                )
-                                tests_generated = len(
-                                    st.session_state.existing_tests
-                                )  # All tests are non-empty now
-
-                                # Get updated coverage after adding the new test
-                                with tempfile.TemporaryDirectory() as temp_dir:
-                                    temp_dir_path = Path(temp_dir)
-
-                                    # Get all current tests including the newly added one
-                                    all_tests = [
-                                        test
-                                        for test in st.session_state.existing_tests
-                                        if test.strip()
-                                    ]
-                                    processed_tests = []
-                                    for test in all_tests:
-                                        processed_tests.extend(extract_unit_tests(test))
-
-                                    # Create updated combined test script
-                                    updated_combined_script = assemble_test_script(
-                                        "code_to_test.py", processed_tests, ""
-                                    )
+                                # Auto-accept the test (batch mode may not return any)
+                                if generated_test_case.strip():
+                                    accept_test(generated_test_case, result.get("origins"))
+                                # Count test methods, a batch or local result adds several per entry
+                                tests_generated = len(st.session_state.test_suite)
 
-                                    # Write files
-                                    code_file = temp_dir_path / "code_to_test.py"
-                                    test_file = (
-                                        temp_dir_path / "combined_test_script.py"
-                                    )
+                                # Get all current tests including the newly added one
+                                processed_tests = test_suite.sources
 
-                                    with open(code_file, "w") as f:
-                                        f.write(code_to_test)
-
-                                    with open(test_file, "w") as f:
-                                        f.write(updated_combined_script)
-
-                                    # Get test case names
-                                    test_cases = []
-                                    for test in processed_tests:
-                                        if test.startswith("def test_"):
-                                            test_name = test.split("(")[0].replace(
-                                                "def ", ""
-                                            )
-                                            test_cases.append(test_name)
-
-                                    # Generate updated coverage matrix
-                                    matrix_df, raw_results = analyze_test_coverage(
-                                        str(code_file),
-                                        "combined_test_script",
-                                        test_cases,
-                                    )
-                                    current_coverage = raw_results["line_coverage"]
+                                # Get updated coverage after adding the new test
+                                matrix_df, raw_results = analyze_suite_coverage(
+                                    test_suite, code_to_test
+                                )
+                                current_coverage = raw_results["line_coverage"]
 
-                                    # Extract updated uncovered lines for next generation
-                                    uncovered_lines = []
-                                    for idx, row in matrix_df.iterrows():
-                                        if idx != "Col Sum" and row["Coverage"] == 0:
-                                            uncovered_lines.append(
-                                                {"line_number": idx, "line": row["Code"].strip()}
-                                            )
+                                # Extract updated uncovered lines for next generation
+                                uncovered_lines = raw_results["uncovered_lines"]
 
                                 # Break if we've reached our goals
                                 if (
                                     current_coverage >= 1.0
                                     or tests_generated >= st.session_state.max_tests
+                                    or generation_rounds >= st.session_state.max_tests
                                 ):
                                     break
 
                                 # Generate next test if needed with updated uncovered lines
-                                result = st.session_state.generator.generate_test(
+                                generation_rounds += 1
+                                result = generate(
                                     code_to_test,
                                     matrix_df.to_markdown(index=True),
                                     uncovered_lines,  # Pass the updated uncovered lines
                                     log_callback=update_logs,
+                                    token_callback=token_callback,
                                 )
 
                                 if result:
@@ -787,6 +1028,9 @@ def main():
                                         generated_test_case,
                                         combined_test_script,
                                         log_stream.getvalue(),
+                                        st.session_state.generator.node_metrics,
+                                        test_suite,
+                                        result.get("origins"),
                                     )
                                 else:
                                     break  # Stop if test generation failed
@@ -809,6 +1053,7 @@ def main():
                         st.session_state.pending_test = None
                     else:
                         st.session_state.pending_test = generated_test_case
+                        st.session_state.pending_origins = result.get("origins")
 
                     # Force a rerun to update the UI with the new test
                     st.rerun()
@@ -828,31 +1073,156 @@ def main():
             else:
                 st.success("✅ Generated test case passed syntax validation")
 
+            # Execution saved by re-running only the tests affected by code edits
+            selection_report = st.session_state.get("selection_report")
+            if selection_report:
+                st.caption(
+                    f"Coverage analysis re-ran {selection_report.executed} of {selection_report.total} tests "
+                    f"and reused {selection_report.reused} ({selection_report.affected_lines} lines affected by "
+                    f"edits), saving {1000 * selection_report.saved_execution_time_s:.0f}ms of test execution "
+                    f"({selection_report.saved_share:.0%})"
+                )
+
             # Show the generated test case
             with st.expander("Generated Test Case", expanded=True):
                 st.code(st.session_state.pending_test, language="python")
 
-            # Create combined script from only accepted tests
-            existing_tests = [
-                test for test in st.session_state.existing_tests if test.strip()
-            ]
-            processed_tests = []
-            for test in existing_tests:
-                processed_tests.extend(extract_unit_tests(test))
-
-            current_combined_script = assemble_test_script(
-                "code_to_test.py", processed_tests, ""  # Don't include pending test
-            )
+            # Create combined script from only accepted tests (cached until the suite changes)
+            test_suite = get_test_suite()
+            current_combined_script = test_suite.script()  # Don't include pending test
 
             # Show the combined script
             with st.expander("Combined Test Script", expanded=False):
                 st.code(current_combined_script, language="python")
+                # Whole-script isort and black only run on export, the shown script is built from formatted tests
+                run_dir = getattr(setup_logging, "current_run_dir", None)
+                if st.button("Export Test Script", icon="💾", disabled=run_dir is None):
+                    export_file = run_dir / "exported_test_script.py"
+                    export_file.write_text(test_suite.script(format_script=True))
+                    st.success(f"Exported to {export_file}")
+
+            # Remove tests whose covered lines (and arcs) other tests cover as well
+            with st.expander("🧹 Minimize Test Suite", expanded=False):
+                minimize_cols = st.columns(2)
+                include_arcs = minimize_cols[0].checkbox(
+                    "Preserve Branch Coverage",
+                    help="Also keep every executed line transition (arc), not only every covered line",
+                )
+                minimization_method = minimize_cols[1].selectbox(
+                    "Method",
+                    MINIMIZATION_METHODS,
+                    help="greedy set cover with lazy evaluation, exact for small suites (auto: exact if at most "
+                    f"{EXACT_LIMIT} candidate tests remain after removing essential and subsumed tests)",
+                )
+                if st.button("Minimize", icon="🧹", disabled=len(test_suite) < 2):
+                    with st.spinner("Analyzing coverage..."):
+                        code_to_test = st.session_state["code_to_test_input"]
+                        if (
+                            any(test.covered_lines is None for test in test_suite)
+                            or st.session_state.get("analyzed_code") != code_to_test
+                        ):
+                            analyze_suite_coverage(test_suite, code_to_test)
+                        st.session_state.minimization = (
+                            [test.hash for test in test_suite],
+                            test_suite.minimize(include_arcs, minimization_method),
+                        )
+
+                if st.session_state.get("minimization"):
+                    hashes, minimization = st.session_state.minimization
+                    if hashes != [test.hash for test in test_suite]:
+                        # The suite changed since it was minimized
+                        st.session_state.minimization = None
+                    else:
+                        result_cols = st.columns(4)
+                        result_cols[0].metric("Tests", len(minimization.selected), -len(minimization.removed))
+                        result_cols[1].metric("Requirements", minimization.requirements)
+                        result_cols[2].metric("Runtime", f"{1000 * minimization.runtime_s:.1f}ms")
+                        result_cols[3].metric(
+                            "Execution Time Saved",
+                            f"{1000 * minimization.saved_execution_time_s:.1f}ms",
+                            f"{minimization.saved_execution_time_s / minimization.execution_time_s:.0%}"
+                            if minimization.execution_time_s
+                            else None,
+                        )
+                        st.caption(
+                            f"{minimization.method} minimization keeps {len(minimization.selected)} of "
+                            f"{len(hashes)} tests"
+                        )
+                        if minimization.removed:
+                            tests = list(test_suite)
+                            st.code("\n\n".join(tests[i].source for i in minimization.removed), language="python")
+                            if st.button("Remove Redundant Tests", icon="🗑️"):
+                                st.session_state.existing_tests = [tests[i].source for i in minimization.selected]
+                                st.session_state.minimization = None
+                                st.rerun()
+
+            # Show where the time and tokens of this run went
+            if st.session_state.generator:
+                node_metrics = st.session_state.generator.node_metrics.per_node()
+                if not node_metrics.empty:
+                    with st.expander("⏱️ Node Latency and Token Usage", expanded=False):
+                        metric_cols = st.columns(5)
+                        metric_cols[0].metric("Time in Nodes", f"{node_metrics['wall_time_s'].sum():.1f}s")
+                        metric_cols[1].metric("Blocked on LLM", f"{node_metrics['llm_time_s'].sum():.1f}s")
+                        metric_cols[2].metric(
+                            "Tokens",
+                            f"{node_metrics['prompt_tokens'].sum() + node_metrics['completion_tokens'].sum():,}",
+                        )
+                        metric_cols[3].metric("Embedding Calls", int(node_metrics["embedding_calls"].sum()))
+                        streamed_calls = node_metrics["streamed_calls"].sum()
+                        if streamed_calls:
+                            metric_cols[4].metric(
+                                "Mean Time to First Token",
+                                f"{node_metrics['time_to_first_token_s'].sum() / streamed_calls:.2f}s",
+                            )
+                        st.dataframe(node_metrics, use_container_width=True)
+
+                        # LLM calls replaced by local decisions (static smell pre-screen of the router)
+                        savings = st.session_state.generator.node_metrics.skipped_llm_call_savings()
+                        if not savings.empty:
+                            st.caption(
+                                f"Skipped LLM calls: {int(savings['skipped_llm_calls'].sum())} "
+                                f"({savings['skipped_llm_calls'].sum() / savings['decisions'].sum():.0%} of decisions), "
+                                f"~{savings['estimated_time_saved_s'].sum():.1f}s and "
+                                f"~{int(savings['estimated_tokens_saved'].sum()):,} tokens saved"
+                            )
+                            st.dataframe(savings, use_container_width=True)
+
+                        # Candidates rejected by the structural duplicate check (before embedding and LLM calls)
+                        duplicate_checks = int(node_metrics["duplicate_checks"].sum())
+                        if duplicate_checks:
+                            st.caption(
+                                f"Duplicate candidates: {int(node_metrics['duplicates'].sum())} of {duplicate_checks} "
+                                f"({st.session_state.generator.node_metrics.duplicate_rate():.0%})"
+                            )
+
+                        # Token spend and latency per model (per node assignment and escalation)
+                        model_metrics = st.session_state.generator.node_metrics.per_model(
+                            st.session_state.settings.get("model_prices")
+                        )
+                        if not model_metrics.empty:
+                            st.caption("Models")
+                            st.dataframe(model_metrics, use_container_width=True)
+
+                        # Queue wait and retries of the shared provider schedulers
+                        st.caption("Provider schedulers")
+                        st.dataframe(
+                            pd.DataFrame(
+                                [
+                                    scheduler.stats()
+                                    for scheduler in st.session_state.generator.models.schedulers().values()
+                                ]
+                            ),
+                            hide_index=True,
+                            use_container_width=True,
+                        )
 
             # Add Run Tests button and results below the test script
+            options = execution_options("generated")
             if st.button("Run Existing Unit Tests", type="secondary", icon="▶️"):
                 with st.spinner("Running tests..."):
                     success, output, matrix_df, raw_results = execute_test_script(
-                        st.session_state.last_generated_test
+                        st.session_state.last_generated_test, *options
                     )
                 if success:
                     st.success("✅ All tests passed!")
@@ -860,8 +1230,8 @@ def main():
                     st.error("❌ Some tests failed")
 
                 # Display test results and metrics in tabs
-                tab1, tab2, tab3 = st.tabs(
-                    ["Test Output", "Coverage Matrix", "Coverage Details"]
+                tab1, tab2, tab3, tab4 = st.tabs(
+                    ["Test Output", "Coverage Matrix", "Coverage Details", "Execution Order"]
                 )
 
                 with tab1:
@@ -881,6 +1251,44 @@ def main():
                     else:
                         st.success("All lines executed! 🎉")
 
+                with tab4:
+                    report = raw_results.get("execution_report")
+                    if report:
+                        report_cols = st.columns(4)
+                        report_cols[0].metric(
+                            "Executed Tests", f"{report.executed}/{report.total}"
+                        )
+                        report_cols[1].metric(
+                            "APFD", f"{report.apfd:.3f}" if report.apfd is not None else "-"
+                        )
+                        report_cols[2].metric(
+                            "APFDc", f"{report.apfd_c:.3f}" if report.apfd_c is not None else "-"
+                        )
+                        report_cols[3].metric("APFC", f"{report.apfc:.3f}")
+                        if report.stopped:
+                            st.info(
+                                f"Stopped early ({report.stopped.replace('_', ' ')}) after "
+                                f"{report.execution_time_s * 1000:.1f}ms"
+                            )
+                        if report.time_to_first_failure_s is not None:
+                            st.caption(
+                                f"First failure after {report.time_to_first_failure_s * 1000:.1f}ms"
+                            )
+                        st.dataframe(
+                            pd.DataFrame(
+                                {
+                                    "Test": raw_results["test_names"],
+                                    "Outcome": raw_results["outcomes"],
+                                    "Duration (ms)": [
+                                        1000 * (duration or 0.0)
+                                        for duration in raw_results["durations"]
+                                    ],
+                                    "Covered Lines": raw_results["col_sums"],
+                                }
+                            ),
+                            use_container_width=True,
+                        )
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
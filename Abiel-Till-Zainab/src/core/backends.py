@@ -0,0 +1,122 @@
+from typing import Any, Callable, Optional
+
+from langchain.chat_models.base import BaseChatModel
+from langchain_core.embeddings import Embeddings
+
+from core.code_embeddings import CodeEmbeddings
+from core.fake_models import FakeChatModel, HashEmbeddings
+
+# let them stay here eventhough they won't be used in our openai api tiers
+OPENAI_MODELS = ["o1", "o1-mini"]
+
+
+def get_provider(cfg: dict[str, Any], model_name: Optional[str] = None) -> str:
+    """
+    Get the backend provider for a model
+
+    The "backend" setting overrides the provider of the default model (cfg["llm"]["model_name"]); with "auto" (the
+    default) and for the models assigned to nodes or escalation it is inferred from the model name, so cheap and
+    strong models can come from different providers.
+    """
+    model_name = model_name or cfg["llm"]["model_name"]
+    backend = cfg["llm"].get("backend", "auto")
+    if backend != "auto" and model_name == cfg["llm"]["model_name"]:
+        return backend
+
+    model_name = model_name.lower()
+    if model_name.startswith("fake"):
+        return "fake"
+    if "gpt" in model_name or model_name in OPENAI_MODELS:
+        return "openai"
+    return "groq"
+
+
+def _create_openai_chat_model(cfg: dict[str, Any], model_name: str) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model_name,
+        temperature=0.3,
+        top_p=0.95,
+        api_key=cfg["api"]["openai_api_key"],
+        stream_usage=True,  # report token usage when streaming, too
+        max_retries=0,  # retries are handled by the provider scheduler
+    )
+
+
+def _create_groq_chat_model(cfg: dict[str, Any], model_name: str) -> BaseChatModel:
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=model_name,
+        temperature=0.0,
+        api_key=cfg["api"]["groq_api_key"],
+        stop_sequences=None,
+        max_retries=0,  # retries are handled by the provider scheduler
+    )
+
+
+def _create_fake_chat_model(cfg: dict[str, Any], model_name: str) -> BaseChatModel:
+    return FakeChatModel(**{key: value for key, value in cfg.get("fake", {}).items() if key != "embedding_size"})
+
+
+def _create_openai_embedding_model(cfg: dict[str, Any]) -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(api_key=cfg["api"]["openai_api_key"])
+
+
+def _create_jina_embedding_model(cfg: dict[str, Any]) -> Embeddings:
+    from langchain_community.embeddings import JinaEmbeddings
+
+    return JinaEmbeddings(
+        jina_api_key=cfg["api"]["jina_api_key"],
+        model_name="jina-embeddings-v3",
+    )
+
+
+def _create_fake_embedding_model(cfg: dict[str, Any]) -> Embeddings:
+    return HashEmbeddings(size=cfg.get("fake", {}).get("embedding_size", 256))
+
+
+def _create_local_embedding_model(cfg: dict[str, Any]) -> Embeddings:
+    return CodeEmbeddings(**cfg.get("local_embeddings", {}))
+
+
+# Backends by provider (embedding backends can also be selected by name), register additional providers here
+CHAT_BACKENDS: dict[str, Callable[[dict[str, Any], str], BaseChatModel]] = {
+    "openai": _create_openai_chat_model,
+    "groq": _create_groq_chat_model,
+    "fake": _create_fake_chat_model,
+}
+EMBEDDING_BACKENDS: dict[str, Callable[[dict[str, Any]], Embeddings]] = {
+    "openai": _create_openai_embedding_model,
+    "groq": _create_jina_embedding_model,
+    "jina": _create_jina_embedding_model,
+    "fake": _create_fake_embedding_model,
+    "local": _create_local_embedding_model,
+}
+
+
+def create_chat_model(cfg: dict[str, Any], model_name: Optional[str] = None) -> BaseChatModel:
+    """Create the chat model for a model name (defaults to the configured model)"""
+    model_name = model_name or cfg["llm"]["model_name"]
+    provider = get_provider(cfg, model_name)
+    if provider not in CHAT_BACKENDS:
+        raise ValueError(f"Unknown chat model backend: {provider}")
+    return CHAT_BACKENDS[provider](cfg, model_name)
+
+
+def create_embedding_model(cfg: dict[str, Any]) -> Embeddings:
+    """
+    Create the configured embedding model
+
+    The "embedding_backend" setting selects a backend by name (e.g. "local" for the offline code embeddings); with
+    "auto" (the default) the embedding model belongs to the provider of the configured chat model.
+    """
+    backend = cfg["llm"].get("embedding_backend", "auto")
+    if backend == "auto":
+        backend = get_provider(cfg)
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding model backend: {backend}")
+    return EMBEDDING_BACKENDS[backend](cfg)
@@ -0,0 +1,140 @@
+import ast
+import io
+import re
+import textwrap
+import tokenize
+import zlib
+from typing import Iterable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+IDENTIFIER_PARTS = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+SKIPPED_TOKENS = {tokenize.NEWLINE, tokenize.NL, tokenize.INDENT, tokenize.DEDENT, tokenize.COMMENT, tokenize.ENDMARKER}
+# Literals longer than this are represented by their type only
+MAX_LITERAL_LENGTH = 32
+
+
+def _code_tokens(text: str) -> List[str]:
+    """Normalized lexical tokens of Python code (identifier parts, keywords, operators, short literals)"""
+    tokens = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            if token.type in SKIPPED_TOKENS:
+                continue
+            if token.type == tokenize.NAME:
+                tokens.append(token.string)
+                parts = IDENTIFIER_PARTS.findall(token.string)
+                if len(parts) > 1:
+                    tokens.extend(part.lower() for part in parts)
+            elif token.type == tokenize.STRING:
+                tokens.append(f"STR:{token.string}" if len(token.string) <= MAX_LITERAL_LENGTH else "STR")
+            elif token.type == tokenize.NUMBER:
+                tokens.append(f"NUM:{token.string}")
+            else:
+                tokens.append(token.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Incomplete code (e.g. a cut off LLM response), fall back to a simple word split
+        tokens = re.findall(r"[A-Za-z_]\w*|\d+|\S", text)
+    return tokens
+
+
+def _ast_paths(text: str) -> List[List[str]]:
+    """Root-to-node paths of AST node types (calls and attributes carry their name), empty if the code does not parse"""
+    try:
+        tree = ast.parse(textwrap.dedent(text))
+    except SyntaxError:
+        return []
+
+    def label(node: ast.AST) -> str:
+        if isinstance(node, ast.Call):
+            function = node.func
+            name = function.attr if isinstance(function, ast.Attribute) else getattr(function, "id", "")
+            return f"Call:{name}"
+        if isinstance(node, ast.Attribute):
+            return f"Attribute:{node.attr}"
+        if isinstance(node, ast.Compare):
+            return f"Compare:{type(node.ops[0]).__name__}"
+        return type(node).__name__
+
+    paths = []
+    stack = [(tree, [])]
+    while stack:
+        node, path = stack.pop()
+        path = path + [label(node)]
+        paths.append(path)
+        stack.extend((child, path) for child in ast.iter_child_nodes(node))
+    return paths
+
+
+class CodeEmbeddings(Embeddings):
+    """
+    Local embedding model for code (no network requests)
+
+    Features are lexical token uni- and bigrams plus AST node type n-grams along root-to-node paths, hashed (crc32,
+    stable across processes) into `size` buckets. Bucket counts are weighted with sublinear TF and IDF and the vectors
+    are L2-normalized, so the cosine similarity of two tests reflects shared, distinctive code structure.
+
+    The IDF weights are computed by `fit` and frozen until the next `fit`. Vectors embedded before and after a `fit`
+    are not comparable, so only call it when all stored vectors are recomputed (e.g. when the vector store is
+    rebuilt). Without a fit all buckets are weighted equally. `cache_key` identifies the parameters and IDF weights,
+    so persisted vectors are never mixed across fits.
+    """
+
+    def __init__(self, size: int = 1024, token_ngrams: Iterable[int] = (1, 2), ast_ngrams: Iterable[int] = (1, 2, 3)):
+        self.size = size
+        self.token_ngrams = tuple(token_ngrams)
+        self.ast_ngrams = tuple(ast_ngrams)
+        self.idf: Optional[np.ndarray] = None
+
+    @property
+    def cache_key(self) -> str:
+        idf = format(zlib.crc32(self.idf.tobytes()), "08x") if self.idf is not None else "none"
+        ngrams = "".join(map(str, self.token_ngrams)) + "-" + "".join(map(str, self.ast_ngrams))
+        return f"local-{self.size}-{ngrams}-{idf}"
+
+    def features(self, text: str) -> List[str]:
+        """Token and AST n-gram features of a text (prefixed by their kind to keep the feature spaces apart)"""
+        tokens = _code_tokens(text)
+        features = [
+            f"t{n}:" + " ".join(tokens[i : i + n]) for n in self.token_ngrams for i in range(len(tokens) - n + 1)
+        ]
+        for path in _ast_paths(text):
+            features.extend(f"a{n}:" + ">".join(path[-n:]) for n in self.ast_ngrams if len(path) >= n)
+        return features
+
+    def _counts(self, texts: List[str]) -> np.ndarray:
+        counts = np.zeros((len(texts), self.size), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = [zlib.crc32(feature.encode("utf-8")) % self.size for feature in self.features(text)]
+            if buckets:
+                counts[row] = np.bincount(buckets, minlength=self.size)
+        return counts
+
+    def fit(self, texts: List[str]) -> "CodeEmbeddings":
+        """Compute (smoothed) IDF weights from a corpus, an empty corpus resets them to equal weights"""
+        if not texts:
+            self.idf = None
+            return self
+        document_frequency = (self._counts(texts) > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        counts = self._counts(texts)
+        # Sublinear term frequency: 1 + log(count)
+        vectors = np.zeros_like(counts)
+        present = counts > 0
+        vectors[present] = 1 + np.log(counts[present])
+        if self.idf is not None:
+            vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
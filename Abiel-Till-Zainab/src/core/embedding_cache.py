@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.code_processing import get_test_hash
+
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+
+
+class EmbeddingCache:
+    """
+    Append-only on-disk store of embedding vectors by key
+
+    Vectors are float32 rows of a raw file that is read through a memory map, the keys of the rows are kept in a JSON
+    index. Rows are appended before the index is replaced (atomically), so an interrupted write only leaves trailing
+    bytes that are cut off when the cache is opened again.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self.dimension: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / VECTORS_FILE
+
+    def _load(self):
+        if not self._index_path.exists():
+            return
+        index = json.loads(self._index_path.read_text())
+        self.dimension = index["dimension"]
+        self._rows = {key: row for row, key in enumerate(index["keys"])}
+        # Drop rows that were appended without being indexed
+        expected_size = len(self._rows) * self.dimension * np.dtype(np.float32).itemsize
+        if self._vectors_path.exists() and self._vectors_path.stat().st_size > expected_size:
+            os.truncate(self._vectors_path, expected_size)
+        self._map()
+
+    def _map(self):
+        self._vectors = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dimension))
+            if self._rows
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors of the keys, None for keys that are not cached"""
+        with self._lock:
+            return [self._vectors[self._rows[key]].tolist() if key in self._rows else None for key in keys]
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """Append the vectors of keys that are not cached yet"""
+        with self._lock:
+            new = {key: vector for key, vector in zip(keys, vectors) if key not in self._rows}
+            if not new:
+                return
+            rows = np.asarray(list(new.values()), dtype=np.float32)
+            if self.dimension is None:
+                self.dimension = rows.shape[1]
+            elif rows.shape[1] != self.dimension:
+                raise ValueError(f"Cannot cache {rows.shape[1]}-dimensional vectors with {self.dimension} dimensions")
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(rows.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            for key in new:
+                self._rows[key] = len(self._rows)
+            keys_by_row = sorted(self._rows, key=self._rows.get)
+            temporary_path = self._index_path.with_suffix(".tmp")
+            temporary_path.write_text(json.dumps({"dimension": self.dimension, "keys": keys_by_row}))
+            os.replace(temporary_path, self._index_path)
+            self._map()
+
+
+_caches: Dict[Path, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(directory: Path) -> EmbeddingCache:
+    """Shared cache of a directory (one per process, so all generators and Streamlit sessions reuse the memory map)"""
+    directory = Path(directory).resolve()
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = EmbeddingCache(directory)
+        return _caches[directory]
+
+
+def get_model_key(embeddings: Embeddings) -> str:
+    """
+    Identity of an embedding model whose vectors are interchangeable, used as the cache namespace
+
+    Wrappers exposing the wrapped model as `.embeddings` are unwrapped. Models can define their own `cache_key` (e.g.
+    the local code embeddings include their fitted IDF weights), otherwise the class and model name are used.
+    """
+    while hasattr(embeddings, "embeddings"):
+        embeddings = embeddings.embeddings
+    key = getattr(embeddings, "cache_key", None)
+    if key is None:
+        name = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+        size = getattr(embeddings, "size", None)
+        key = "-".join(str(part) for part in (type(embeddings).__name__, name, size) if part is not None)
+    return re.sub(r"[^\w.-]", "_", key)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that persists document and query embeddings by normalized test hash
+
+    Only documents that are not cached for the current model identity are passed to the wrapped model (in one
+    request), so tests are embedded once across Generate clicks, Streamlit reruns and process restarts. Queries are
+    cached separately (models may embed queries differently), so constant queries like the edge case query and
+    repeated searches with an unchanged candidate test are embedded once per model.
+
+    Usage:
+        embeddings = CachedEmbeddings(create_embedding_model(cfg), Path(".cache/embeddings"))
+    """
+
+    def __init__(self, embeddings: Embeddings, directory: Path):
+        self.embeddings = embeddings
+        self.directory = Path(directory)
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        """Cache of the current model identity (changes if e.g. the local embeddings are refitted)"""
+        return get_embedding_cache(self.directory / get_model_key(self.embeddings))
+
+    @property
+    def query_cache(self) -> EmbeddingCache:
+        """Query cache of the current model identity"""
+        return get_embedding_cache(self.directory / get_model_key(self.embeddings) / "queries")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        cache = self.cache
+        keys = [get_test_hash(text) for text in texts]
+        vectors = cache.get_many(keys)
+        missing = {key: text for key, text, vector in zip(keys, texts, vectors) if vector is None}
+        if missing:
+            embedded = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            cache.put_many(list(embedded), list(embedded.values()))
+            vectors = [embedded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        cache = self.query_cache
+        key = get_test_hash(text)
+        vector = cache.get_many([key])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            cache.put_many([key], [vector])
+        return vector
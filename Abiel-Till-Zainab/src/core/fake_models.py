@@ -0,0 +1,207 @@
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Dict, Iterator, List, Literal, Optional, get_args, get_origin
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import BaseModel, Field, PrivateAttr
+
+DEFAULT_TEST_TEMPLATE = '''```python
+def test_offline_generated_case_{index}(self):
+    """Placeholder test returned by the offline fake chat model."""
+    self.assertTrue(True, "Offline fake model placeholder assertion")
+```'''
+
+
+class FakeRateLimitError(Exception):
+    """Simulated rate limit error of the offline fake chat model"""
+
+    status_code = 429
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token) used by the offline fakes"""
+    return max(1, math.ceil(len(text) / 4))
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model returning scripted or template-based tests with a configurable latency
+
+    Scripted responses are returned in order and cycled. Without scripted responses, `template` is formatted with a
+    running `index`. Structured output requests are answered with a valid instance of the requested schema: the last
+    test in the prompt (the one under review) is passed through unchanged and literal fields (e.g. routing decisions)
+    take their preferred or first value.
+
+    The latency of a call is sampled from `latency`, e.g. {"distribution": "lognormal", "mean": 2.0, "sigma": 0.5}.
+    Supported distributions are constant (mean), uniform (low, high), normal (mean, std) and lognormal (mean, sigma).
+    With an `error_rate`, calls fail with a simulated rate limit error (HTTP 429) before returning content.
+    """
+
+    responses: List[str] = Field(default_factory=list)
+    template: str = DEFAULT_TEST_TEMPLATE
+    latency: Dict[str, Any] = Field(default_factory=lambda: {"distribution": "constant", "mean": 0.0})
+    first_token_fraction: float = 0.2
+    preferred_literals: List[str] = Field(default_factory=lambda: ["keep_good_test"])
+    error_rate: float = 0.0
+    seed: int = 0
+
+    _call_count: int = PrivateAttr(default=0)
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency": self.latency, "seed": self.seed}
+
+    def sample_latency(self) -> float:
+        """Sample the latency of a single call in seconds"""
+        distribution = self.latency.get("distribution", "constant")
+        if distribution == "constant":
+            value = self.latency.get("mean", 0.0)
+        elif distribution == "uniform":
+            value = self._rng.uniform(self.latency.get("low", 0.0), self.latency.get("high", 0.0))
+        elif distribution == "normal":
+            value = self._rng.gauss(self.latency.get("mean", 0.0), self.latency.get("std", 0.0))
+        elif distribution == "lognormal":
+            mean = self.latency.get("mean", 1.0)
+            sigma = self.latency.get("sigma", 0.5)
+            # Parametrize by the mean of the distribution instead of the mean of the underlying normal
+            value = self._rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma) if mean > 0 else 0.0
+        else:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        return max(0.0, value)
+
+    def _maybe_fail(self):
+        """Raise a simulated rate limit error with probability `error_rate`"""
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise FakeRateLimitError("Simulated rate limit of the offline fake chat model")
+
+    def _next_response(self, prompt: str, schema: Optional[type] = None) -> str:
+        """Get the next scripted, template or structured response"""
+        self._call_count += 1
+        if schema is not None:
+            return json.dumps(self._structured_response(schema, prompt))
+        if self.responses:
+            return self.responses[(self._call_count - 1) % len(self.responses)]
+        return self.template.format(index=self._call_count)
+
+    def _structured_response(self, schema: type, prompt: str) -> Dict[str, Any]:
+        """Build a valid response for a pydantic schema"""
+        code_blocks = [
+            block for block in re.findall(r"```python\n(.*?)```", prompt, flags=re.DOTALL) if "def test_" in block
+        ]
+        response = {}
+        for name, field in schema.model_fields.items():
+            if get_origin(field.annotation) is Literal:
+                options = get_args(field.annotation)
+                response[name] = next((option for option in self.preferred_literals if option in options), options[0])
+            elif name == "unit_test":
+                response[name] = code_blocks[-1].strip() if code_blocks else ""
+            else:
+                response[name] = "No test smells found."
+        return response
+
+    def _make_message(self, prompt: str, content: str) -> AIMessage:
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": "fake"},
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        time.sleep(self.sample_latency())
+        self._maybe_fail()
+        content = self._next_response(prompt, kwargs.get("structured_schema"))
+        return ChatResult(generations=[ChatGeneration(message=self._make_message(prompt, content))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        latency = self.sample_latency()
+        time.sleep(latency * self.first_token_fraction)
+        self._maybe_fail()
+        content = self._next_response(prompt, kwargs.get("structured_schema"))
+        pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(latency * (1 - self.first_token_fraction) / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+        usage = self._make_message(prompt, content).usage_metadata
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    def with_structured_output(self, schema: type, *, include_raw: bool = False, **kwargs: Any) -> Runnable:
+        """Return a runnable producing instances of a pydantic schema (dict schemas are not supported)"""
+
+        def parse(message: AIMessage) -> Any:
+            parsed = schema.model_validate_json(str(message.content))
+            if include_raw:
+                return {"raw": message, "parsed": parsed, "parsing_error": None}
+            return parsed
+
+        return self.bind(structured_schema=schema) | RunnableLambda(parse)
+
+
+class HashEmbeddings(BaseModel, Embeddings):
+    """
+    Deterministic offline embedding model based on feature hashing
+
+    Word tokens are hashed with blake2b (stable across processes) into a signed bag-of-words vector of `size`
+    dimensions, which is L2-normalized. Similar texts therefore get similar vectors, unlike random fake embeddings.
+    """
+
+    size: int = 256
+
+    def _token_features(self, text: str) -> List[str]:
+        return re.findall(r"[A-Za-z_]\w*|\d+|\S", text)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for feature in self._token_features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.size] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = math.sqrt(sum(component * component for component in vector))
+        return [component / norm for component in vector] if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,616 @@
+import ast
+import random
+import string
+import time
+from types import CodeType
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.synthesizer import SynthesizedCase, describe_lines, render_test_case
+from utils.code_processing import assemble_test_script
+from utils.control_flow import get_line_owners
+from utils.tracing import Edge, TraceResult, load_code, trace_call
+
+# Default budget of a fuzzing run (shared by all fuzzed functions)
+MAX_EXECUTIONS = 50000
+TIME_BUDGET_S = 5.0
+# Stop fuzzing a function after this many executions without new edges
+PLATEAU_EXECUTIONS = 5000
+# Upper bounds for generated inputs and the number of stacked mutations per execution
+MAX_LENGTH = 8
+MAX_STACKED_MUTATIONS = 4
+# Executions spent on shrinking the inputs of a kept corpus entry
+MAX_SHRINK_EXECUTIONS = 200
+
+SEQUENCE_KINDS = {"list", "tuple_of", "set"}
+TYPE_NAMES = {
+    "int": "int",
+    "float": "float",
+    "str": "str",
+    "bool": "bool",
+    "bytes": "bytes",
+    "none": "none",
+    "nonetype": "none",
+    "list": "list",
+    "sequence": "list",
+    "iterable": "list",
+    "tuple": "tuple_of",
+    "set": "set",
+    "frozenset": "set",
+    "dict": "dict",
+    "mapping": "dict",
+}
+PYTHON_TYPES = {"float": float, "str": str, "bool": bool, "bytes": bytes, "list": list, "set": set, "dict": dict}
+
+
+@dataclass(frozen=True)
+class TypeSpec:
+    """Input type of a parameter, parsed from its type hint (e.g. tuple(int, int) for Tuple[int, int])"""
+
+    kind: str
+    args: Tuple["TypeSpec", ...] = ()
+
+
+ANY = TypeSpec("any")
+
+
+def parse_type_hint(annotation: Optional[ast.expr]) -> TypeSpec:
+    """Parse a type hint like Tuple[int, int], List[str] or Optional[Dict[str, int]] (unknown types are any)"""
+    if annotation is None:
+        return ANY
+    if isinstance(annotation, ast.Constant):
+        if annotation.value is None:
+            return TypeSpec("none")
+        if isinstance(annotation.value, str):
+            try:
+                return parse_type_hint(ast.parse(annotation.value, mode="eval").body)
+            except SyntaxError:
+                return ANY
+        return ANY
+    if isinstance(annotation, ast.BinOp) and isinstance(annotation.op, ast.BitOr):
+        return TypeSpec("union", (parse_type_hint(annotation.left), parse_type_hint(annotation.right)))
+    if isinstance(annotation, ast.Subscript):
+        base = ast.unparse(annotation.value).split(".")[-1].lower()
+        elements = annotation.slice.elts if isinstance(annotation.slice, ast.Tuple) else [annotation.slice]
+        if base == "optional":
+            return TypeSpec("optional", (parse_type_hint(elements[0]),))
+        if base == "union":
+            return TypeSpec("union", tuple(parse_type_hint(element) for element in elements))
+        if base == "tuple":
+            if len(elements) == 2 and isinstance(elements[1], ast.Constant) and elements[1].value is Ellipsis:
+                return TypeSpec("tuple_of", (parse_type_hint(elements[0]),))
+            return TypeSpec("tuple", tuple(parse_type_hint(element) for element in elements))
+        kind = TYPE_NAMES.get(base)
+        if kind == "dict":
+            key, value = (elements + [None, None])[:2]
+            return TypeSpec("dict", (parse_type_hint(key), parse_type_hint(value)))
+        if kind in SEQUENCE_KINDS:
+            return TypeSpec(kind, (parse_type_hint(elements[0]),))
+        return ANY
+    kind = TYPE_NAMES.get(ast.unparse(annotation).split(".")[-1].lower())
+    if kind is None:
+        return ANY
+    if kind in SEQUENCE_KINDS:
+        return TypeSpec(kind, (ANY,))
+    if kind == "dict":
+        return TypeSpec(kind, (ANY, ANY))
+    return TypeSpec(kind)
+
+
+@dataclass
+class Dictionary:
+    """Literals harvested from the code under test, used as likely interesting input values"""
+
+    ints: List[int] = field(default_factory=lambda: [0, 1, -1])
+    floats: List[float] = field(default_factory=lambda: [0.0, 0.5, -1.0])
+    strs: List[str] = field(default_factory=lambda: [""])
+    tuples: List[tuple] = field(default_factory=list)
+
+    @classmethod
+    def from_code(cls, tree: ast.AST) -> "Dictionary":
+        dictionary = cls()
+        docstrings = {
+            id(node.body[0].value)
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+            and node.body
+            and isinstance(node.body[0], ast.Expr)
+            and isinstance(node.body[0].value, ast.Constant)
+        }
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Tuple):
+                try:
+                    value = ast.literal_eval(node)
+                except ValueError:
+                    continue
+                if value not in dictionary.tuples:
+                    dictionary.tuples.append(value)
+            elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+                if isinstance(node.operand, ast.Constant) and type(node.operand.value) in (int, float):
+                    dictionary._add(-node.operand.value)
+            elif isinstance(node, ast.Constant) and id(node) not in docstrings:
+                dictionary._add(node.value)
+        return dictionary
+
+    def _add(self, value: Any):
+        if type(value) is int:
+            # Boundary values around every integer literal
+            for candidate in (value - 1, value, value + 1):
+                if candidate not in self.ints:
+                    self.ints.append(candidate)
+        elif type(value) is float and value not in self.floats:
+            self.floats.append(value)
+        elif type(value) is str and value not in self.strs:
+            self.strs.append(value)
+
+
+def _matches(spec: TypeSpec, value: Any) -> bool:
+    """Check if a value is an instance of the (outer) type of a spec"""
+    kind = spec.kind
+    if kind == "any":
+        return True
+    if kind == "none":
+        return value is None
+    if kind == "optional":
+        return value is None or _matches(spec.args[0], value)
+    if kind == "union":
+        return any(_matches(member, value) for member in spec.args)
+    if kind == "int":
+        return type(value) is int
+    if kind == "tuple":
+        return isinstance(value, tuple) and len(value) == len(spec.args)
+    if kind == "tuple_of":
+        return isinstance(value, tuple)
+    return isinstance(value, PYTHON_TYPES.get(kind, object))
+
+
+class InputGenerator:
+    """Generates and mutates values of parsed type hints, biased towards the literals of the code under test"""
+
+    def __init__(self, dictionary: Dictionary, rng: random.Random):
+        self.dictionary = dictionary
+        self.rng = rng
+
+    def default(self, spec: TypeSpec) -> Any:
+        """Neutral value of a type (0, "", empty containers, None)"""
+        kind = spec.kind
+        if kind == "tuple":
+            return tuple(self.default(element) for element in spec.args)
+        return {
+            "int": 0,
+            "float": 0.0,
+            "str": "",
+            "bool": False,
+            "bytes": b"",
+            "list": [],
+            "tuple_of": (),
+            "set": set(),
+            "dict": {},
+        }.get(kind)
+
+    def generate(self, spec: TypeSpec) -> Any:
+        """Random value of a type"""
+        rng, kind = self.rng, spec.kind
+        if kind == "int":
+            return rng.choice(self.dictionary.ints) if rng.random() < 0.7 else rng.randint(-100, 100)
+        if kind == "float":
+            return rng.choice(self.dictionary.floats) if rng.random() < 0.5 else round(rng.uniform(-100, 100), 2)
+        if kind == "str":
+            return rng.choice(self.dictionary.strs) if rng.random() < 0.8 else self._random_string()
+        if kind == "bool":
+            return rng.random() < 0.5
+        if kind == "bytes":
+            return self._random_string().encode()
+        if kind == "none":
+            return None
+        if kind == "optional":
+            return None if rng.random() < 0.2 else self.generate(spec.args[0])
+        if kind == "union":
+            return self.generate(rng.choice(spec.args))
+        if kind == "tuple":
+            candidates = [
+                value
+                for value in self.dictionary.tuples
+                if len(value) == len(spec.args) and all(map(_matches, spec.args, value))
+            ]
+            if candidates and rng.random() < 0.5:
+                return rng.choice(candidates)
+            return tuple(self.generate(element) for element in spec.args)
+        if kind in SEQUENCE_KINDS:
+            # Short sequences are more likely, they are cheaper to execute and to read in a test
+            length = min(int(rng.expovariate(0.4)), MAX_LENGTH)
+            elements = [self.generate(spec.args[0]) for _ in range(length)]
+            return {"list": list, "tuple_of": tuple, "set": _safe_set}[kind](elements)
+        if kind == "dict":
+            length = min(int(rng.expovariate(0.6)), MAX_LENGTH)
+            items = ((self.generate(spec.args[0]), self.generate(spec.args[1])) for _ in range(length))
+            return {key: value for key, value in items if _hashable(key)}
+        return self.generate(TypeSpec(rng.choice(["int", "str", "none", "bool"])))
+
+    def mutate(self, spec: TypeSpec, value: Any) -> Any:
+        """Mutated copy of a value (the value itself is not modified)"""
+        rng, kind = self.rng, spec.kind
+        if not _matches(spec, value) or kind in ("any", "none", "bool", "bytes") or rng.random() < 0.1:
+            return self.generate(spec)
+        if kind == "optional":
+            if value is None or rng.random() < 0.1:
+                return self.generate(spec)
+            return self.mutate(spec.args[0], value)
+        if kind == "union":
+            members = [member for member in spec.args if _matches(member, value)]
+            return self.mutate(rng.choice(members), value) if members else self.generate(spec)
+        if kind == "int":
+            return rng.choice(
+                [
+                    lambda: value + rng.choice([-1, 1]),
+                    lambda: value + rng.randint(-16, 16),
+                    lambda: -value,
+                    lambda: rng.choice(self.dictionary.ints),
+                ]
+            )()
+        if kind == "float":
+            return rng.choice([value + rng.uniform(-1, 1), value * 2, -value, rng.choice(self.dictionary.floats)])
+        if kind == "str":
+            return self._mutate_string(value)
+        if kind == "tuple":
+            if not spec.args or rng.random() < 0.3:
+                return self.generate(spec)
+            index = rng.randrange(len(spec.args))
+            return value[:index] + (self.mutate(spec.args[index], value[index]),) + value[index + 1 :]
+        if kind in SEQUENCE_KINDS:
+            elements = self._mutate_sequence(spec.args[0], list(value))
+            return {"list": list, "tuple_of": tuple, "set": _safe_set}[kind](elements)
+        if kind == "dict":
+            items = dict(value)
+            if items and rng.random() < 0.3:
+                del items[rng.choice(list(items))]
+            elif items and rng.random() < 0.5:
+                key = rng.choice(list(items))
+                items[key] = self.mutate(spec.args[1], items[key])
+            else:
+                key = self.generate(spec.args[0])
+                if _hashable(key):
+                    items[key] = self.generate(spec.args[1])
+            return items
+        return self.generate(spec)
+
+    def _mutate_sequence(self, element: TypeSpec, elements: List[Any]) -> List[Any]:
+        rng = self.rng
+        operations = ["insert", "append"]
+        if elements:
+            operations += ["delete", "replace", "mutate", "duplicate", "truncate"]
+        if len(elements) > 1:
+            operations.append("swap")
+        operation = rng.choice(operations)
+        if operation == "insert" and len(elements) < MAX_LENGTH:
+            elements.insert(rng.randint(0, len(elements)), self.generate(element))
+        elif operation == "append" and len(elements) < MAX_LENGTH:
+            elements.append(self.generate(element))
+        elif operation == "delete":
+            del elements[rng.randrange(len(elements))]
+        elif operation == "replace":
+            elements[rng.randrange(len(elements))] = self.generate(element)
+        elif operation == "mutate":
+            index = rng.randrange(len(elements))
+            elements[index] = self.mutate(element, elements[index])
+        elif operation == "duplicate" and len(elements) < MAX_LENGTH:
+            index = rng.randrange(len(elements))
+            elements.insert(index, elements[index])
+        elif operation == "truncate":
+            del elements[rng.randrange(len(elements)) :]
+        elif operation == "swap":
+            i, j = rng.sample(range(len(elements)), 2)
+            elements[i], elements[j] = elements[j], elements[i]
+        return elements
+
+    def _random_string(self) -> str:
+        length = min(int(self.rng.expovariate(0.3)), 16)
+        return "".join(self.rng.choice(string.ascii_letters + string.digits + " _-") for _ in range(length))
+
+    def _mutate_string(self, value: str) -> str:
+        rng = self.rng
+        if not value or rng.random() < 0.5:
+            return rng.choice(self.dictionary.strs) if rng.random() < 0.8 else self._random_string()
+        index = rng.randrange(len(value))
+        character = rng.choice(string.ascii_letters + string.digits + " _-")
+        return rng.choice(
+            [
+                value[:index] + value[index + 1 :],
+                value[:index] + character + value[index:],
+                value[:index] + character + value[index + 1 :],
+                value.upper() if value.islower() else value.lower(),
+            ]
+        )
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _safe_set(elements: List[Any]) -> set:
+    return {element for element in elements if _hashable(element)}
+
+
+@dataclass
+class CorpusEntry:
+    """Input that reached new edges when it was executed"""
+
+    inputs: Dict[str, Any]
+    trace: TraceResult
+    picked: int = 0
+
+
+@dataclass
+class FuzzStats:
+    """Statistics of fuzzing one function"""
+
+    function: str
+    executions: int = 0
+    duration_s: float = 0.0
+    corpus_size: int = 0
+    edges: int = 0
+    timeouts: int = 0  # executions aborted after the line limit of the tracer
+    covered_lines: Set[int] = field(default_factory=set)
+    target_lines: Set[int] = field(default_factory=set)
+
+    @property
+    def executions_per_second(self) -> float:
+        return self.executions / self.duration_s if self.duration_s else 0.0
+
+    @property
+    def covered_target_lines(self) -> Set[int]:
+        return self.covered_lines & self.target_lines
+
+
+class FunctionFuzzer:
+    """
+    Coverage-guided greybox fuzzer for a single function
+
+    Inputs are generated from the parameter type hints, executed in-process under the line/edge tracer and kept in
+    the corpus if they reach new edges (transitions between lines). Corpus entries are picked with a bias towards
+    rarely picked ones and mutated with 1 to MAX_STACKED_MUTATIONS stacked mutations.
+    """
+
+    def __init__(self, function: ast.FunctionDef, namespace: Dict[str, Any], dictionary: Dictionary, seed: int = 0):
+        self.name = function.name
+        self.function = namespace[function.name]
+        self.rng = random.Random(seed)
+        self.generator = InputGenerator(dictionary, self.rng)
+        arguments = function.args.posonlyargs + function.args.args
+        self.specs = {argument.arg: parse_type_hint(argument.annotation) for argument in arguments}
+        self.corpus: List[CorpusEntry] = []
+        self.edges: Set[Edge] = set()
+        self.lines: Set[int] = set()
+        self.stats = FuzzStats(function.name)
+
+    def run(
+        self,
+        target_lines: Optional[Set[int]] = None,
+        max_executions: int = MAX_EXECUTIONS,
+        time_budget_s: float = TIME_BUDGET_S,
+        plateau_executions: int = PLATEAU_EXECUTIONS,
+    ) -> FuzzStats:
+        """
+        Fuzz until the target lines are covered, the budget is used up or no new edges are found for a while
+
+        Returns:
+            Statistics of all runs of this fuzzer
+        """
+        stats = self.stats
+        stats.target_lines = set(target_lines or ())
+        start = time.perf_counter()
+        deadline = start + time_budget_s
+        last_new = stats.executions
+
+        if not self.corpus:
+            self._execute({name: self.generator.default(spec) for name, spec in self.specs.items()})
+            if not self.specs:
+                max_executions = 0
+        executions = 0
+        while executions < max_executions and stats.executions - last_new < plateau_executions:
+            if stats.target_lines and stats.target_lines <= self.lines:
+                break
+            # Checking the clock on every execution would cost more than a cheap execution (unless inputs time out)
+            if (executions % 64 == 0 or stats.timeouts) and time.perf_counter() > deadline:
+                break
+            inputs = dict(self._choose().inputs) if self.corpus else {}
+            if not self.corpus or self.rng.random() < 0.05:
+                inputs = {name: self.generator.generate(spec) for name, spec in self.specs.items()}
+            for _ in range(self.rng.randint(1, MAX_STACKED_MUTATIONS)):
+                name = self.rng.choice(list(self.specs))
+                inputs[name] = self.generator.mutate(self.specs[name], inputs[name])
+            if self._execute(inputs):
+                last_new = stats.executions
+            executions += 1
+
+        stats.duration_s += time.perf_counter() - start
+        stats.corpus_size = len(self.corpus)
+        stats.edges = len(self.edges)
+        stats.covered_lines = set(self.lines)
+        return stats
+
+    def _choose(self) -> CorpusEntry:
+        weights = [1 / (1 + entry.picked) for entry in self.corpus]
+        entry = self.rng.choices(self.corpus, weights)[0]
+        entry.picked += 1
+        return entry
+
+    def _execute(self, inputs: Dict[str, Any]) -> bool:
+        """Execute an input and add it to the corpus if it reaches new edges (inputs that time out are failed)"""
+        trace = trace_call(self.function, inputs, edges=True)
+        self.stats.executions += 1
+        if trace.timed_out:
+            self.stats.timeouts += 1
+            return False
+        if trace.edges <= self.edges:
+            return False
+        self.edges |= trace.edges
+        self.lines |= trace.lines
+        self.corpus.append(CorpusEntry(inputs, trace))
+        return True
+
+    def minimize(self, target_lines: Set[int]) -> List[SynthesizedCase]:
+        """
+        Minimize the corpus to the fewest entries covering the target lines and shrink their inputs
+
+        A greedy set cover picks the entries (smaller inputs first on ties), then list and string inputs are shrunk
+        element by element as long as the entry still reaches the lines it was picked for.
+        """
+        remaining = set(target_lines)
+        entries = list(self.corpus)
+        cases = []
+        while remaining and entries:
+            best = max(entries, key=lambda entry: (len(entry.trace.lines & remaining), -len(repr(entry.inputs))))
+            covered = best.trace.lines & remaining
+            if not covered:
+                break
+            entries.remove(best)
+            inputs, trace = self._shrink(best.inputs, best.trace, covered)
+            cases.append(SynthesizedCase(self.name, inputs, trace, covered))
+            remaining -= covered
+        return cases
+
+    def _shrink(
+        self, inputs: Dict[str, Any], trace: TraceResult, required_lines: Set[int]
+    ) -> Tuple[Dict[str, Any], TraceResult]:
+        budget = MAX_SHRINK_EXECUTIONS
+        for name, value in inputs.items():
+            if not isinstance(value, (list, tuple, str)) or self.specs[name].kind == "tuple":
+                continue
+            index = len(value) - 1
+            while index >= 0 and budget > 0:
+                candidate = {**inputs, name: value[:index] + value[index + 1 :]}
+                candidate_trace = trace_call(self.function, candidate)
+                budget -= 1
+                if not candidate_trace.timed_out and required_lines <= candidate_trace.lines:
+                    inputs, trace, value = candidate, candidate_trace, candidate[name]
+                index -= 1
+        return inputs, trace
+
+
+def _code_lines(code: CodeType) -> Set[int]:
+    """Lines of a code object and its nested code objects (e.g. local helper functions) that can be executed"""
+    lines = {line for _, _, line in code.co_lines() if line is not None and line != code.co_firstlineno}
+    for constant in code.co_consts:
+        if isinstance(constant, CodeType):
+            lines |= _code_lines(constant)
+    return lines
+
+
+class Fuzzer:
+    """
+    Fuzz the public top-level functions of a module and render the minimized corpora as unittest methods
+
+    Usage:
+        fuzzer = Fuzzer(code_to_test)
+        fuzzer.run(target_lines)
+        test_script = fuzzer.test_script(target_lines)
+    """
+
+    def __init__(self, code_to_test: str, seed: int = 0):
+        tree = ast.parse(code_to_test)
+        self.namespace, _ = load_code(code_to_test)
+        self.line_owners = get_line_owners(code_to_test)
+        dictionary = Dictionary.from_code(tree)
+        self.functions = {
+            node.name: FunctionFuzzer(node, self.namespace, dictionary, seed + index)
+            for index, node in enumerate(tree.body)
+            if isinstance(node, ast.FunctionDef) and not node.name.startswith("_")
+        }
+        self.function_lines = {name: _code_lines(self.namespace[name].__code__) for name in self.functions}
+
+    def run(
+        self,
+        target_lines: Optional[Set[int]] = None,
+        max_executions: int = MAX_EXECUTIONS,
+        time_budget_s: float = TIME_BUDGET_S,
+    ) -> List[FuzzStats]:
+        """
+        Fuzz the functions containing target lines (all functions without targets), sharing the budget evenly
+
+        Returns:
+            Statistics per fuzzed function
+        """
+        targets = self._targets(target_lines)
+        if not targets:
+            return []
+        return [
+            self.functions[name].run(lines, max_executions // len(targets), time_budget_s / len(targets))
+            for name, lines in targets.items()
+        ]
+
+    def _targets(self, target_lines: Optional[Set[int]]) -> Dict[str, Set[int]]:
+        if target_lines is None:
+            return {name: set() for name in self.functions}
+        owned = {self.line_owners.get(line, line) for line in target_lines}
+        targets = {name: owned & self.function_lines[name] for name in self.functions}
+        return {name: lines for name, lines in targets.items() if lines}
+
+    def tests(self, target_lines: Optional[Set[int]] = None, taken_names: Optional[Set[str]] = None) -> List[str]:
+        """Render the minimized corpora as unittest methods covering the target lines (all reached lines if None)"""
+        taken_names = set(taken_names or ())
+        tests = []
+        for name, fuzzer in self.functions.items():
+            if target_lines is None:
+                lines = set(fuzzer.lines)
+            else:
+                lines = self._targets(target_lines).get(name, set())
+            for case in fuzzer.minimize(lines):
+                lines_reached = sorted(case.covered_lines)
+                test_name = f"test_{name}_fuzzed_line_{lines_reached[-1]}"
+                suffix = 2
+                while test_name in taken_names:
+                    test_name = f"test_{name}_fuzzed_line_{lines_reached[-1]}_{suffix}"
+                    suffix += 1
+                test_case = render_test_case(
+                    case, test_name, f"Reach {describe_lines(lines_reached)} with an input found by fuzzing."
+                )
+                if test_case is not None:
+                    taken_names.add(test_name)
+                    tests.append(test_case)
+        return tests
+
+    def test_script(
+        self,
+        target_lines: Optional[Set[int]] = None,
+        existing_tests: Optional[List[str]] = None,
+        code_to_test_path: str = "code_to_test",
+    ) -> str:
+        """Assemble the rendered tests with existing tests into a complete unittest script"""
+        tests = self.tests(target_lines)
+        return assemble_test_script(code_to_test_path, existing_tests or [], "\n\n".join(tests))
+
+
+def fuzz_tests(
+    code_to_test: str,
+    uncovered_lines: List[Dict[str, Any]],
+    taken_names: Optional[Set[str]] = None,
+    max_executions: int = MAX_EXECUTIONS,
+    time_budget_s: float = TIME_BUDGET_S,
+    seed: int = 0,
+) -> List[str]:
+    """
+    Fuzz the functions containing uncovered lines and render unittest methods for the lines the fuzzer reaches
+
+    Args:
+        code_to_test: Source code being tested
+        uncovered_lines: Uncovered lines as returned by the coverage analysis
+        taken_names: Names of existing test functions, fuzzed tests get unique names
+        max_executions: Execution budget shared by the fuzzed functions
+        time_budget_s: Time budget shared by the fuzzed functions
+        seed: Seed of the random number generators (runs are reproducible for a fixed execution budget)
+
+    Returns:
+        Test case functions in the format of the generated tests, may be empty
+    """
+    try:
+        fuzzer = Fuzzer(code_to_test, seed)
+    except Exception:
+        return []
+    target_lines = {line["line_number"] for line in uncovered_lines}
+    fuzzer.run(target_lines, max_executions, time_budget_s)
+    return fuzzer.tests(target_lines, taken_names)
@@ -1,20 +1,34 @@
 import logging
-import os
-import tempfile
+from itertools import zip_longest
 from pathlib import Path
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
-from langchain_community.embeddings import JinaEmbeddings
 from langchain_core.documents import Document
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
-from core.langchain_graph import LangChainGraph
-from utils.code_processing import (assemble_test_script, extract_unit_tests,
-                                   sanitize_code_output)
+from core.backends import create_embedding_model, get_provider
+from core.embedding_cache import CachedEmbeddings
+from core.fuzzer import fuzz_tests
+from core.langchain_graph import EDGE_CASE_QUERY, LangChainGraph
+from core.model_pool import ModelPool
+from core.synthesizer import synthesize_tests
+from core.vector_store import MatrixVectorStore
+from prompts import write_test_case_prompt, write_test_cases_batch_prompt
+from utils.code_processing import (TestRecord, assemble_test_script,
+                                   extract_test_records, extract_unit_tests,
+                                   get_test_hash, sanitize_code_output)
+from utils.control_flow import group_uncovered_lines_by_path
+from utils.coverage_index import CoverageIndex
+from utils.fingerprint import FingerprintIndex
 from utils.logging import log_node_execution
-from utils.metrics import analyze_test_coverage
+from utils.node_metrics import MeteredEmbeddings, NodeMetrics
+from utils.metrics import (cluster_uncovered_lines, compute_test_coverage,
+                           get_covered_lines, get_test_case_names)
+from utils.test_suite import SuiteTest, TestSuite
+
+
+def test_origins(tests: List[str], origin: str) -> Dict[str, str]:
+    """Origin ("synthesizer", "fuzzer" or the model that wrote them) of the test functions in `tests` by hash"""
+    return {record.hash: origin for test in tests for record in extract_test_records(test)}
 
 
 class UnitTestGenerator:
@@ -26,42 +40,59 @@ class UnitTestGenerator:
         self.embedding_model = None
         self.vector_store = None
         self.existing_test_cases: List[str] = []
+        self.node_metrics = NodeMetrics()
+        # Structural fingerprints of the stored tests, mirroring the vector store
+        self.fingerprints = FingerprintIndex(cfg["llm"].get("duplicate_threshold", 0.85))
+        # Covered lines of the stored tests for the "coverage" similarity retrieval
+        self.coverage_index = CoverageIndex()
         self._initialize_models()
 
     def _initialize_models(self):
         """Initialize LLM and embedding models based on settings"""
-        openai_models = ["o1", "o1-mini"] # let them stay here eventhough they won't be used in our openai api tiers
-        model_name = self.cfg["llm"]["model_name"].lower()
-        if "gpt" in model_name or model_name in openai_models:
-            self.llm = ChatOpenAI(
-                model=self.cfg["llm"]["model_name"],
-                temperature=0.3,
-                top_p=0.95,
-                api_key=self.cfg["api"]["openai_api_key"],
-            )
-            self.embedding_model = OpenAIEmbeddings(api_key=self.cfg["api"]["openai_api_key"])
-        else:
-            self.llm = ChatGroq(
-                name="llama-3.3-70b-specdec",
-                temperature=0.0,
-                api_key=self.cfg["api"]["groq_api_key"],
-                stop_sequences=None,
-            )
-            self.embedding_model = JinaEmbeddings(
-                jina_api_key=self.cfg["api"]["jina_api_key"],
-                model_name="jina-embeddings-v3",
-            )
-        self.detailed_logger.info(f"Initialized models - LLM: {self.cfg['llm']['model_name']}")
+        # Chat models per node (cfg["llm"]["node_models"]), nodes without an assignment use the default model
+        self.models = ModelPool(self.cfg)
+        self.llm = self.models.default.llm
+        self.scheduler = self.models.default.scheduler
+        self.base_embedding_model = create_embedding_model(self.cfg)
+        self.embedding_model = MeteredEmbeddings(self.base_embedding_model, self.node_metrics)
+        # Persist document embeddings on disk by test hash, only unseen tests reach the (metered) embedding model
+        cache_dir = self.cfg["llm"].get("embedding_cache_dir", ".cache/embeddings")
+        if cache_dir:
+            self.embedding_model = CachedEmbeddings(self.embedding_model, Path(cache_dir))
+        self.detailed_logger.info(
+            f"Initialized models - LLM: {self.cfg['llm']['model_name']} ({get_provider(self.cfg)} backend)"
+        )
         self.minimal_logger.info(f"Models initialized")
 
-    def initialize_vector_store(self, existing_tests: str = "") -> List[str]:
-        """Initialize vector store with existing tests"""
-        self.existing_test_cases = extract_unit_tests(existing_tests) if existing_tests else []
-        test_documents = [
-            Document(page_content=test_case, metadata={"type": "unit_test"}) for test_case in self.existing_test_cases
-        ]
-        self.vector_store = InMemoryVectorStore.from_documents(test_documents, self.embedding_model)
-        self.detailed_logger.info(f"Initialized vector store with {len(self.existing_test_cases)} existing tests")
+    def initialize_vector_store(self, existing_tests: Union[str, Sequence[TestRecord]] = "") -> List[str]:
+        """
+        Sync the vector store with the existing tests (a test script or the records of a TestSuite)
+
+        The store is created once per generator and kept across calls (e.g. Generate clicks): tests that are no longer
+        in the existing tests are deleted and only tests that are not in the store yet are embedded.
+        """
+        records = extract_test_records(existing_tests) if isinstance(existing_tests, str) else existing_tests
+        self.existing_test_cases = [record.source for record in records]
+        with self.node_metrics.node("initialize_vector_store"):
+            if self.vector_store is None:
+                # Local embeddings fix their IDF weights on the first tests, later tests are embedded with them
+                fit = getattr(self.base_embedding_model, "fit", None)
+                if fit is not None:
+                    fit(self.existing_test_cases)
+                self.vector_store = MatrixVectorStore(self.embedding_model, **self.cfg.get("vector_store", {}))
+
+            documents = {record.hash: record.source for record in records}
+            removed = [id for id in self.vector_store.store if id not in documents]
+            if removed:
+                self.vector_store.delete(removed)
+            added = [id for id in documents if id not in self.vector_store.store]
+            if added:
+                self.vector_store.add_documents(
+                    [Document(page_content=documents[id], metadata={"type": "unit_test"}) for id in added], ids=added
+                )
+        self.detailed_logger.info(
+            f"Synced vector store with {len(documents)} existing tests ({len(added)} added, {len(removed)} removed)"
+        )
         return self.existing_test_cases
 
     def generate_test(
@@ -70,40 +101,552 @@ class UnitTestGenerator:
         coverage_matrix: str,
         uncovered_lines: list,
         log_callback: Optional[Callable] = None,
+        token_callback: Optional[Callable[[str, str], None]] = None,
     ) -> dict[str, str]:
-        """Generate a unit test for the given code"""
+        """Generate a unit test for the given code (streaming LLM output to the token callback if provided)"""
         if self.vector_store is None:
             self.initialize_vector_store()
 
         self.detailed_logger.info("Creating unit test graph")
         self.minimal_logger.info("Graph creation started")
+        self.node_metrics.start_test()
 
-        # Create graph and invoke it
-        graph = LangChainGraph.create_unit_test_graph(
-            self.llm,
-            self.detailed_logger,
-            self.minimal_logger,
-            log_callback,
-            self.cfg["llm"]["similarity_comparison_count"],
+        # Branches the synthesizer can solve or the fuzzer reaches need no LLM call
+        synthesized = self._synthesize_tests(code_to_test, uncovered_lines)
+        if synthesized:
+            return synthesized
+
+        # Target a whole control flow path instead of the first uncovered line
+        target_paths = (
+            group_uncovered_lines_by_path(code_to_test, uncovered_lines, 1)
+            if self.cfg["llm"].get("path_targeting", True)
+            else []
         )
 
         initial_state = {
             "code_to_test": code_to_test,
             "coverage_matrix": coverage_matrix,
             "uncovered_lines": uncovered_lines,
+            "target_path": target_paths[0] if target_paths else [],
             "vector_store": self.vector_store,
             "improvements_remaining": self.cfg["llm"]["max_improvements"],
             "identified_smells": "",
             "unit_test": "",
+            "fingerprints": self.fingerprints if self.cfg["llm"].get("duplicate_check", True) else None,
+            "duplicate_of": "",
+            "duplicate_regenerations": 0,
+            "coverage_index": (
+                self.coverage_index if self.cfg["llm"].get("similarity_retrieval", "embedding") == "coverage" else None
+            ),
+            "few_shot_index": (
+                self.coverage_index if self.cfg["llm"].get("few_shot_retrieval", "edge_case") == "coverage" else None
+            ),
+            "few_shot_count": self.cfg["llm"].get("few_shot_count", 3),
         }
 
         # Update logs before starting
         if log_callback:
             log_callback()
 
-        result = graph.invoke(initial_state)
+        models = self.models
+        result = self._run_graph(models, initial_state, log_callback, token_callback)
+
+        # Regenerate with the stronger model only if the candidate fails or adds no coverage
+        escalated_models = self.models.escalated()
+        if escalated_models is not None and self._needs_escalation(
+            code_to_test, result["unit_test"], uncovered_lines
+        ):
+            self.minimal_logger.info(f"Escalating test generation to {escalated_models.model_name()}")
+            self._remove_from_vector_store(result["unit_test"])
+            models = escalated_models
+            result = self._run_graph(models, initial_state, log_callback, token_callback)
+        self.minimal_logger.info(f"Test {self.node_metrics.test_index}: {self.node_metrics.test_summary()}")
 
         return {
             "generated_test_case": result["unit_test"],
+            "origins": test_origins([result["unit_test"]], models.model_name("write_initial_test")),
             "combined_test_script": assemble_test_script("code_to_test", self.existing_test_cases, result["unit_test"]),
         }
+
+    def _run_graph(
+        self,
+        models: ModelPool,
+        initial_state: dict[str, Any],
+        log_callback: Optional[Callable] = None,
+        token_callback: Optional[Callable[[str, str], None]] = None,
+    ) -> dict[str, Any]:
+        """Create the unit test graph with the models of a pool and invoke it"""
+        graph = LangChainGraph.create_unit_test_graph(
+            models.default.llm,
+            self.detailed_logger,
+            self.minimal_logger,
+            log_callback,
+            self.cfg["llm"]["similarity_comparison_count"],
+            self.cfg["llm"].get("graph_topology", "default"),
+            self.node_metrics,
+            token_callback,
+            models.default.scheduler,
+            self.cfg["llm"].get("static_smell_check", True),
+            models,
+        )
+        return graph.invoke(initial_state)
+
+    def _needs_escalation(self, code_to_test: str, unit_test: str, uncovered_lines: list) -> bool:
+        """Check if a generated test fails or covers none of the uncovered lines"""
+        with self.node_metrics.node("verify_test"):
+            tests = extract_unit_tests(unit_test)
+            if tests:
+                _, raw_results = compute_test_coverage(code_to_test, tests)
+                passed = all(outcome == "passed" for outcome in raw_results["outcomes"])
+                covered = set().union(*(get_covered_lines(raw_results, i) for i in range(len(tests))))
+                if passed and covered & {line["line_number"] for line in uncovered_lines}:
+                    return False
+            self.node_metrics.escalate()
+        return True
+
+    def _remove_from_vector_store(self, unit_test: str):
+        """Remove a test added by the graph (e.g. before it is regenerated)"""
+        id = get_test_hash(unit_test)
+        if id in self.vector_store.store:
+            self.vector_store.delete([id])
+
+    def generate_until_coverage(
+        self,
+        code_to_test: str,
+        existing_tests: Optional[Union[List[str], TestSuite]] = None,
+        max_tests: int = 25,
+        log_callback: Optional[Callable] = None,
+        token_callback: Optional[Callable[[str, str], None]] = None,
+        max_rounds: Optional[int] = None,
+        target_coverage: float = 1.0,
+        round_callback: Optional[
+            Callable[[dict[str, Any], List[SuiteTest], dict[str, Any], dict[str, Any]], None]
+        ] = None,
+    ) -> dict[str, Any]:
+        """
+        Generate and auto-accept tests until the target line coverage or the maximum number of tests is reached
+
+        Args:
+            code_to_test: Source code being tested
+            existing_tests: Optional list of existing test code (each may contain several test functions) or a
+                TestSuite, which is extended in place
+            max_tests: Maximum number of tests in the suite
+            log_callback: Optional callback to update logs
+            token_callback: Optional callback receiving the node name and the streamed LLM output so far
+            max_rounds: Maximum number of generation rounds (default: max_tests)
+            target_coverage: Line coverage at which generation stops (default: full coverage)
+            round_callback: Optional callback after every round, receiving the generation result, the tests added to
+                the suite and the raw coverage results before and after the round
+
+        Returns:
+            Dictionary with the final tests, the TestSuite, coverage matrix, raw coverage results and number of
+            generation rounds
+        """
+        suite = existing_tests if isinstance(existing_tests, TestSuite) else TestSuite().sync(existing_tests or [])
+        max_rounds = max_tests if max_rounds is None else max_rounds
+        self.initialize_vector_store(suite.records)
+
+        # Batch mode asks for several tests per LLM call
+        generate = self.generate_test_batch if self.cfg["llm"].get("batch_size", 1) > 1 else self.generate_test
+
+        matrix_df, raw_results = compute_test_coverage(code_to_test, suite.sources, test_names=suite.names)
+        suite.update_coverage(raw_results)
+        rounds = 0
+        while raw_results["line_coverage"] < target_coverage and len(suite) < max_tests and rounds < max_rounds:
+            result = generate(
+                code_to_test,
+                matrix_df.to_markdown(index=True),
+                raw_results["uncovered_lines"],
+                log_callback=log_callback,
+                token_callback=token_callback,
+            )
+            rounds += 1
+
+            new_tests = suite.add(
+                result["generated_test_case"], origin=self.cfg["llm"]["model_name"], origins=result.get("origins")
+            )
+            self.existing_test_cases.extend(test.source for test in new_tests)
+            previous_raw_results = raw_results
+            matrix_df, raw_results = compute_test_coverage(code_to_test, suite.sources, test_names=suite.names)
+            suite.update_coverage(raw_results)
+            if round_callback:
+                round_callback(result, new_tests, previous_raw_results, raw_results)
+            self.minimal_logger.info(
+                f"Round {rounds}: {len(suite)} tests, line coverage {raw_results['line_coverage']:.1%}"
+            )
+
+        return {
+            "tests": suite.sources,
+            "suite": suite,
+            "matrix": matrix_df,
+            "raw_results": raw_results,
+            "rounds": rounds,
+        }
+
+    def generate_test_batch(
+        self,
+        code_to_test: str,
+        coverage_matrix: str,
+        uncovered_lines: list,
+        log_callback: Optional[Callable] = None,
+        token_callback: Optional[Callable[[str, str], None]] = None,
+    ) -> dict[str, Any]:
+        """
+        Generate several unit tests with a single LLM call, each targeting a different region of uncovered lines
+
+        Regions are feasible control flow paths (or consecutive uncovered lines without path targeting).
+        """
+        if self.vector_store is None:
+            self.initialize_vector_store()
+
+        batch_size = self.cfg["llm"].get("batch_size", 1)
+        if self.cfg["llm"].get("path_targeting", True):
+            regions = group_uncovered_lines_by_path(code_to_test, uncovered_lines, batch_size)
+        else:
+            regions = cluster_uncovered_lines(code_to_test, uncovered_lines, batch_size)
+        if not regions:
+            # Nothing left to target region by region, fall back to the single test graph
+            result = self.generate_test(code_to_test, coverage_matrix, uncovered_lines, log_callback, token_callback)
+            return {
+                **result,
+                "generated_test_cases": [result["generated_test_case"]],
+                "rejected_test_cases": [],
+                "llm_calls": 1,
+            }
+
+        self.node_metrics.start_test()
+        synthesized = self._synthesize_tests(code_to_test, uncovered_lines)
+        if synthesized:
+            return synthesized
+
+        with self.node_metrics.node("write_test_batch"):
+            existing_tests = self._get_prompt_examples(code_to_test, regions)
+            target_regions = "\n\n".join(
+                f"Region {i+1}:\n" + self._format_uncovered_lines(region) for i, region in enumerate(regions)
+            )
+
+            log_node_execution(
+                (self.detailed_logger, self.minimal_logger),
+                "write_test_batch",
+                inputs={
+                    "code_to_test": code_to_test,
+                    "coverage_matrix": coverage_matrix,
+                    "target_regions": target_regions,
+                    "existing_edge_case_tests": existing_tests,
+                },
+            )
+            if log_callback:
+                log_callback()
+
+            response = self._generate_text(
+                "write_test_batch",
+                token_callback,
+                write_test_cases_batch_prompt.format(
+                    code_to_test=code_to_test,
+                    coverage_matrix=coverage_matrix,
+                    test_count=len(regions),
+                    target_regions=target_regions,
+                    existing_tests=existing_tests,
+                ),
+            )
+            candidates = extract_unit_tests(sanitize_code_output(str(response.content)))[: len(regions)]
+        llm_calls = 1
+        log_node_execution(
+            (self.detailed_logger, self.minimal_logger),
+            "write_test_batch",
+            outputs={"unit_tests": candidates},
+        )
+
+        # Verify every candidate on its own and keep those that pass and cover new lines
+        remaining_lines = {line["line_number"] for line in uncovered_lines}
+        taken_names = set(get_test_case_names(self.existing_test_cases))
+        accepted, rejected, failed_regions = [], [], []
+        origins = {}
+        for i, region in enumerate(regions):
+            candidate = candidates[i] if i < len(candidates) else None
+            if (
+                candidate
+                and not self._is_duplicate(candidate)
+                and self._verify_candidate(code_to_test, candidate, remaining_lines, taken_names)
+            ):
+                accepted.append(candidate)
+                origins.update(test_origins([candidate], self.models.model_name("write_test_batch")))
+                continue
+            if candidate:
+                rejected.append(candidate)
+            failed_regions.append(region)
+
+        # Retry the regions whose test was dropped one by one
+        if self.cfg["llm"].get("retry_failed_batch_tests", True):
+            for region in failed_regions:
+                if not remaining_lines.intersection(line["line_number"] for line in region):
+                    continue
+                retry_models = self.models.escalated()
+                candidate = self._write_single_test(
+                    code_to_test, coverage_matrix, region, existing_tests, token_callback, retry_models
+                )
+                llm_calls += 1
+                if not self._is_duplicate(candidate) and self._verify_candidate(
+                    code_to_test, candidate, remaining_lines, taken_names
+                ):
+                    accepted.append(candidate)
+                    retry_model = (retry_models or self.models).model_name("retry_batch_test")
+                    origins.update(test_origins([candidate], retry_model))
+                else:
+                    rejected.append(candidate)
+
+        log_node_execution(
+            (self.detailed_logger, self.minimal_logger),
+            "verify_test_batch",
+            outputs={"accepted_tests": accepted, "rejected_tests": rejected},
+        )
+        self.minimal_logger.info(
+            f"Batch generation accepted {len(accepted)} of {len(accepted) + len(rejected)} tests in {llm_calls} LLM calls"
+        )
+
+        if accepted:
+            with self.node_metrics.node("add_to_vectorstore"):
+                self.vector_store.add_documents(
+                    [Document(page_content=test_case, metadata={"type": "unit_test"}) for test_case in accepted],
+                    ids=[get_test_hash(test_case) for test_case in accepted],
+                )
+        self.minimal_logger.info(f"Batch {self.node_metrics.test_index}: {self.node_metrics.test_summary()}")
+
+        generated_test_case = "\n\n".join(accepted)
+        return {
+            "generated_test_case": generated_test_case,
+            "generated_test_cases": accepted,
+            "origins": origins,
+            "rejected_test_cases": rejected,
+            "llm_calls": llm_calls,
+            "combined_test_script": assemble_test_script(
+                "code_to_test", self.existing_test_cases, generated_test_case
+            ),
+        }
+
+    def _synthesize_tests(self, code_to_test: str, uncovered_lines: list) -> Optional[dict[str, Any]]:
+        """
+        Synthesize tests for the branches whose conditions can be solved locally (see core/synthesizer.py), then fuzz
+        the functions with lines still uncovered (see core/fuzzer.py)
+
+        Returns:
+            Result in the format of generate_test_batch if a synthesized test covers new lines, otherwise None
+        """
+        synthesize = self.cfg["llm"].get("synthesize_tests", True)
+        fuzz = self.cfg["llm"].get("fuzz_tests", True)
+        if not (synthesize or fuzz) or not uncovered_lines:
+            return None
+
+        taken_names = set(get_test_case_names(self.existing_test_cases))
+        remaining_lines = {line["line_number"] for line in uncovered_lines}
+        accepted, origins = [], {}
+        if synthesize:
+            synthesized = self._accept_local_tests(
+                "synthesize_tests",
+                code_to_test,
+                uncovered_lines,
+                remaining_lines,
+                taken_names,
+                lambda: synthesize_tests(code_to_test, uncovered_lines, taken_names),
+            )
+            accepted += synthesized
+            origins.update(test_origins(synthesized, "synthesizer"))
+        if fuzz and remaining_lines:
+            still_uncovered = [line for line in uncovered_lines if line["line_number"] in remaining_lines]
+            fuzzed = self._accept_local_tests(
+                "fuzz_tests",
+                code_to_test,
+                still_uncovered,
+                remaining_lines,
+                taken_names,
+                lambda: fuzz_tests(
+                    code_to_test,
+                    still_uncovered,
+                    taken_names,
+                    time_budget_s=self.cfg["llm"].get("fuzz_time_budget_s", 2.0),
+                ),
+            )
+            accepted += fuzzed
+            origins.update(test_origins(fuzzed, "fuzzer"))
+        if not accepted:
+            return None
+
+        with self.node_metrics.node("add_to_vectorstore"):
+            self.vector_store.add_documents(
+                [Document(page_content=test_case, metadata={"type": "unit_test"}) for test_case in accepted],
+                ids=[get_test_hash(test_case) for test_case in accepted],
+            )
+        self.minimal_logger.info(f"Synthesized or fuzzed {len(accepted)} tests without LLM calls")
+
+        generated_test_case = "\n\n".join(accepted)
+        return {
+            "generated_test_case": generated_test_case,
+            "generated_test_cases": accepted,
+            "origins": origins,
+            "rejected_test_cases": [],
+            "llm_calls": 0,
+            "combined_test_script": assemble_test_script(
+                "code_to_test", self.existing_test_cases, generated_test_case
+            ),
+        }
+
+    def _accept_local_tests(
+        self,
+        node_name: str,
+        code_to_test: str,
+        uncovered_lines: list,
+        remaining_lines: set,
+        taken_names: set,
+        create_candidates: Callable[[], List[str]],
+    ) -> List[str]:
+        """Create tests without the LLM inside a metered node and keep the candidates that pass and cover new lines"""
+        with self.node_metrics.node(node_name):
+            log_node_execution(
+                (self.detailed_logger, self.minimal_logger),
+                node_name,
+                inputs={"uncovered_lines": uncovered_lines},
+            )
+            candidates = create_candidates()
+            accepted = [
+                candidate
+                for candidate in candidates
+                if self._verify_candidate(code_to_test, candidate, remaining_lines, taken_names)
+            ]
+            for _ in accepted:
+                self.node_metrics.skip_llm_call()
+        log_node_execution(
+            (self.detailed_logger, self.minimal_logger),
+            node_name,
+            outputs={"unit_tests": accepted},
+        )
+        return accepted
+
+    def _get_prompt_examples(self, code_to_test: str, regions: List[list]) -> str:
+        """
+        Retrieve existing tests as prompt examples: with coverage few-shot retrieval the tests covering the lines
+        leading to each region (taken region by region), otherwise the edge case tests from the vector store
+        """
+        if self.cfg["llm"].get("few_shot_retrieval", "edge_case") == "coverage":
+            tests = {id: document["text"] for id, document in self.vector_store.store.items()}
+            count = self.cfg["llm"].get("few_shot_count", 3)
+            neighborhoods = [
+                self.coverage_index.neighborhood_tests(
+                    code_to_test, tests, [line["line_number"] for line in region], count
+                )
+                for region in regions
+            ]
+            # Interleave the regions, so every region gets an example before any region gets a second one
+            examples = list(dict.fromkeys(test for rank in zip_longest(*neighborhoods) for test in rank if test))
+            if examples:
+                return "\n\n".join(
+                    f"Existing Test Case {i+1} (covers the lines leading to a target region):\n```python\n{test}\n```"
+                    for i, test in enumerate(examples[:count])
+                )
+        results = self.vector_store.similarity_search(
+            EDGE_CASE_QUERY, k=self.cfg["llm"]["similarity_comparison_count"]
+        )
+        return "\n\n".join(
+            f"Existing Test Case {i+1}:\n```python\n{result.page_content}\n```" for i, result in enumerate(results)
+        )
+
+    @staticmethod
+    def _format_uncovered_lines(uncovered_lines: list) -> str:
+        """Format uncovered lines for a prompt"""
+        if not uncovered_lines:
+            return "None"
+        return "\n".join(f"Line {line['line_number']}: {line['line']}" for line in uncovered_lines)
+
+    def _generate_text(
+        self,
+        node: str,
+        token_callback: Optional[Callable[[str, str], None]],
+        prompt: str,
+        models: Optional[ModelPool] = None,
+    ) -> Any:
+        """Invoke the model of a text producing step, streaming if a token callback is provided"""
+        model = (models or self.models).get(node)
+        if token_callback:
+            return self.node_metrics.stream(
+                model.llm, prompt, lambda text: token_callback(node, text), model.scheduler, model.model_name
+            )
+        return self.node_metrics.invoke(model.llm, prompt, model.scheduler, model.model_name)
+
+    def _write_single_test(
+        self,
+        code_to_test: str,
+        coverage_matrix: str,
+        region: list,
+        existing_tests: str,
+        token_callback: Optional[Callable[[str, str], None]] = None,
+        models: Optional[ModelPool] = None,
+    ) -> str:
+        """
+        Ask the LLM for a single test case targeting one region of uncovered lines (as its target path)
+
+        Regions are retried after their batch test failed or added no coverage, so callers pass the escalated pool (if
+        one is configured) to retry with the stronger model.
+        """
+        log_node_execution(
+            (self.detailed_logger, self.minimal_logger),
+            "retry_batch_test",
+            inputs={"uncovered_lines": region},
+        )
+        with self.node_metrics.node("retry_batch_test"):
+            if models is not None:
+                self.node_metrics.escalate()
+            response = self._generate_text(
+                "retry_batch_test",
+                token_callback,
+                write_test_case_prompt.format(
+                    code_to_test=code_to_test,
+                    coverage_matrix=coverage_matrix,
+                    uncovered_lines=self._format_uncovered_lines(region),
+                    target_path=self._format_uncovered_lines(region),
+                    existing_tests=existing_tests,
+                ),
+                models,
+            )
+        output = {"unit_test": sanitize_code_output(str(response.content))}
+        log_node_execution((self.detailed_logger, self.minimal_logger), "retry_batch_test", outputs=output)
+        return output["unit_test"]
+
+    def _is_duplicate(self, candidate: str) -> bool:
+        """Check a batch candidate for a structural duplicate of a stored test (before running it)"""
+        if not self.cfg["llm"].get("duplicate_check", True):
+            return False
+        with self.node_metrics.node("verify_test_batch"):
+            self.fingerprints.sync({id: document["text"] for id, document in self.vector_store.store.items()})
+            match = self.fingerprints.find_duplicate(candidate)
+            self.node_metrics.add_duplicate_check(match is not None)
+        if match is not None:
+            self.detailed_logger.info(f"Rejected batch test (duplicates stored test {match.id}): {candidate}")
+        return match is not None
+
+    def _verify_candidate(self, code_to_test: str, candidate: str, remaining_lines: set, taken_names: set) -> bool:
+        """
+        Run a candidate test on its own under coverage
+
+        The candidate is accepted if it passes, does not reuse a taken test name and covers at least one of the
+        remaining uncovered lines. Accepted candidates update `remaining_lines` and `taken_names` in place.
+        """
+        records = extract_test_records(candidate)
+        extracted = [record.source for record in records]
+        names = [record.name for record in records]
+        if len(records) != 1 or names[0] in taken_names:
+            self.detailed_logger.info(f"Rejected batch test (not a single test with an unused name): {candidate}")
+            return False
+
+        with self.node_metrics.node("verify_test_batch"):
+            _, raw_results = compute_test_coverage(code_to_test, extracted, test_names=names)
+        if raw_results["outcomes"] != ["passed"]:
+            self.detailed_logger.info(f"Rejected batch test {names[0]} (outcome: {raw_results['outcomes']})")
+            return False
+
+        newly_covered = get_covered_lines(raw_results, 0) & remaining_lines
+        if not newly_covered:
+            self.detailed_logger.info(f"Rejected batch test {names[0]} (no new lines covered)")
+            return False
+
+        remaining_lines.difference_update(newly_covered)
+        taken_names.add(names[0])
+        return True
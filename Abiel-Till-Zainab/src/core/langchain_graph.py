@@ -5,13 +5,21 @@ from typing import Any, Callable, Optional, TypedDict
 import pandas as pd
 from langchain.chat_models.base import BaseChatModel
 from langchain_core.documents import Document
-from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.vectorstores import VectorStore
 from langgraph.graph import END, START, StateGraph
 
-from prompts import (fix_similarities_prompt, fix_test_smell_prompt,
-                     has_test_smell_router_prompt, write_test_case_prompt)
-from utils.code_processing import RouteTest, sanitize_code_output
+from core.model_pool import ModelBinding, ModelPool
+from core.scheduler import ProviderScheduler
+from prompts import (duplicate_test_note, fix_similarities_prompt,
+                     fix_test_smell_prompt, has_test_smell_router_prompt,
+                     review_test_prompt, write_test_case_prompt)
+from utils.code_processing import (ReviewTest, RouteTest, get_test_hash,
+                                   sanitize_code_output)
+from utils.coverage_index import CoverageIndex
+from utils.fingerprint import FingerprintIndex
 from utils.logging import log_node_execution
+from utils.node_metrics import NodeMetrics
+from utils.test_smells import analyze_test_smells
 
 
 class GraphState(TypedDict):
@@ -20,10 +28,24 @@ class GraphState(TypedDict):
     code_to_test: str
     coverage_matrix: str
     unit_test: str
-    vector_store: InMemoryVectorStore
+    vector_store: VectorStore  # core.vector_store.MatrixVectorStore or any LangChain vector store
     improvements_remaining: int
     identified_smells: str
     uncovered_lines: list[dict[str, Any]]
+    target_path: list[dict[str, Any]]
+    fingerprints: Optional[FingerprintIndex]  # structural duplicate check, skipped if missing
+    duplicate_of: str  # stored test the previous candidate duplicated (empty if none)
+    duplicate_regenerations: int
+    coverage_index: Optional[CoverageIndex]  # retrieve similar tests by covered lines instead of embeddings
+    few_shot_index: Optional[CoverageIndex]  # retrieve prompt examples covering the lines before the target
+    few_shot_count: int  # prompt examples retrieved from the few-shot index
+
+
+GRAPH_TOPOLOGIES = ["default", "merged_review"]
+# Constant retrieval query for the prompt examples (its embedding is cached per model, see core/embedding_cache.py)
+EDGE_CASE_QUERY = "Unit test that tests an edge case"
+# Candidates duplicating a stored test are rewritten this often before the similarity fix takes over
+MAX_DUPLICATE_REGENERATIONS = 1
 
 
 class LangChainGraph:
@@ -36,27 +58,102 @@ class LangChainGraph:
         minimal_logger: logging.Logger,
         log_callback: Optional[Callable] = None,
         similarity_comparison_count: int = 1,
+        topology: str = "default",
+        node_metrics: Optional[NodeMetrics] = None,
+        token_callback: Optional[Callable[[str, str], None]] = None,
+        scheduler: Optional[ProviderScheduler] = None,
+        static_smell_check: bool = True,
+        models: Optional[ModelPool] = None,
     ) -> StateGraph:
-        """Creates and returns a compiled state graph for unit test generation"""
+        """
+        Creates and returns a compiled state graph for unit test generation
+
+        The "default" topology fixes similarities and routes on test smells in two separate LLM calls.
+        The "merged_review" topology does both in a single structured call (review_test).
+
+        If a token callback is provided, the text producing nodes stream their LLM output and call it with the node
+        name and the text received so far. Structured output calls (router, review) are not streamed.
+        All LLM calls go through the provider scheduler if one is provided.
+
+        With the static smell check, the router only calls the LLM if the static smell analysis finds no smells.
+
+        If the state holds a coverage index, the similarity context of fix_similarities and review_test are the stored
+        tests covering the most similar lines as the executed candidate (no embedding call), falling back to the
+        embedding search if the candidate covers no lines.
+
+        If the state holds a fingerprint index, every new candidate is checked for structural duplicates of the stored
+        tests (check_duplicate) before any embedding or LLM call and a duplicate is written again, showing the
+        duplicated test to the LLM.
+
+        If a model pool is provided, every node calls the model assigned to it (and its provider scheduler) instead of
+        `llm` and `scheduler`.
+        """
+        if topology not in GRAPH_TOPOLOGIES:
+            raise ValueError(f"Unknown graph topology: {topology}")
+        node_metrics = node_metrics or NodeMetrics()
 
         def update_logs():
             """Helper function to update logs if callback is provided"""
             if log_callback:
                 log_callback()
 
-        def write_initial_test(state: GraphState) -> dict[str, Any]:
-            """Node function to write the initial unit test"""
-            # Get edge case tests first
-            existing_edge_case_tests_result = state["vector_store"].similarity_search(
-                "Unit test that tests an edge case", k=similarity_comparison_count
+        def metered(name: str, node: Callable[[GraphState], dict[str, Any]]) -> Callable[[GraphState], dict[str, Any]]:
+            """Wrap a node function to record its metrics under its node name"""
+
+            def metered_node(state: GraphState) -> dict[str, Any]:
+                with node_metrics.node(name):
+                    return node(state)
+
+            return metered_node
+
+        default_model = ModelBinding(getattr(llm, "model_name", None) or type(llm).__name__, llm, scheduler)
+
+        def model_for(node: str) -> ModelBinding:
+            """Helper function to get the model of a node"""
+            return models.get(node) if models is not None else default_model
+
+        def generate_text(node: str, prompt: str) -> Any:
+            """Helper function to invoke the LLM for a text producing node, streaming if a token callback is provided"""
+            model = model_for(node)
+            if token_callback:
+                return node_metrics.stream(
+                    model.llm, prompt, lambda text: token_callback(node, text), model.scheduler, model.model_name
+                )
+            return node_metrics.invoke(model.llm, prompt, model.scheduler, model.model_name)
+
+        def get_prompt_examples(state: GraphState) -> str:
+            """Helper function to format the prompt examples (the tests leading towards the target if indexed)"""
+            few_shot_index = state.get("few_shot_index")
+            target = state.get("target_path") or state["uncovered_lines"]
+            neighborhood_tests = (
+                few_shot_index.neighborhood_tests(
+                    state["code_to_test"],
+                    {id: document["text"] for id, document in state["vector_store"].store.items()},
+                    [line["line_number"] for line in target],
+                    state.get("few_shot_count", similarity_comparison_count),
+                )
+                if few_shot_index is not None
+                else []
             )
-            existing_edge_case_tests = "\n\n".join(
-                [
-                    f"Existing Test Case {i+1}:\n```python\n{result.page_content}\n```"
-                    for i, result in enumerate(existing_edge_case_tests_result)
-                ]
+            if neighborhood_tests:
+                return "\n\n".join(
+                    f"Existing Test Case {i+1} (covers the lines leading to the target):\n```python\n{test}\n```"
+                    for i, test in enumerate(neighborhood_tests)
+                )
+            return "\n\n".join(
+                f"Existing Test Case {i+1}:\n```python\n{result.page_content}\n```"
+                for i, result in enumerate(
+                    state["vector_store"].similarity_search(EDGE_CASE_QUERY, k=similarity_comparison_count)
+                )
             )
 
+        def write_initial_test(state: GraphState) -> dict[str, Any]:
+            """Node function to write the initial unit test"""
+            # Get the example tests first
+            existing_edge_case_tests = get_prompt_examples(state)
+            if state.get("duplicate_of"):
+                existing_edge_case_tests += duplicate_test_note.format(duplicate_test=state["duplicate_of"])
+
             log_node_execution(
                 (detailed_logger, minimal_logger),
                 "write_initial_test",
@@ -64,6 +161,7 @@ class LangChainGraph:
                     "code_to_test": state["code_to_test"],
                     "coverage_matrix": state["coverage_matrix"],
                     "uncovered_lines": state["uncovered_lines"],
+                    "target_path": state.get("target_path", []),
                     "existing_edge_case_tests": existing_edge_case_tests,
                 },
             )
@@ -74,28 +172,78 @@ class LangChainGraph:
                 if len(state["uncovered_lines"])
                 else "None"
             )
+            target_path_txt = (
+                "\n".join(f"Line {line['line_number']}: {line['line']}" for line in state.get("target_path", []))
+                or "None"
+            )
 
-            response = llm.invoke(
+            response = generate_text(
+                "write_initial_test",
                 write_test_case_prompt.format(
                     code_to_test=state["code_to_test"],
                     coverage_matrix=state["coverage_matrix"],
                     uncovered_lines=uncovered_lines_txt,
+                    target_path=target_path_txt,
                     existing_tests=existing_edge_case_tests,
-                )
+                ),
             )
             output = {"unit_test": sanitize_code_output(str(response.content))}
             log_node_execution((detailed_logger, minimal_logger), "write_initial_test", outputs=output)
             return output
 
+        def get_similar_tests(state: GraphState) -> str:
+            """Helper function to format the stored tests most similar to the candidate (by coverage if indexed)"""
+            coverage_index = state.get("coverage_index")
+            similar_tests = (
+                coverage_index.similar_tests(
+                    state["code_to_test"],
+                    state["unit_test"],
+                    {id: document["text"] for id, document in state["vector_store"].store.items()},
+                    similarity_comparison_count,
+                )
+                if coverage_index is not None
+                else None
+            )
+            if similar_tests is not None:
+                return "\n\n".join(
+                    f"Existing Unit Test {i+1} ({similarity:.0%} overlap of the covered lines):\n```python\n{test}\n```"
+                    for i, (test, similarity) in enumerate(similar_tests)
+                )
+            return "\n\n".join(
+                f"Existing Unit Test {i+1}:\n```python\n{result.page_content}\n```"
+                for i, result in enumerate(
+                    state["vector_store"].similarity_search(state["unit_test"], k=similarity_comparison_count)
+                )
+            )
+
+        def check_duplicate(state: GraphState) -> dict[str, Any]:
+            """Node function to detect exact and near duplicates of stored tests by their structural fingerprints"""
+            fingerprints = state.get("fingerprints")
+            if fingerprints is None:
+                return {"duplicate_of": ""}
+            fingerprints.sync({id: document["text"] for id, document in state["vector_store"].store.items()})
+            match = fingerprints.find_duplicate(state["unit_test"])
+            node_metrics.add_duplicate_check(match is not None)
+
+            regenerations = state.get("duplicate_regenerations", 0)
+            if match is not None and regenerations < MAX_DUPLICATE_REGENERATIONS:
+                output = {"duplicate_of": match.test, "duplicate_regenerations": regenerations + 1}
+            else:
+                output = {"duplicate_of": ""}
+            log_node_execution(
+                (detailed_logger, minimal_logger),
+                "check_duplicate",
+                outputs={
+                    **output,
+                    "similarity": match.similarity if match else None,
+                    "exact_duplicate": match.exact if match else None,
+                },
+            )
+            return output
+
         def fix_similarities(state: GraphState) -> dict[str, Any]:
             """Node function to fix similarities with existing tests"""
-            similar_tests = state["vector_store"].similarity_search(state["unit_test"], k=similarity_comparison_count)
-            existing_tests = "\n\n".join(
-                [
-                    f"Existing Unit Test {i+1}:\n```python\n{result.page_content}\n```"
-                    for i, result in enumerate(similar_tests)
-                ]
-            )
+            existing_tests = get_similar_tests(state)
 
             uncovered_lines_txt = (
                 "\n".join(f"Line {line['line_number']}: {line['line']}" for line in state["uncovered_lines"])
@@ -115,19 +263,63 @@ class LangChainGraph:
             )
 
             update_logs()
-            response = llm.invoke(
+            response = generate_text(
+                "fix_similarities",
                 fix_similarities_prompt.format(
                     code_to_test=state["code_to_test"],
                     existing_unit_tests=existing_tests,
                     new_unit_test=state["unit_test"],
                     coverage_matrix=state["coverage_matrix"],
                     uncovered_lines=uncovered_lines_txt,
-                )
+                ),
             )
             output = {"unit_test": sanitize_code_output(str(response.content))}
             log_node_execution((detailed_logger, minimal_logger), "fix_similarities", outputs=output)
             return output
 
+        def review_test(state: GraphState) -> dict[str, Any]:
+            """Node function to fix similarities, identify test smells and route in a single structured call"""
+            existing_tests = get_similar_tests(state)
+
+            uncovered_lines_txt = (
+                "\n".join(f"Line {line['line_number']}: {line['line']}" for line in state["uncovered_lines"])
+                if len(state["uncovered_lines"])
+                else "None"
+            )
+
+            log_node_execution(
+                (detailed_logger, minimal_logger),
+                "review_test",
+                inputs={
+                    "unit_test": state["unit_test"],
+                    "existing_tests": existing_tests,
+                    "coverage_matrix": state["coverage_matrix"],
+                    "uncovered_lines": uncovered_lines_txt,
+                },
+            )
+
+            update_logs()
+            model = model_for("review_test")
+            response = node_metrics.invoke(
+                model.llm.with_structured_output(ReviewTest, include_raw=True),
+                review_test_prompt.format(
+                    code_to_test=state["code_to_test"],
+                    existing_unit_tests=existing_tests,
+                    new_unit_test=state["unit_test"],
+                    coverage_matrix=state["coverage_matrix"],
+                    uncovered_lines=uncovered_lines_txt,
+                ),
+                model.scheduler,
+                model.model_name,
+            )
+            output = {
+                "unit_test": sanitize_code_output(response.unit_test),
+                "destination": response.destination if state["improvements_remaining"] > 0 else "keep_good_test",
+                "identified_smells": response.identified_smells,
+            }
+            log_node_execution((detailed_logger, minimal_logger), "review_test", outputs=output)
+            return output
+
         def has_test_smell_router(state: GraphState) -> dict[str, Any]:
             """Node function to route based on test smells"""
             if state["improvements_remaining"] <= 0:
@@ -148,9 +340,28 @@ class LangChainGraph:
                 inputs={"unit_test": state["unit_test"]},
             )
 
+            if static_smell_check:
+                report = analyze_test_smells(state["unit_test"])
+                if report.conclusive:
+                    node_metrics.skip_llm_call()
+                    output = {
+                        "destination": report.destination,
+                        "identified_smells": report.format(),
+                    }
+                    log_node_execution(
+                        (detailed_logger, minimal_logger),
+                        "has_test_smell_router",
+                        outputs={**output, "decided_by": "static smell analysis"},
+                    )
+                    return output
+
             update_logs()
-            response = llm.with_structured_output(RouteTest).invoke(
-                has_test_smell_router_prompt.format(code_to_test=state["code_to_test"], unit_test=state["unit_test"])
+            model = model_for("has_test_smell_router")
+            response = node_metrics.invoke(
+                model.llm.with_structured_output(RouteTest, include_raw=True),
+                has_test_smell_router_prompt.format(code_to_test=state["code_to_test"], unit_test=state["unit_test"]),
+                model.scheduler,
+                model.model_name,
             )
             output = {
                 "destination": response.destination,
@@ -175,12 +386,13 @@ class LangChainGraph:
             )
 
             update_logs()
-            response = llm.invoke(
+            response = generate_text(
+                "fix_test_smell",
                 fix_test_smell_prompt.format(
                     code_to_test=state["code_to_test"],
                     unit_test=state["unit_test"],
                     identified_smells=state["identified_smells"],
-                )
+                ),
             )
             output = {
                 "unit_test": sanitize_code_output(str(response.content)),
@@ -199,7 +411,7 @@ class LangChainGraph:
             )
 
             new_test_doc = Document(page_content=state["unit_test"], metadata={"type": "unit_test"})
-            state["vector_store"].add_documents([new_test_doc])
+            state["vector_store"].add_documents([new_test_doc], ids=[get_test_hash(state["unit_test"])])
             output = {"vector_store": state["vector_store"]}
             log_node_execution((detailed_logger, minimal_logger), "add_to_vectorstore", outputs=output)
             return output
@@ -208,16 +420,35 @@ class LangChainGraph:
         builder = StateGraph(GraphState)
 
         # Add nodes
-        builder.add_node("write_initial_test", write_initial_test)
-        builder.add_node("fix_similarities", fix_similarities)
-        builder.add_node("has_test_smell_router", has_test_smell_router)
-        builder.add_node("fix_test_smell", fix_test_smell)
-        builder.add_node("add_to_vectorstore", add_to_vectorstore)
+        builder.add_node("write_initial_test", metered("write_initial_test", write_initial_test))
+        builder.add_node("check_duplicate", metered("check_duplicate", check_duplicate))
+        builder.add_node("has_test_smell_router", metered("has_test_smell_router", has_test_smell_router))
+        builder.add_node("fix_test_smell", metered("fix_test_smell", fix_test_smell))
+        builder.add_node("add_to_vectorstore", metered("add_to_vectorstore", add_to_vectorstore))
 
         # Add edges
         builder.add_edge(START, "write_initial_test")
-        builder.add_edge("write_initial_test", "fix_similarities")
-        builder.add_edge("fix_similarities", "has_test_smell_router")
+        builder.add_edge("write_initial_test", "check_duplicate")
+        review_node = "review_test" if topology == "merged_review" else "fix_similarities"
+        builder.add_conditional_edges(
+            "check_duplicate",
+            lambda state: "write_initial_test" if state["duplicate_of"] else review_node,
+            {"write_initial_test": "write_initial_test", review_node: review_node},
+        )
+        if topology == "merged_review":
+            # A single structured call replaces fix_similarities and the first router call
+            builder.add_node("review_test", metered("review_test", review_test))
+            builder.add_conditional_edges(
+                "review_test",
+                lambda state: state["destination"],
+                {
+                    "fix_test_smell": "fix_test_smell",
+                    "keep_good_test": "add_to_vectorstore",
+                },
+            )
+        else:
+            builder.add_node("fix_similarities", metered("fix_similarities", fix_similarities))
+            builder.add_edge("fix_similarities", "has_test_smell_router")
         builder.add_conditional_edges(
             "has_test_smell_router",
             lambda state: state["destination"],
@@ -0,0 +1,88 @@
+import copy
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from langchain.chat_models.base import BaseChatModel
+
+from core.backends import create_chat_model, get_provider
+from core.scheduler import ProviderScheduler, get_scheduler
+
+# Steps that call the LLM and can be assigned their own model with cfg["llm"]["node_models"]
+LLM_NODES = [
+    "write_initial_test",
+    "fix_similarities",
+    "review_test",
+    "has_test_smell_router",
+    "fix_test_smell",
+    "write_test_batch",
+    "retry_batch_test",
+]
+
+
+@dataclass
+class ModelBinding:
+    """Chat model of a node together with the scheduler of its provider"""
+
+    model_name: str
+    llm: BaseChatModel
+    scheduler: Optional[ProviderScheduler]
+
+
+class ModelPool:
+    """
+    Chat models per graph node
+
+    Nodes without an entry in cfg["llm"]["node_models"] (node -> model name) use the default model
+    (cfg["llm"]["model_name"]). The settings are read on every lookup, so changed assignments apply to the next call.
+    Models are created once and shared by all nodes (and the escalated pool) using the same model name, every model
+    uses the shared scheduler of its provider.
+
+    Usage:
+        models = ModelPool(cfg)
+        binding = models.get("has_test_smell_router")
+        escalated = models.escalated()  # every node uses cfg["llm"]["escalation_model"], None if not configured
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        self.cfg = cfg
+        self.escalation = False
+        self._bindings: Dict[str, ModelBinding] = {}
+        self._lock = threading.Lock()
+
+    def model_name(self, node: Optional[str] = None) -> str:
+        """Name of the model a node uses (the default model if no node is given)"""
+        if self.escalation and self.cfg["llm"].get("escalation_model"):
+            return self.cfg["llm"]["escalation_model"]
+        node_models = self.cfg["llm"].get("node_models") or {}
+        return node_models.get(node) or self.cfg["llm"]["model_name"]
+
+    def get(self, node: Optional[str] = None) -> ModelBinding:
+        """Model and provider scheduler of a node (the default model if no node is given)"""
+        model_name = self.model_name(node)
+        with self._lock:
+            if model_name not in self._bindings:
+                provider = get_provider(self.cfg, model_name)
+                self._bindings[model_name] = ModelBinding(
+                    model_name,
+                    create_chat_model(self.cfg, model_name),
+                    get_scheduler(provider, self.cfg.get("rate_limits", {}).get(provider)),
+                )
+            return self._bindings[model_name]
+
+    @property
+    def default(self) -> ModelBinding:
+        return self.get()
+
+    def escalated(self) -> Optional["ModelPool"]:
+        """Pool using the escalation model for every node, None if no escalation model is configured"""
+        if not self.cfg["llm"].get("escalation_model"):
+            return None
+        escalated = copy.copy(self)  # shares the created models
+        escalated.escalation = True
+        return escalated
+
+    def schedulers(self) -> Dict[str, ProviderScheduler]:
+        """Provider schedulers of the models created so far, by provider"""
+        with self._lock:
+            return {binding.scheduler.provider: binding.scheduler for binding in self._bindings.values()}
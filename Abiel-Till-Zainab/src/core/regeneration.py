@@ -0,0 +1,174 @@
+import random
+import string
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from radon.complexity import cc_visit
+
+from core.generator import UnitTestGenerator
+from utils.code_processing import extract_test_records
+from utils.metrics import compute_test_coverage
+from utils.test_suite import SuiteTest, TestSuite
+
+# Columns of the event CSVs of the regeneration study (report_data/regenetation_report/)
+EVENT_COLUMNS = [
+    "timestamp",
+    "run_id",
+    "event",
+    "coverage",
+    "coverage_lines",
+    "test_case_name",
+    "test_covered_lines",
+    "is_full_coverage",
+    "function_complexity",
+    "total_unique_lines",
+    "unique_lines_covered_deleted_test",
+    "ranking_info",
+]
+# Deleted tests by their rank in unique coverage, in the order of the study
+DELETION_RANKINGS = ["max", "med", "min"]
+
+
+def new_run_id() -> str:
+    """Run id like in the study CSVs: start time and four random characters (e.g. 20250127_162204_jlz0)"""
+    suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
+    return f"{datetime.now():%Y%m%d_%H%M%S}_{suffix}"
+
+
+def select_ranked_test(suite: TestSuite, ranking: str) -> Tuple[SuiteTest, int]:
+    """
+    Test with the minimum ("min"), median ("med") or maximum ("max") number of lines no other test covers
+
+    Ties keep the suite order. Returns the test and its number of uniquely covered lines.
+    """
+    if ranking not in DELETION_RANKINGS:
+        raise ValueError(f"Unknown ranking {ranking!r}, expected one of {DELETION_RANKINGS}")
+    unique_lines = suite.unique_lines()
+    ranked = sorted(suite, key=lambda test: len(unique_lines[test.hash]))
+    test = ranked[{"min": 0, "med": len(ranked) // 2, "max": len(ranked) - 1}[ranking]]
+    return test, len(unique_lines[test.hash])
+
+
+class RegenerationExperiment:
+    """
+    Headless delete-and-regenerate study of one function
+
+    Tests are generated until full line coverage (or `max_tests`). Then, for every ranking, the test with the
+    minimum, median or maximum unique coverage is deleted and tests are generated again until the coverage before
+    the deletion is restored (or `regeneration_rounds` rounds are spent). Every generation round, accepted test and
+    deletion is an event row in the schema of the study CSVs, with the study's events: a generated_test_auto row with
+    the coverage after every round of the initial generation, generated_test rows with the coverage before the test and
+    accept_test rows with the coverage after it in the regeneration, and deleted_test rows with the coverage before
+    the deletion.
+
+    Usage:
+        experiment = RegenerationExperiment(generator, code_to_test)
+        events = experiment.run()
+        events.to_csv(f"{experiment.run_id}.csv", index=False)
+    """
+
+    def __init__(
+        self,
+        generator: UnitTestGenerator,
+        code_to_test: str,
+        max_tests: int = 25,
+        regeneration_rounds: int = 10,
+        run_id: Optional[str] = None,
+    ):
+        self.generator = generator
+        self.code_to_test = code_to_test
+        self.max_tests = max_tests
+        self.regeneration_rounds = regeneration_rounds
+        self.run_id = run_id or new_run_id()
+        # McCabe complexity of the code under test, summed over its top-level blocks like radon cc reports them
+        self.function_complexity = float(sum(block.complexity for block in cc_visit(code_to_test)) or 1)
+        self.suite = TestSuite()
+        self.events: List[Dict[str, Any]] = []
+        self._regenerating = False
+
+    def _log(
+        self,
+        event: str,
+        raw_results: Dict[str, Any],
+        test_case_name: str,
+        test_covered_lines: int = 0,
+        unique_lines_covered_deleted_test: int = 0,
+        ranking_info: str = "",
+    ):
+        self.events.append(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "run_id": self.run_id,
+                "event": event,
+                "coverage": f"{raw_results['line_coverage']:.4f}",
+                "coverage_lines": sum(1 for row_sum in raw_results["row_sums"] if row_sum > 0),
+                "test_case_name": test_case_name,
+                "test_covered_lines": test_covered_lines,
+                "is_full_coverage": raw_results["line_coverage"] >= 1.0,
+                "function_complexity": self.function_complexity,
+                "total_unique_lines": len(raw_results["line_numbers"]),
+                "unique_lines_covered_deleted_test": unique_lines_covered_deleted_test,
+                "ranking_info": ranking_info,
+            }
+        )
+
+    def _log_round(
+        self,
+        result: Dict[str, Any],
+        new_tests: List[SuiteTest],
+        previous_raw_results: Dict[str, Any],
+        raw_results: Dict[str, Any],
+    ):
+        """
+        Log a generation round: in the initial generation with the coverage after it, in the regeneration with the
+        coverage before the generated test and, if it entered the suite, its acceptance with the coverage after it
+        """
+        names = [record.name for record in extract_test_records(result["generated_test_case"])]
+        covered_lines = len(set().union(*(test.covered_lines or () for test in new_tests)))
+        if not self._regenerating:
+            self._log("generated_test_auto", raw_results, " ".join(names) or "(no_test)", covered_lines)
+            return
+        self._log("generated_test", previous_raw_results, " ".join(names) or "(no_test)", covered_lines)
+        if new_tests:
+            self._log("accept_test", raw_results, "(accepted_test)")
+
+    def _generate(self, max_tests: int, max_rounds: int, target_coverage: float) -> Dict[str, Any]:
+        return self.generator.generate_until_coverage(
+            self.code_to_test,
+            self.suite,
+            max_tests=max_tests,
+            max_rounds=max_rounds,
+            target_coverage=target_coverage,
+            round_callback=self._log_round,
+        )
+
+    def run(self, rankings: Sequence[str] = DELETION_RANKINGS) -> pd.DataFrame:
+        """Generate the suite, then delete and regenerate once per ranking, returns the events"""
+        self._regenerating = False
+        raw_results = self._generate(self.max_tests, self.max_tests, 1.0)["raw_results"]
+        self._regenerating = True
+        for ranking in rankings:
+            if not len(self.suite):
+                break
+            coverage = raw_results["line_coverage"]
+            test, unique_line_count = select_ranked_test(self.suite, ranking)
+            self._log(
+                "deleted_test",
+                raw_results,
+                "(user_deleted_test)",
+                len(test.covered_lines),
+                unique_line_count,
+                ranking,
+            )
+            self.suite.remove(test.hash)
+            _, raw_results = compute_test_coverage(self.code_to_test, self.suite.sources, test_names=self.suite.names)
+            self.suite.update_coverage(raw_results)
+            # The deleted test frees its place, the suite may grow by the regeneration rounds
+            raw_results = self._generate(
+                len(self.suite) + self.regeneration_rounds, self.regeneration_rounds, coverage
+            )["raw_results"]
+        return self.to_dataframe()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.events, columns=EVENT_COLUMNS)
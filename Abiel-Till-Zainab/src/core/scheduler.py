@@ -0,0 +1,238 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Status codes worth retrying: rate limits, timeouts and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = ("RateLimit", "Timeout", "APIConnection", "ServiceUnavailable", "InternalServer")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously up to a per-minute capacity
+
+    A capacity of None disables the limit. Requests larger than the capacity wait for a full bucket.
+    """
+
+    def __init__(self, per_minute: Optional[float]):
+        self.capacity = per_minute
+        self.level = per_minute or 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until `amount` tokens are available and take them, returns the seconds waited"""
+        if self.capacity is None:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return waited
+                wait = (amount - self.level) * 60 / self.capacity
+            time.sleep(wait)
+            waited += wait
+
+    def consume(self, amount: float):
+        """Take tokens without waiting, the level may become negative (e.g. to correct an estimate)"""
+        if self.capacity is None:
+            return
+        with self.lock:
+            self._refill()
+            self.level -= amount
+
+
+@dataclass
+class RequestStats:
+    """Scheduling statistics of a single request"""
+
+    queue_wait_s: float = 0.0
+    retries: int = 0
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check if an error is a rate limit or transient error worth retrying"""
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Get the server's retry-after delay in seconds, if the error carries one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderScheduler:
+    """
+    Request scheduler shared by all LLM calls to one provider
+
+    Limits requests per minute and tokens per minute with token buckets, bounds the number of in-flight requests and
+    retries rate limit and transient errors with jittered exponential backoff (honoring retry-after headers).
+    Queue wait statistics are collected to size the concurrency for maximum sustained throughput.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_in_flight: int = 4,
+        max_retries: int = 5,
+        base_delay_s: float = 1.0,
+        max_delay_s: float = 60.0,
+        completion_tokens_estimate: int = 1000,
+    ):
+        self.provider = provider
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.completion_tokens_estimate = completion_tokens_estimate
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self._rng = random.Random()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the collected statistics"""
+        with self.lock:
+            self._queue_waits: List[float] = []
+            self._counts = {"requests": 0, "completed": 0, "failed": 0, "retries": 0, "rate_limit_errors": 0}
+            self._in_flight = 0
+            self._peak_in_flight = 0
+            self._waiting = 0
+            self._started = time.monotonic()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full jitter exponential backoff, at least the server's retry-after delay"""
+        delay = self._rng.uniform(0, min(self.max_delay_s, self.base_delay_s * 2**attempt))
+        retry_after = get_retry_after(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _acquire(self, estimated_tokens: int) -> float:
+        """Wait for a free slot and the rate limits, returns the seconds waited"""
+        start = time.monotonic()
+        with self.lock:
+            self._waiting += 1
+        self.slots.acquire()
+        self.request_bucket.acquire(1)
+        self.token_bucket.acquire(estimated_tokens)
+        with self.lock:
+            self._waiting -= 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        return time.monotonic() - start
+
+    def _release(self):
+        with self.lock:
+            self._in_flight -= 1
+        self.slots.release()
+
+    def submit(
+        self,
+        request: Callable[[], T],
+        prompt_tokens: int = 0,
+        get_used_tokens: Optional[Callable[[T], int]] = None,
+    ) -> Tuple[T, RequestStats]:
+        """
+        Run a request under the provider's limits, retrying rate limit and transient errors
+
+        Args:
+            request: Function performing the LLM request
+            prompt_tokens: Estimated prompt tokens (the completion estimate is added for the tokens/min limit)
+            get_used_tokens: Optional function returning the actual tokens used by a response to correct the estimate
+
+        Returns:
+            Tuple of (response, scheduling statistics of this request)
+        """
+        estimated_tokens = prompt_tokens + self.completion_tokens_estimate
+        stats = RequestStats()
+        with self.lock:
+            self._counts["requests"] += 1
+
+        for attempt in range(self.max_retries + 1):
+            queue_wait = self._acquire(estimated_tokens)
+            stats.queue_wait_s += queue_wait
+            with self.lock:
+                self._queue_waits.append(queue_wait)
+            try:
+                response = request()
+            except Exception as e:
+                self._release()
+                if not is_retryable(e) or attempt == self.max_retries:
+                    with self.lock:
+                        self._counts["failed"] += 1
+                    raise
+                with self.lock:
+                    self._counts["retries"] += 1
+                    if "RateLimit" in type(e).__name__ or getattr(e, "status_code", None) == 429:
+                        self._counts["rate_limit_errors"] += 1
+                stats.retries += 1
+                time.sleep(self._backoff(attempt, e))
+                continue
+
+            self._release()
+            if get_used_tokens is not None:
+                self.token_bucket.consume(get_used_tokens(response) - estimated_tokens)
+            with self.lock:
+                self._counts["completed"] += 1
+            return response, stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue wait, retry and concurrency statistics since the last reset"""
+        with self.lock:
+            waits = sorted(self._queue_waits)
+            elapsed_min = max(time.monotonic() - self._started, 1e-9) / 60
+            return {
+                "provider": self.provider,
+                **self._counts,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "waiting": self._waiting,
+                "max_in_flight": self.max_in_flight,
+                "mean_queue_wait_s": sum(waits) / len(waits) if waits else 0.0,
+                "p95_queue_wait_s": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "max_queue_wait_s": waits[-1] if waits else 0.0,
+                "completed_per_minute": self._counts["completed"] / elapsed_min,
+            }
+
+
+_schedulers: Dict[str, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: str, limits: Optional[Dict[str, Any]] = None) -> ProviderScheduler:
+    """
+    Get the scheduler shared by all LLM calls to a provider within this process
+
+    The limits (keyword arguments of ProviderScheduler) are only applied when the scheduler is first created.
+    """
+    with _schedulers_lock:
+        if provider not in _schedulers:
+            _schedulers[provider] = ProviderScheduler(provider, **(limits or {}))
+        return _schedulers[provider]
+
+
+def reset_schedulers():
+    """Drop all shared schedulers (e.g. to apply changed limits)"""
+    with _schedulers_lock:
+        _schedulers.clear()
@@ -0,0 +1,552 @@
+import ast
+import copy
+import operator
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.control_flow import get_line_owners
+from utils.tracing import TraceResult, load_code, trace_call
+
+# Upper bound on the explored paths per function, the walk yields deep (branch taken) paths first
+MAX_PATHS = 2000
+
+COMPARISONS: Dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+# Comparison with swapped operands: literal < x  <=>  x > literal
+MIRRORED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+
+class Unsupported(Exception):
+    """Raised when a statement or condition is outside what the synthesizer can solve"""
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """
+    Unbound parameter of the function under test
+
+    A symbol either collects constraints (op, literal, truth) that its final value has to satisfy, or, once it is
+    consumed through pops (e.g. get_next_action(actions)), the sequence of values popped from it.
+    """
+
+    name: str
+    default: Any
+    constraints: Tuple[Tuple[type, Any, bool], ...] = ()
+    consumed: Optional[Tuple[Any, ...]] = None
+
+    def candidates(self) -> List[Any]:
+        """Candidate values: the default, the compared literals and their integer neighbors"""
+        values = [self.default]
+        for _, literal, _ in self.constraints:
+            values.append(literal)
+            if isinstance(literal, int) and not isinstance(literal, bool):
+                values += [literal - 1, literal + 1]
+            elif isinstance(literal, tuple) and all(isinstance(item, int) for item in literal):
+                values += [tuple(item + 1 for item in literal), tuple(item - 1 for item in literal)]
+            elif isinstance(literal, str):
+                values.append(literal + "_other")
+        return values
+
+    def solve(self) -> Tuple[bool, Any]:
+        """Find a value satisfying all constraints, returns (solved, value)"""
+        for value in self.candidates():
+            try:
+                if all(COMPARISONS[op](value, literal) == truth for op, literal, truth in self.constraints):
+                    return True, value
+            except TypeError:
+                continue
+        return False, None
+
+
+@dataclass(frozen=True)
+class PathState:
+    """State of the symbolic walk along one path"""
+
+    env: Dict[str, Any]  # concrete values of local names
+    symbols: Dict[str, Symbol]  # parameters not bound to a concrete value yet
+    inputs: Dict[str, Any]  # concrete values chosen for bound parameters
+    lines: Tuple[int, ...] = ()
+
+
+@dataclass
+class SynthesizedCase:
+    """Inputs solved for one path and the observed behavior of the function under test"""
+
+    function: str
+    inputs: Dict[str, Any]
+    trace: TraceResult
+    covered_lines: Set[int] = field(default_factory=set)
+
+
+def _default_value(annotation: Optional[ast.expr]) -> Any:
+    """Neutral value of a type hint (0 for int, () elements for Tuple[int, int], [] for List[...])"""
+    if annotation is None:
+        return None
+    if isinstance(annotation, ast.Subscript):
+        base = ast.unparse(annotation.value).split(".")[-1].lower()
+        elements = annotation.slice.elts if isinstance(annotation.slice, ast.Tuple) else [annotation.slice]
+        if base == "tuple":
+            return tuple(_default_value(element) for element in elements if not isinstance(element, ast.Constant))
+        if base == "optional":
+            return None
+        annotation = annotation.value
+    name = ast.unparse(annotation).split(".")[-1].lower()
+    return {"int": 0, "float": 0.0, "str": "", "bool": False, "list": [], "sequence": [], "dict": {}, "set": set()}.get(
+        name
+    )
+
+
+def _pop_helpers(function: ast.FunctionDef) -> Dict[str, int]:
+    """
+    Local helper functions that pop the next element of a sequence argument, e.g.
+
+        def get_next_action(remaining_input):
+            return remaining_input.pop(0) if remaining_input else None
+
+    Returns:
+        Helper name -> index of the popped argument
+    """
+    helpers = {}
+    for node in ast.walk(function):
+        if not isinstance(node, ast.FunctionDef) or node is function or len(node.body) != 1:
+            continue
+        statement = node.body[0]
+        if not isinstance(statement, ast.Return) or statement.value is None:
+            continue
+        value = statement.value.body if isinstance(statement.value, ast.IfExp) else statement.value
+        if (
+            isinstance(value, ast.Call)
+            and isinstance(value.func, ast.Attribute)
+            and value.func.attr == "pop"
+            and isinstance(value.func.value, ast.Name)
+        ):
+            parameters = [argument.arg for argument in node.args.args]
+            if value.func.value.id in parameters:
+                helpers[node.name] = parameters.index(value.func.value.id)
+    return helpers
+
+
+class PathSynthesizer:
+    """
+    Walks one function along its branches, solving the branch conditions for the function's parameters
+
+    Supported: equality and ordering comparisons of parameters with literals (binding or constraining the parameter),
+    conditions on concrete local values (evaluated), sequence consumption through pop helpers or .pop() (the popped
+    values become the sequence argument) and short-circuit and/or/not. Loops, try, with and match statements and other
+    conditions on parameters end the path as unsupported, those branches are left to the LLM.
+    """
+
+    def __init__(self, function: ast.FunctionDef, namespace: Dict[str, Any], max_paths: int = MAX_PATHS):
+        self.function = function
+        self.namespace = namespace
+        self.max_paths = max_paths
+        self.pop_helpers = _pop_helpers(function)
+        self.consumed_literals: Dict[str, List[Any]] = {}
+        arguments = function.args.posonlyargs + function.args.args + function.args.kwonlyargs
+        self.parameters = {
+            argument.arg: Symbol(argument.arg, _default_value(argument.annotation)) for argument in arguments
+        }
+
+    def paths(self) -> Iterator[PathState]:
+        """Complete paths (returned, raised or fell through) with their solved inputs"""
+        state = PathState(env={}, symbols=dict(self.parameters), inputs={})
+        count = 0
+        for final_state, outcome in self._walk(self.function.body, state):
+            if outcome == "unsupported":
+                continue
+            yield final_state
+            count += 1
+            if count >= self.max_paths:
+                return
+
+    def solve_inputs(self, state: PathState) -> Optional[Dict[str, Any]]:
+        """Concrete arguments for a path, None if the constraints cannot be satisfied"""
+        inputs = {}
+        for name in self.parameters:
+            if name in state.inputs:
+                inputs[name] = state.inputs[name]
+                continue
+            symbol = state.symbols[name]
+            if symbol.consumed is not None:
+                inputs[name] = list(symbol.consumed)
+                continue
+            solved, value = symbol.solve()
+            if not solved:
+                return None
+            inputs[name] = value
+        return inputs
+
+    # Walk
+
+    def _walk(self, statements: List[ast.stmt], state: PathState) -> Iterator[Tuple[PathState, str]]:
+        """Yield (state, outcome) for every path through the statements, outcome is next, return or unsupported"""
+        if not statements:
+            yield state, "next"
+            return
+        statement, rest = statements[0], statements[1:]
+        state = replace(state, lines=state.lines + (statement.lineno,))
+
+        if isinstance(statement, ast.If):
+            for taken in (True, False):
+                try:
+                    branch_states = list(self._assume(state, statement.test, taken))
+                except Unsupported:
+                    yield state, "unsupported"
+                    return
+                for branch_state in branch_states:
+                    for body_state, outcome in self._walk(statement.body if taken else statement.orelse, branch_state):
+                        if outcome == "next":
+                            yield from self._walk(rest, body_state)
+                        else:
+                            yield body_state, outcome
+            return
+
+        if isinstance(statement, (ast.Return, ast.Raise)):
+            yield state, "return"
+            return
+        if isinstance(statement, (ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith, ast.Match)):
+            yield state, "unsupported"
+            return
+
+        try:
+            next_state = self._execute(state, statement)
+        except Unsupported:
+            yield state, "unsupported"
+            return
+        if next_state is None:
+            yield state, "return"  # the statement raises, the path ends here
+            return
+        yield from self._walk(rest, next_state)
+
+    def _execute(self, state: PathState, statement: ast.stmt) -> Optional[PathState]:
+        """Execute a simple statement on concrete values, None if it raises"""
+        checked = statement.decorator_list if isinstance(statement, (ast.FunctionDef, ast.ClassDef)) else [statement]
+        state = self._concretize(state, [node for root in checked for node in ast.walk(root)])
+        env = copy.copy(state.env)
+        namespace = {**self.namespace, **env}
+        try:
+            exec(compile(ast.Module(body=[statement], type_ignores=[]), "<synthesis>", "exec"), namespace)
+        except Exception:
+            return None
+        env.update({name: value for name, value in namespace.items() if name not in self.namespace or name in env})
+        for name in set(namespace) & set(self.namespace):
+            if namespace[name] is not self.namespace[name]:
+                env[name] = namespace[name]
+        return replace(state, env=env)
+
+    def _concretize(self, state: PathState, nodes: List[ast.AST]) -> PathState:
+        """Bind the symbols referenced by the nodes to a value satisfying their constraints"""
+        symbols, inputs, env = dict(state.symbols), dict(state.inputs), dict(state.env)
+        for node in nodes:
+            if isinstance(node, ast.Name) and node.id in symbols:
+                symbol = symbols.pop(node.id)
+                if symbol.consumed is not None:
+                    raise Unsupported(f"{node.id} is consumed and used otherwise")
+                solved, value = symbol.solve()
+                if not solved:
+                    raise Unsupported(f"constraints of {node.id} cannot be satisfied")
+                inputs[node.id] = value
+                env[node.id] = copy.deepcopy(value)
+        return replace(state, symbols=symbols, inputs=inputs, env=env)
+
+    # Conditions
+
+    def _assume(self, state: PathState, test: ast.expr, truth: bool) -> Iterator[PathState]:
+        """States in which the condition evaluates to `truth` (short-circuit evaluation, pops happen in order)"""
+        if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+            yield from self._assume(state, test.operand, not truth)
+            return
+        if isinstance(test, ast.BoolOp):
+            # and: all true, or the first false one; or: all false, or the first true one
+            short_circuit = not isinstance(test.op, ast.And)
+            if truth != short_circuit:
+                states = [state]
+                for value in test.values:
+                    states = [next_state for state in states for next_state in self._assume(state, value, truth)]
+                yield from states
+            else:
+                prefix_states = [state]
+                for value in test.values:
+                    for prefix_state in prefix_states:
+                        yield from self._assume(prefix_state, value, truth)
+                    prefix_states = [
+                        next_state for state in prefix_states for next_state in self._assume(state, value, not truth)
+                    ]
+            return
+
+        if isinstance(test, ast.Compare) and len(test.ops) == 1:
+            yield from self._assume_comparison(state, test.left, type(test.ops[0]), test.comparators[0], truth)
+            return
+        if isinstance(test, ast.Name) and test.id in state.symbols:
+            yield from self._truthiness(state, test.id, truth)
+            return
+        yield from self._evaluate(state, test, truth)
+
+    def _evaluate(self, state: PathState, expression: ast.expr, truth: bool) -> Iterator[PathState]:
+        """Evaluate a condition without symbols on the concrete values"""
+        names = [node for node in ast.walk(expression) if isinstance(node, ast.Name)]
+        if any(node.id in state.symbols for node in names) or self._consumption(state, expression):
+            raise Unsupported(ast.unparse(expression))
+        try:
+            value = self._eval(state, expression)
+        except Exception:
+            raise Unsupported(ast.unparse(expression))
+        if bool(value) == truth:
+            yield state
+
+    def _eval(self, state: PathState, expression: ast.expr) -> Any:
+        """Evaluate an expression on the concrete values"""
+        code = compile(ast.fix_missing_locations(ast.Expression(body=expression)), "<synthesis>", "eval")
+        return eval(code, {**self.namespace, **state.env})
+
+    def _consumption(self, state: PathState, expression: ast.expr) -> Optional[str]:
+        """Name of the parameter a pop expression consumes (helper(actions) or actions.pop(...))"""
+        if not isinstance(expression, ast.Call):
+            return None
+        if isinstance(expression.func, ast.Name) and expression.func.id in self.pop_helpers:
+            index = self.pop_helpers[expression.func.id]
+            if index < len(expression.args) and isinstance(expression.args[index], ast.Name):
+                name = expression.args[index].id
+                return name if name in state.symbols else None
+        if (
+            isinstance(expression.func, ast.Attribute)
+            and expression.func.attr == "pop"
+            and isinstance(expression.func.value, ast.Name)
+            and expression.func.value.id in state.symbols
+        ):
+            return expression.func.value.id
+        return None
+
+    def _assume_comparison(
+        self, state: PathState, left: ast.expr, op: type, right: ast.expr, truth: bool
+    ) -> Iterator[PathState]:
+        if op not in COMPARISONS:
+            yield from self._evaluate(state, ast.Compare(left=left, ops=[op()], comparators=[right]), truth)
+            return
+        # Put the symbolic side left
+        if self._is_symbolic(state, right) and not self._is_symbolic(state, left):
+            if op not in MIRRORED:
+                raise Unsupported("membership test on a parameter")
+            left, right, op = right, left, MIRRORED[op]
+        if not self._is_symbolic(state, left):
+            yield from self._evaluate(state, ast.Compare(left=left, ops=[op()], comparators=[right]), truth)
+            return
+
+        literal = self._literal(state, right)
+        consumed = self._consumption(state, left)
+        if consumed is not None:
+            yield from self._pop(state, consumed, op, literal, truth)
+        elif isinstance(left, ast.Name):
+            yield from self._constrain(state, left.id, op, literal, truth)
+        else:
+            raise Unsupported(ast.unparse(left))
+
+    def _is_symbolic(self, state: PathState, expression: ast.expr) -> bool:
+        return (isinstance(expression, ast.Name) and expression.id in state.symbols) or bool(
+            self._consumption(state, expression)
+        )
+
+    def _literal(self, state: PathState, expression: ast.expr) -> Any:
+        """Concrete value of the other side of a comparison"""
+        if any(isinstance(node, ast.Name) and node.id in state.symbols for node in ast.walk(expression)):
+            raise Unsupported("comparison of two parameters")
+        try:
+            return self._eval(state, expression)
+        except Exception:
+            raise Unsupported(ast.unparse(expression))
+
+    def _constrain(self, state: PathState, name: str, op: type, literal: Any, truth: bool) -> Iterator[PathState]:
+        symbol = state.symbols[name]
+        if symbol.consumed is not None:
+            raise Unsupported(f"{name} is consumed and compared")
+        symbol = replace(symbol, constraints=symbol.constraints + ((op, literal, truth),))
+        solved, value = symbol.solve()
+        if not solved:
+            return
+        if op is ast.Eq and truth:
+            # The parameter is determined, continue with its concrete value
+            symbols = {key: value for key, value in state.symbols.items() if key != name}
+            yield replace(
+                state,
+                symbols=symbols,
+                inputs={**state.inputs, name: value},
+                env={**state.env, name: copy.deepcopy(value)},
+            )
+        else:
+            yield replace(state, symbols={**state.symbols, name: symbol})
+
+    def _truthiness(self, state: PathState, name: str, truth: bool) -> Iterator[PathState]:
+        symbol = state.symbols[name]
+        for value in symbol.candidates() + [True, 1, "x", (0,), [0]]:
+            try:
+                if bool(value) == truth and all(
+                    COMPARISONS[op](value, literal) == expected for op, literal, expected in symbol.constraints
+                ):
+                    yield from self._constrain(state, name, ast.Eq, value, True)
+                    return
+            except TypeError:
+                continue
+
+    def _pop(self, state: PathState, name: str, op: type, literal: Any, truth: bool) -> Iterator[PathState]:
+        """Choose the popped value so that `popped op literal` evaluates to truth"""
+        symbol = state.symbols[name]
+        if symbol.constraints:
+            raise Unsupported(f"{name} is compared and consumed")
+        self.consumed_literals.setdefault(name, [])
+        if literal not in self.consumed_literals[name]:
+            self.consumed_literals[name].append(literal)
+        fillers = [value for value in self.consumed_literals[name] if value != literal]
+        candidates = [literal] + fillers + ([literal + "_other"] if isinstance(literal, str) else [])
+        for value in candidates:
+            try:
+                if COMPARISONS[op](value, literal) != truth:
+                    continue
+            except TypeError:
+                continue
+            consumed = (symbol.consumed or ()) + (value,)
+            yield replace(state, symbols={**state.symbols, name: replace(symbol, consumed=consumed)})
+            return
+
+
+def _format_lines(lines: List[int]) -> str:
+    """Compact line ranges, e.g. 3-5, 9"""
+    ranges: List[List[int]] = []
+    for line in sorted(lines):
+        if ranges and line == ranges[-1][1] + 1:
+            ranges[-1][1] = line
+        else:
+            ranges.append([line, line])
+    return ", ".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def _is_literal_repr(value: Any) -> bool:
+    try:
+        return ast.literal_eval(repr(value)) == value
+    except (ValueError, SyntaxError, TypeError):
+        return False
+
+
+def describe_lines(lines: List[int]) -> str:
+    """Describe target lines for a docstring, e.g. lines 3-5, 9"""
+    return f"line{'s' if len(lines) > 1 else ''} {_format_lines(lines)}"
+
+
+def render_test_case(case: SynthesizedCase, test_name: str, docstring: str) -> Optional[str]:
+    """
+    Render a case as a unittest method asserting its observed behavior
+
+    Returns:
+        Test case function, None if its inputs or result cannot be written as literals
+    """
+    if not all(_is_literal_repr(value) for value in case.inputs.values()):
+        return None
+    arrange = [f"{name} = {value!r}" for name, value in case.inputs.items()]
+    call = f"{case.function}({', '.join(case.inputs)})"
+    docstring = f'"""{docstring}"""'
+
+    if case.trace.exception is not None:
+        exception = type(case.trace.exception)
+        if exception.__module__ != "builtins":
+            return None
+        body = arrange + [
+            f'with self.assertRaises({exception.__name__}, msg="The solved path should raise {exception.__name__}"):',
+            f"    {call}",
+        ]
+    elif _is_literal_repr(case.trace.result):
+        body = arrange + [
+            f"expected_result = {case.trace.result!r}",
+            "",
+            f"result = {call}",
+            "",
+            "self.assertEqual(result, expected_result, "
+            '"The function should return the recorded result for this path")',
+        ]
+    else:
+        body = arrange + [
+            "",
+            f"result = {call}",
+            "",
+            f"self.assertIsInstance(result, {type(case.trace.result).__name__}, "
+            f'"The function should return a {type(case.trace.result).__name__} for this path")',
+        ]
+    return "\n".join([f"def {test_name}(self):", f"    {docstring}"] + [f"    {line}" if line else "" for line in body])
+
+
+def synthesize_tests(
+    code_to_test: str, uncovered_lines: List[Dict[str, Any]], taken_names: Optional[Set[str]] = None
+) -> List[str]:
+    """
+    Synthesize unittest methods for the uncovered lines whose branch conditions can be solved locally
+
+    Every top-level function is walked along its branches, the solved inputs are run under a line tracer and a
+    greedy set cover picks the cases that reach the most uncovered lines. The expected results are the observed
+    return values (regression oracle).
+
+    Args:
+        code_to_test: Source code being tested
+        uncovered_lines: Uncovered lines as returned by the coverage analysis
+        taken_names: Names of existing test functions, synthesized tests get unique names
+
+    Returns:
+        Test case functions in the format of the generated tests, may be empty
+    """
+    try:
+        tree = ast.parse(code_to_test)
+        line_owners = get_line_owners(code_to_test)
+        namespace, _ = load_code(code_to_test)
+    except Exception:
+        return []
+
+    remaining = {line_owners.get(line["line_number"], line["line_number"]) for line in uncovered_lines}
+    taken_names = set(taken_names or ())
+    cases: List[SynthesizedCase] = []
+    for function in tree.body:
+        if not isinstance(function, ast.FunctionDef) or function.name.startswith("_"):
+            continue
+        synthesizer = PathSynthesizer(function, namespace)
+        seen_inputs = set()
+        try:
+            for state in synthesizer.paths():
+                inputs = synthesizer.solve_inputs(state)
+                if inputs is None or repr(inputs) in seen_inputs:
+                    continue
+                seen_inputs.add(repr(inputs))
+                trace = trace_call(namespace[function.name], inputs)
+                if trace.timed_out:
+                    continue
+                covered = trace.lines & remaining
+                if covered:
+                    cases.append(SynthesizedCase(function.name, inputs, trace, covered))
+        except RecursionError:
+            continue
+
+    # Greedy set cover of the uncovered lines
+    tests = []
+    while remaining and cases:
+        best = max(cases, key=lambda case: len(case.covered_lines & remaining))
+        target_lines = sorted(best.covered_lines & remaining)
+        if not target_lines:
+            break
+        cases.remove(best)
+        name = f"test_{best.function}_reaches_line_{target_lines[-1]}"
+        suffix = 2
+        while name in taken_names:
+            name = f"test_{best.function}_reaches_line_{target_lines[-1]}_{suffix}"
+            suffix += 1
+        test_case = render_test_case(
+            best, name, f"Reach {describe_lines(target_lines)} with inputs solved from the branch conditions."
+        )
+        if test_case is None:
+            continue
+        taken_names.add(name)
+        tests.append(test_case)
+        remaining -= best.covered_lines
+    return tests
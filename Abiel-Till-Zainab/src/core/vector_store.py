@@ -0,0 +1,240 @@
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Rows allocated for the first documents, the capacity doubles whenever the matrix is full
+INITIAL_CAPACITY = 64
+
+
+class MatrixVectorStore(VectorStore):
+    """
+    Vector store keeping all embeddings as L2-normalized rows of one contiguous float32 matrix
+
+    A search is one matrix-vector product (matrix-matrix for batched queries) followed by `argpartition` for the top
+    k, scored by cosine similarity like `InMemoryVectorStore`. It is a drop-in replacement: documents are kept by id
+    in `store` (without their vectors), `add_documents` with `ids` replaces existing documents and `delete` removes
+    rows by moving the last row into their place.
+
+    From `ivf_threshold` documents on, searches use an inverted file index: the rows are clustered with spherical
+    k-means into about sqrt(n) lists and only the `ivf_probes` lists with the closest centroids are scored exactly.
+    The index is rebuilt whenever the store has doubled since the last build, rows added in between are assigned to
+    their closest centroid.
+
+    Usage:
+        vector_store = MatrixVectorStore(embedding_model, ivf_threshold=4096, ivf_probes=8)
+        vector_store.add_documents(documents, ids=ids)
+        results = vector_store.similarity_search_batch([query, other_query], k=5)
+    """
+
+    def __init__(self, embedding: Embeddings, ivf_threshold: int = 4096, ivf_probes: int = 8, seed: int = 0):
+        self.embedding = embedding
+        self.ivf_threshold = ivf_threshold
+        self.ivf_probes = ivf_probes
+        self.seed = seed
+        self.store: Dict[str, Dict[str, Any]] = {}
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        # Inverted file index: centroids and the list of every row
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[np.ndarray] = None
+        self._indexed_size = 0
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _normalize(vectors: Any) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def _reserve(self, rows: int, dimension: int):
+        if self._matrix is None:
+            self._matrix = np.zeros((max(INITIAL_CAPACITY, rows), dimension), dtype=np.float32)
+            self._lists = np.zeros(len(self._matrix), dtype=np.int32)
+        elif len(self._ids) + rows > len(self._matrix):
+            capacity = max(2 * len(self._matrix), len(self._ids) + rows)
+            matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+            matrix[: len(self._ids)] = self._matrix[: len(self._ids)]
+            lists = np.zeros(capacity, dtype=np.int32)
+            lists[: len(self._ids)] = self._lists[: len(self._ids)]
+            self._matrix, self._lists = matrix, lists
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [id or str(uuid.uuid4()) for id in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        if len(ids) != len(texts):
+            raise ValueError(f"ids must be the same length as texts. Got {len(ids)} ids and {len(texts)} texts.")
+        vectors = self._normalize(self.embedding.embed_documents(texts))
+
+        self._reserve(len(texts), vectors.shape[1])
+        for id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+            if id in self._rows:
+                row = self._rows[id]
+            else:
+                row = len(self._ids)
+                self._rows[id] = row
+                self._ids.append(id)
+            self._matrix[row] = vector
+            if self._centroids is not None:
+                self._lists[row] = int(np.argmax(self._centroids @ vector))
+            self.store[id] = {"id": id, "text": text, "metadata": metadata}
+        self._update_index()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        for id in ids or []:
+            row = self._rows.pop(id, None)
+            if row is None:
+                continue
+            del self.store[id]
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._lists[row] = self._lists[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+        if len(self._ids) < self.ivf_threshold:
+            self._centroids = None
+
+    def get_by_ids(self, ids: List[str], /) -> List[Document]:
+        return [self._document(id) for id in ids if id in self.store]
+
+    def _document(self, id: str) -> Document:
+        document = self.store[id]
+        return Document(id=id, page_content=document["text"], metadata=document["metadata"])
+
+    def _update_index(self):
+        """Build the inverted file index once the threshold is reached and rebuild it when the store has doubled"""
+        size = len(self._ids)
+        if size < self.ivf_threshold or (self._centroids is not None and size < 2 * self._indexed_size):
+            return
+        rng = np.random.default_rng(self.seed)
+        vectors = self._matrix[:size]
+        n_lists = max(1, int(np.sqrt(size)))
+        # Train on a sample, then assign every row
+        sample = vectors[rng.choice(size, min(size, 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(10):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+        self._centroids = centroids
+        self._lists[:size] = np.argmax(vectors @ centroids.T, axis=1)
+        self._indexed_size = size
+
+    def _candidates(self, query: np.ndarray, k: int, filter: Optional[Callable[[Document], bool]]) -> np.ndarray:
+        """Rows to score exactly for a (normalized) query, all rows if the probed lists hold fewer than k"""
+        size = len(self._ids)
+        if self._centroids is not None:
+            probes = np.argpartition(-(self._centroids @ query), min(self.ivf_probes, len(self._centroids)) - 1)
+            rows = np.flatnonzero(np.isin(self._lists[:size], probes[: self.ivf_probes]))
+            if len(rows) < k:
+                rows = np.arange(size)
+        else:
+            rows = np.arange(size)
+        if filter is not None:
+            rows = np.array([row for row in rows if filter(self._document(self._ids[row]))], dtype=np.int64)
+        return rows
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k highest scores, best first"""
+        if k < len(scores):
+            # Sorted positions, so ties are ordered deterministically by row
+            top = np.sort(np.argpartition(-scores, k - 1)[:k])
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def similarity_search_with_score_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[Callable[[Document], bool]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Top k documents with their cosine similarity for a batch of query vectors"""
+        if not self._ids or k <= 0:
+            return [[] for _ in embeddings]
+        queries = self._normalize(embeddings)
+        if self._centroids is None and filter is None:
+            # Exact search: one matrix product for the whole batch
+            scores = queries @ self._matrix[: len(self._ids)].T
+            tops = [self._top_k(row_scores, k) for row_scores in scores]
+            return [
+                [(self._document(self._ids[row]), float(scores[i, row])) for row in top] for i, top in enumerate(tops)
+            ]
+
+        results = []
+        for query in queries:
+            rows = self._candidates(query, k, filter)
+            scores = self._matrix[rows] @ query
+            results.append([(self._document(self._ids[rows[i]]), float(scores[i])) for i in self._top_k(scores, k)])
+        return results
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Callable[[Document], bool]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vectors([embedding], k, filter)[0]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Callable[[Document], bool]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Callable[[Document], bool]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Callable[[Document], bool]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[Callable[[Document], bool]] = None
+    ) -> List[List[Document]]:
+        """Top k documents for several queries, scored with one matrix product"""
+        vectors = [self.embedding.embed_query(query) for query in queries]
+        return [
+            [document for document, _ in results]
+            for results in self.similarity_search_with_score_by_vectors(vectors, k, filter)
+        ]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "MatrixVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -1,4 +1,6 @@
 from .fix_similarities import fix_similarities_prompt
 from .fix_test_smell import fix_test_smell_prompt
 from .has_test_smell_router import has_test_smell_router_prompt
-from .write_test_case import write_test_case_prompt
+from .review_test import review_test_prompt
+from .write_test_case import duplicate_test_note, write_test_case_prompt
+from .write_test_cases_batch import write_test_cases_batch_prompt
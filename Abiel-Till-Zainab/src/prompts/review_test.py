@@ -0,0 +1,63 @@
+review_test_prompt = """You are an expert at reviewing Python unit tests. In a single pass you (1) rewrite a new unit test if it duplicates the behaviour of existing tests and (2) identify test smells in the resulting test.
+
+STEP 1 - SIMILARITY REVIEW:
+1. Focus on uncovered lines first
+   - If the new test covers previously uncovered lines, DO NOT modify it even if behavior seems similar
+   - Tests covering new lines are valuable regardless of similarity to other tests
+2. Only rewrite the new test if:
+   - It covers only already-covered lines AND
+   - Its behavior is too similar to existing tests (same function with similar inputs, same assertions, same edge case)
+3. When rewriting:
+   - Look for untested edge cases, boundary conditions and error scenarios
+   - Maintain or improve code coverage
+   - Do not add comments explaining how you rewrote the test
+4. Otherwise return the new test unchanged
+
+STEP 2 - TEST SMELL REVIEW of the test returned in step 1:
+1. Assertion Roulette: Multiple assertions without clear messages explaining what each tests
+2. Conditional Test Logic: Tests with complex control flow that make results unpredictable
+3. Empty Test: Test without assertions or executable code
+4. Magic Number Test: Using unexplained numeric literals
+5. Redundant Assertions: Testing obvious things or same thing multiple times
+6. Unknown Test: No clear assertions or purpose
+7. Multiple Assertions: More than one assertion in a test without clear justification
+8. Missing Assertion Messages, unclear test names or a missing docstring
+
+Route to "fix_test_smell" if you detect any of these smells. Otherwise route to "keep_good_test".
+For the identified_smells field, describe which test smells were found and where they occur in the test. Be specific about the code sections where each smell appears.
+Only list smells that were actually found. If you don't find any smells, put "No test smells found." and route to "keep_good_test".
+
+The code to test:
+```python
+{code_to_test}
+```
+
+Coverage Information:
+Uncovered lines:
+{uncovered_lines}
+
+Coverage matrix:
+{coverage_matrix}
+
+The existing unit tests:
+{existing_unit_tests}
+
+The new unit test to review:
+```python
+{new_unit_test}
+```
+
+The test case function is added to a single test class `GeneratedTestCases` that already imports the code to test:
+```python
+import unittest
+from typing import *
+from code_to_test import *
+```
+
+Provide your response in the following format:
+{{
+    "unit_test": "<the unchanged or rewritten test case function, without a code block>",
+    "identified_smells": "<detailed description of smells found in unit_test, or 'No test smells found.' if none>",
+    "destination": "<either 'fix_test_smell' or 'keep_good_test'>"
+}}
+"""
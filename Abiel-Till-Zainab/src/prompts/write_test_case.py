@@ -20,7 +20,9 @@ TEST QUALITY:
 
 COVERAGE PRIORITIES:
 1. Focus on uncovered lines first
-   - Make sure to test the first uncovered line
+   - If a target path is given, make sure your single test executes ALL lines of the target path
+     (they lie on one feasible path through the code, so one input can reach them together)
+   - Without a target path, make sure to test the first uncovered line
 2. Only test edge cases and error scenarios after achieving full line coverage
 
 RATIONALE:
@@ -145,6 +147,9 @@ Context provided:
 - Uncovered lines: 
 {uncovered_lines}
 
+- Target path (uncovered lines a single test should execute together):
+{target_path}
+
 - Existing tests:
 {existing_tests}
 
@@ -154,4 +159,11 @@ Context provided:
 Note: Do not add explicit comments for Arrange/Act/Assert sections - focus on meaningful comments about test purpose, input choice rationale, and expected behavior.
 
 Return ONLY one test case function wrapped in a ```python code block.
-"""
\ No newline at end of file
+"""
+
+duplicate_test_note = """
+
+Your previous test duplicated this existing test. Write a test for different, untested behaviour instead:
+```python
+{duplicate_test}
+```"""
@@ -0,0 +1,73 @@
+write_test_cases_batch_prompt = """You are an expert Python programmer who writes clear and helpful test cases following best practices.
+
+Your task is to write UP TO {test_count} test case functions. Each test case targets a DIFFERENT region of uncovered lines listed below.
+
+TEST STRUCTURE:
+- Follow "Arrange, Act, Assert" pattern
+- One clear assertion per test (unless multiple are essential)
+- Include descriptive test name and clear docstring
+- Ensure tests are repeatable and self-contained (they must not depend on each other)
+- Include meaningful assertion messages
+- Keep tests concise and readable
+- Follow PEP8 style guide
+
+TEST QUALITY:
+- Use realistic test data
+- Avoid complex setup code
+- Be creative in finding potential bugs
+- Choose specific, descriptive test names (avoid generic terms like "edge_cases")
+- Every test case needs a unique name
+
+COVERAGE PRIORITIES:
+1. Test case number i must cover the lines of target region number i
+2. Do not target the same region twice - every test case is verified independently, tests that cover no new lines are dropped
+3. If it is not possible to reach a region, skip it instead of writing a test that cannot cover it
+
+FORMAT SPECIFICATION:
+```python
+def test_specific_scenario_of_first_region(self):
+    \"\"\"Clear description of the test's purpose and expectations.\"\"\"
+    result = add(5, -3)
+
+    self.assertEqual(2, result, "Adding positive and negative numbers should work correctly")
+
+def test_specific_scenario_of_second_region(self):
+    \"\"\"Clear description of the test's purpose and expectations.\"\"\"
+    result = add(0, 0)
+
+    self.assertEqual(0, result, "Adding zeros should return zero")
+```
+
+Assume that the code to test is already imported and available in the test cases:
+```python
+import unittest
+from typing import *
+from code_to_test import *
+
+class GeneratedTestCases(unittest.TestCase):
+
+    # .. existing tests ..
+
+    # Your generated test cases are inserted here
+
+if __name__ == "__main__":
+    unittest.main()
+```
+
+Context provided:
+- Code to test:
+{code_to_test}
+
+- Target regions of uncovered lines (one test case per region):
+{target_regions}
+
+- Existing tests:
+{existing_tests}
+
+- Coverage matrix:
+{coverage_matrix}
+
+Note: Do not add explicit comments for Arrange/Act/Assert sections - focus on meaningful comments about test purpose, input choice rationale, and expected behavior.
+
+Return ONLY the test case functions (no class, no imports) wrapped in a single ```python code block.
+"""
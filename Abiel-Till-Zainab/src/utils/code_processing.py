@@ -1,7 +1,10 @@
 import ast
+import hashlib
 import re
+from dataclasses import dataclass
+from functools import lru_cache
 from textwrap import dedent
-from typing import List, Optional, Literal
+from typing import Dict, Iterator, List, Literal, Optional, Tuple, Union
 from pydantic import BaseModel, Field
 
 import black
@@ -13,56 +16,85 @@ class RouteTest(BaseModel):
     identified_smells: str
 
 
-def extract_unit_tests(code: str) -> List[str]:
-    """Extract individual test methods from a test class"""
-    if not code.strip():
-        return []
+class ReviewTest(BaseModel):
+    unit_test: str = Field(description="The unchanged or rewritten test case function")
+    identified_smells: str
+    destination: Literal["fix_test_smell", "keep_good_test"]
 
-    try:
-        # Parse the code into an AST
-        tree = ast.parse(code)
 
-        normalized_tests = []
+@dataclass(frozen=True)
+class TestRecord:
+    """Test function extracted from a test script"""
 
-        # Walk through all function definitions
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and node.name.startswith("test_"):
-                # Get the source lines for this function
-                start_line = node.lineno
-                end_line = node.end_lineno
+    name: str
+    source: str  # including decorators, indented relative to the def line
+    span: Tuple[int, int]  # first and last line in the script (1-based, inclusive, from the first decorator)
+    hash: str  # get_test_hash of the source
 
-                # Extract the function source
-                func_lines = code.split("\n")[start_line - 1 : end_line]
-                func_source = "\n".join(func_lines)
 
-                # Find the base indentation level of the function definition
-                base_indent = len(func_lines[0]) - len(func_lines[0].lstrip())
+def _test_functions(node: ast.AST) -> Iterator[Union[ast.FunctionDef, ast.AsyncFunctionDef]]:
+    """Test functions in source order (test classes and other blocks are searched, test bodies are not)"""
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) and child.name.startswith("test_"):
+            yield child
+        elif isinstance(child, ast.stmt):
+            yield from _test_functions(child)
 
-                # Process each line to maintain relative indentation
-                processed_lines = []
-                for line in func_lines:
-                    if not line.strip():  # Empty line
-                        processed_lines.append("")
-                        continue
 
-                    # Calculate this line's indentation relative to the function definition
-                    current_indent = len(line) - len(line.lstrip())
-                    relative_indent = current_indent - base_indent
+def _dedent_lines(lines: List[str], base_indent: int) -> str:
+    """Remove the indentation of the def line, keeping the relative indentation of the body"""
+    processed_lines = []
+    for line in lines:
+        if not line.strip():  # Empty line
+            processed_lines.append("")
+        elif line[:base_indent].isspace() or not base_indent:
+            processed_lines.append(line[base_indent:])
+        else:
+            # Less indented than the def line (e.g. the continuation of a multiline string)
+            processed_lines.append(line.lstrip())
+    return "\n".join(processed_lines)
 
-                    # Add the relative indentation
-                    if relative_indent >= 0:
-                        processed_lines.append(" " * relative_indent + line.lstrip())
-                    else:
-                        # Function definition line
-                        processed_lines.append(line.lstrip())
 
-                normalized_tests.append("\n".join(processed_lines))
+@lru_cache(maxsize=256)
+def extract_test_records(code: str) -> Tuple[TestRecord, ...]:
+    """
+    Extract the test functions (sync or async, with their decorators) of a test script in one pass
 
-        return normalized_tests
+    The script is parsed and split into lines once and every test is cut out by its node span, so extraction is
+    linear in the script size. Results are cached by script, since the app extracts the same scripts on every rerun.
+    """
+    if not code.strip():
+        return ()
 
+    try:
+        tree = ast.parse(code)
     except SyntaxError:
-        # Fallback to empty list if code cannot be parsed
-        return []
+        # Fallback to no tests if code cannot be parsed
+        return ()
+
+    lines = code.split("\n")
+    records = []
+    for node in _test_functions(tree):
+        start_line = min([node.lineno, *(decorator.lineno for decorator in node.decorator_list)])
+        source = _dedent_lines(lines[start_line - 1 : node.end_lineno], node.col_offset)
+        records.append(TestRecord(node.name, source, (start_line, node.end_lineno), get_test_hash(source)))
+    return tuple(records)
+
+
+def extract_unit_tests(code: str) -> List[str]:
+    """Extract individual test methods from a test class"""
+    return [record.source for record in extract_test_records(code)]
+
+
+def normalize_test_code(test: str) -> str:
+    """Normalize the layout of a test (dedented, no trailing whitespace, no blank lines)"""
+    lines = dedent(test).splitlines()
+    return "\n".join(line.rstrip() for line in lines if line.strip())
+
+
+def get_test_hash(test: str) -> str:
+    """Stable hash of a test that ignores indentation and blank lines (used as its vector store and cache key)"""
+    return hashlib.sha256(normalize_test_code(test).encode("utf-8")).hexdigest()[:32]
 
 
 def sanitize_code_output(code: str) -> str:
@@ -82,14 +114,89 @@ def validate_python_syntax(code: str) -> Optional[str]:
         return str(e)
 
 
-def assemble_test_script(code_to_test_path: str, existing_tests: List[str], new_test: str) -> str:
+# Assembled scripts in the layout isort (black profile) and black give them, so only the tests need formatting
+TEST_CLASS_NAME = "GeneratedTestCases"
+TEST_SCRIPT_HEADER = (
+    "import unittest\nfrom typing import *\n\nfrom {module_name} import *\n\n\n"
+    f"class {TEST_CLASS_NAME}(unittest.TestCase):\n"
+)
+TEST_SCRIPT_FOOTER = 'if __name__ == "__main__":\n    unittest.main()\n'
+CLASS_INDENT = "    "
+# Formatted tests are cached by content hash, the cache is cleared when it reaches this size
+FORMAT_CACHE_SIZE = 10000
+
+_formatted_tests: Dict[str, str] = {}
+
+
+def _indent_test(test: str) -> str:
+    """Indent a test function into the test class, keeping its relative indentation"""
+    indented_lines = []
+    for line in test.split("\n"):
+        # Skip empty lines
+        if not line.strip():
+            indented_lines.append("")
+            continue
+        # Determine the original indentation level
+        original_indent = len(line) - len(line.lstrip())
+        # Add base class indentation (4 spaces) plus original indentation
+        indented_lines.append(CLASS_INDENT + " " * original_indent + line.lstrip())
+    return "\n".join(indented_lines)
+
+
+def format_test(test: str) -> str:
+    """
+    Format a test function with black and indent it into the test class, cached by content hash
+
+    The test is formatted on its own at module level with the line length reduced by the class indentation, which
+    gives the same result as formatting the whole script. Tests that black cannot parse are only indented.
+    """
+    key = hashlib.sha256(test.encode("utf-8")).hexdigest()
+    formatted = _formatted_tests.get(key)
+    if formatted is not None:
+        return formatted
+
+    try:
+        mode = black.Mode(line_length=black.DEFAULT_LINE_LENGTH - len(CLASS_INDENT))
+        # Top level definitions are separated by two blank lines, methods by one
+        module = re.sub(r"\n\n\n(?=\S)", "\n\n", black.format_str(dedent(test), mode=mode).rstrip("\n"))
+        formatted = "\n".join(CLASS_INDENT + line if line else line for line in module.split("\n"))
+    except Exception:
+        formatted = _indent_test(test)
+
+    if len(_formatted_tests) >= FORMAT_CACHE_SIZE:
+        _formatted_tests.clear()
+    _formatted_tests[key] = formatted
+    return formatted
+
+
+def format_test_script(script: str) -> str:
+    """Format a whole test script with isort and black, unchanged if it cannot be formatted"""
+    try:
+        # Apply isort formatting
+        isort_config = isort.Config(profile="black")
+        script = isort.code(script, config=isort_config)
+
+        # Apply black formatting
+        return black.format_str(script, mode=black.FileMode())
+    except Exception:
+        # If formatting fails, return the unformatted script
+        return script
+
+
+def assemble_test_script(
+    code_to_test_path: str, existing_tests: List[str], new_test: str, format_script: bool = False
+) -> str:
     """
     Assemble test cases into a complete test script.
 
+    The script is built from the (cached) formatted tests and a fixed header, so assembling it again after adding a
+    test only formats the new test. Whole-script formatting is only needed when exporting the script.
+
     Args:
         code_to_test_path: Path to the file containing code to test
         existing_tests: List of existing test case functions
         new_test: New test case function to add
+        format_script: Also run isort and black over the whole script (for exports)
 
     Returns:
         Complete test script as a string
@@ -97,67 +204,14 @@ def assemble_test_script(code_to_test_path: str, existing_tests: List[str], new_
     # Extract the module name from the path
     module_name = code_to_test_path.split("/")[-1].replace(".py", "")
 
-    # Create the test script template
-    script = [
-        "import unittest",
-        "from typing import *",
-        f"from {module_name} import *",
-        "",
-        "class GeneratedTestCases(unittest.TestCase):",
-    ]
-
-    # Add existing test cases with proper indentation
-    for test in existing_tests:
-        # Split into lines and properly indent each line
-        test_lines = test.split("\n")
-        indented_lines = []
-        for line in test_lines:
-            # Skip empty lines
-            if not line.strip():
-                indented_lines.append("")
-                continue
-            # Determine the original indentation level
-            original_indent = len(line) - len(line.lstrip())
-            # Add base class indentation (4 spaces) plus original indentation
-            indented_lines.append("    " + " " * original_indent + line.lstrip())
-        script.append("\n".join(indented_lines))
-        script.append("")
-
-    # Add the new test case
-    if new_test:
-        new_test_lines = new_test.split("\n")
-        indented_lines = []
-        for line in new_test_lines:
-            if not line.strip():
-                indented_lines.append("")
-                continue
-            original_indent = len(line) - len(line.lstrip())
-            indented_lines.append("    " + " " * original_indent + line.lstrip())
-        script.append("\n".join(indented_lines))
-
-    # Add main block with proper indentation
-    script.extend(
-        [
-            "",  # Add blank line before main block
-            "if __name__ == '__main__':",
-            "    unittest.main()",
-        ]
+    tests = [format_test(test) for test in [*existing_tests, new_test] if test.strip()]
+    script = (
+        TEST_SCRIPT_HEADER.format(module_name=module_name)
+        + ("\n\n".join(tests) or CLASS_INDENT + "pass")
+        + "\n\n\n"
+        + TEST_SCRIPT_FOOTER
     )
-
-    assembled_script = "\n".join(script)
-
-    try:
-        # Apply isort formatting
-        isort_config = isort.Config(profile="black")
-        assembled_script = isort.code(assembled_script, config=isort_config)
-
-        # Apply black formatting
-        assembled_script = black.format_str(assembled_script, mode=black.FileMode())
-
-        return assembled_script
-    except Exception as e:
-        # If formatting fails, return the unformatted script
-        return assembled_script
+    return format_test_script(script) if format_script else script
 
 
 if __name__ == "__main__":
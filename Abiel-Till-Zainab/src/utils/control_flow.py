@@ -0,0 +1,452 @@
+import ast
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Facts known on a path: variable name -> literal value it equals
+Facts = FrozenSet[Tuple[str, Any]]
+
+# Upper bound on the explored (block, facts) states per path search, keeps pathological functions cheap
+MAX_SEARCH_STATES = 20000
+
+
+@dataclass
+class BasicBlock:
+    """Straight-line sequence of statements, identified by the line numbers coverage.py reports for them"""
+
+    id: int
+    lines: List[int] = field(default_factory=list)
+    assigned: Set[str] = field(default_factory=set)  # names rebound in the block
+    calls: Set[str] = field(default_factory=set)  # names of functions called in the block
+    constants: Dict[str, Any] = field(default_factory=dict)  # names bound to a literal (name = 5)
+
+
+@dataclass
+class Edge:
+    """Control flow edge, taken if `condition` (None for unconditional edges) evaluates to `value`"""
+
+    source: int
+    target: int
+    condition: Optional[ast.expr] = None
+    value: bool = True
+
+
+def _literal(node: ast.AST) -> Tuple[bool, Any]:
+    """Evaluate an immutable literal (numbers, strings, tuples, None, booleans), returns (is_literal, value)"""
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False, None
+    if isinstance(value, (list, dict, set)):
+        return False, None
+    return True, value
+
+
+def _equality_facts(condition: ast.expr) -> List[Tuple[str, Any]]:
+    """Facts `name == literal` implied by a condition being true (conjunctions are split)"""
+    if isinstance(condition, ast.BoolOp) and isinstance(condition.op, ast.And):
+        return [fact for value in condition.values for fact in _equality_facts(value)]
+    if isinstance(condition, ast.Compare) and len(condition.ops) == 1 and isinstance(condition.ops[0], ast.Eq):
+        left, right = condition.left, condition.comparators[0]
+        if isinstance(right, ast.Name):
+            left, right = right, left
+        is_literal, value = _literal(right)
+        if isinstance(left, ast.Name) and is_literal:
+            return [(left.id, value)]
+    return []
+
+
+def _called_names(node: ast.AST) -> Set[str]:
+    """Names of the functions called by name in an expression or simple statement (not in nested definitions)"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {name for decorator in node.decorator_list for name in _called_names(decorator)}
+    return {
+        child.func.id for child in ast.walk(node) if isinstance(child, ast.Call) and isinstance(child.func, ast.Name)
+    }
+
+
+def _assigned_names(statement: ast.stmt) -> Set[str]:
+    """Names rebound by a simple statement"""
+    targets: List[ast.AST] = []
+    if isinstance(statement, ast.Assign):
+        targets = statement.targets
+    elif isinstance(statement, (ast.AugAssign, ast.AnnAssign)):
+        targets = [statement.target]
+    elif isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return {statement.name}
+    elif isinstance(statement, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split(".")[0] for alias in statement.names}
+    elif isinstance(statement, (ast.Global, ast.Nonlocal)):
+        return set(statement.names)
+    names = set()
+    for target in targets:
+        names.update(node.id for node in ast.walk(target) if isinstance(node, ast.Name))
+    # Walrus assignments inside expressions
+    names.update(node.target.id for node in ast.walk(statement) if isinstance(node, ast.NamedExpr))
+    return names
+
+
+class ControlFlowGraph:
+    """
+    Statement level control flow graph of one function (or the module body)
+
+    Loop back edges are kept separately, `edges` form a DAG from `entry` to `exit`. Nested function and class bodies
+    are not part of the graph, they get graphs of their own (see build_control_flow_graphs).
+    """
+
+    def __init__(self, name: str, body: List[ast.stmt]):
+        self.name = name
+        self.blocks: Dict[int, BasicBlock] = {}
+        self.line_owner: Dict[int, int] = {}  # line of a multi-line statement -> first line (reported by coverage)
+        self.edges: List[Edge] = []
+        self.back_edges: List[Edge] = []
+        self.entry = self._new_block().id
+        self.exit = self._new_block().id
+        self._open: Optional[int] = None
+        self._loops: List[Tuple[int, List[Tuple[int, Optional[ast.expr], bool]]]] = []
+
+        frontier = self._visit_body(body, [(self.entry, None, True)])
+        self._connect(frontier, self.exit)
+
+        self.successors: Dict[int, List[Edge]] = {block_id: [] for block_id in self.blocks}
+        for edge in self.edges:
+            self.successors[edge.source].append(edge)
+
+    @property
+    def lines(self) -> Set[int]:
+        """All statement lines of the graph"""
+        return {line for block in self.blocks.values() for line in block.lines}
+
+    def _new_block(self) -> BasicBlock:
+        block = BasicBlock(len(self.blocks))
+        self.blocks[block.id] = block
+        return block
+
+    def _connect(self, frontier: List[Tuple[int, Optional[ast.expr], bool]], target: int, back: bool = False):
+        for source, condition, value in frontier:
+            (self.back_edges if back else self.edges).append(Edge(source, target, condition, value))
+
+    def _block_for(self, frontier: List[Tuple[int, Optional[ast.expr], bool]]) -> BasicBlock:
+        """Block to append the next statement to, a new one unless the frontier is the open block itself"""
+        if len(frontier) == 1 and frontier[0][1] is None and frontier[0][0] == self._open:
+            return self.blocks[self._open]
+        block = self._new_block()
+        self._connect(frontier, block.id)
+        self._open = block.id
+        return block
+
+    def _add_line(self, block: BasicBlock, node: ast.AST, span: Optional[ast.AST] = None):
+        """Add the line of a statement (spanning until the end of `span`, defaults to the statement) to a block"""
+        block.lines.append(node.lineno)
+        for line in range(node.lineno, getattr(span or node, "end_lineno", node.lineno) + 1):
+            self.line_owner.setdefault(line, node.lineno)
+
+    def _header(self, frontier, node: ast.AST, span: Optional[ast.AST] = None) -> BasicBlock:
+        """Block of a single branching statement (if, loop head, match subject)"""
+        block = self._block_for(frontier)
+        self._add_line(block, node, span)
+        if span is not None:
+            block.calls |= _called_names(span)
+        self._open = None
+        return block
+
+    def _visit_body(self, statements: List[ast.stmt], frontier) -> List[Tuple[int, Optional[ast.expr], bool]]:
+        for statement in statements:
+            if not frontier:
+                break  # unreachable code after return, raise, break or continue
+            frontier = self._visit(statement, frontier)
+        return frontier
+
+    def _visit(self, statement: ast.stmt, frontier) -> List[Tuple[int, Optional[ast.expr], bool]]:
+        if isinstance(statement, ast.If):
+            block = self._header(frontier, statement, statement.test)
+            true_frontier = self._visit_body(statement.body, [(block.id, statement.test, True)])
+            self._open = None
+            false_frontier = [(block.id, statement.test, False)]
+            if statement.orelse:
+                false_frontier = self._visit_body(statement.orelse, false_frontier)
+            self._open = None
+            return true_frontier + false_frontier
+
+        if isinstance(statement, (ast.For, ast.AsyncFor, ast.While)):
+            head = self._new_block()
+            self._connect(frontier, head.id)
+            condition = statement.test if isinstance(statement, ast.While) else None
+            header = statement.test if isinstance(statement, ast.While) else statement.iter
+            self._add_line(head, statement, header)
+            head.calls |= _called_names(header)
+            self._open = None
+            if not isinstance(statement, ast.While):
+                head.assigned.update(node.id for node in ast.walk(statement.target) if isinstance(node, ast.Name))
+            breaks: List[Tuple[int, Optional[ast.expr], bool]] = []
+            self._loops.append((head.id, breaks))
+            body_frontier = self._visit_body(statement.body, [(head.id, condition, True)])
+            self._loops.pop()
+            self._connect(body_frontier, head.id, back=True)
+            self._open = None
+            exit_frontier = [(head.id, condition, False)]
+            if statement.orelse:
+                exit_frontier = self._visit_body(statement.orelse, exit_frontier)
+                self._open = None
+            return exit_frontier + breaks
+
+        if isinstance(statement, (ast.Try, ast.TryStar)):
+            body_frontier = self._visit_body(statement.body, frontier)
+            self._open = None
+            handler_frontiers = []
+            for handler in statement.handlers:
+                # Any statement of the try body may raise, approximate by entering the handler from the try entry
+                handler_block = self._header(frontier, handler, handler.type)
+                handler_frontiers += self._visit_body(handler.body, [(handler_block.id, None, True)])
+                self._open = None
+            if statement.orelse:
+                body_frontier = self._visit_body(statement.orelse, body_frontier)
+                self._open = None
+            merged = body_frontier + handler_frontiers
+            if statement.finalbody:
+                merged = self._visit_body(statement.finalbody, merged)
+                self._open = None
+            return merged
+
+        if isinstance(statement, (ast.With, ast.AsyncWith)):
+            block = self._block_for(frontier)
+            self._add_line(block, statement, statement.items[-1].context_expr)
+            for item in statement.items:
+                block.calls |= _called_names(item.context_expr)
+                if item.optional_vars is not None:
+                    block.assigned.update(
+                        node.id for node in ast.walk(item.optional_vars) if isinstance(node, ast.Name)
+                    )
+            return self._visit_body(statement.body, [(block.id, None, True)])
+
+        if isinstance(statement, ast.Match):
+            block = self._header(frontier, statement, statement.subject)
+            merged = []
+            exhaustive = False
+            for case in statement.cases:
+                case_block = self._header([(block.id, None, True)], case.pattern, case.guard or case.pattern)
+                self._open = case_block.id
+                merged += self._visit_body(case.body, [(case_block.id, None, True)])
+                self._open = None
+                exhaustive = exhaustive or (
+                    isinstance(case.pattern, ast.MatchAs) and case.pattern.pattern is None and case.guard is None
+                )
+            return merged if exhaustive else merged + [(block.id, None, True)]
+
+        # Simple statements
+        block = self._block_for(frontier)
+        self._add_line(block, statement)
+        block.assigned |= _assigned_names(statement)
+        block.calls |= _called_names(statement)
+        if (
+            isinstance(statement, ast.Assign)
+            and len(statement.targets) == 1
+            and isinstance(statement.targets[0], ast.Name)
+        ):
+            is_literal, value = _literal(statement.value)
+            if is_literal:
+                block.constants[statement.targets[0].id] = value
+            else:
+                block.constants.pop(statement.targets[0].id, None)
+
+        if isinstance(statement, (ast.Return, ast.Raise)):
+            self._connect([(block.id, None, True)], self.exit)
+            self._open = None
+            return []
+        if isinstance(statement, ast.Break) and self._loops:
+            self._loops[-1][1].append((block.id, None, True))
+            self._open = None
+            return []
+        if isinstance(statement, ast.Continue) and self._loops:
+            self._connect([(block.id, None, True)], self._loops[-1][0], back=True)
+            self._open = None
+            return []
+        return [(block.id, None, True)]
+
+    def _follow(self, edge: Edge, facts: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Facts after taking an edge, None if the edge contradicts the facts (infeasible on this path)"""
+        if edge.condition is not None:
+            implied = _equality_facts(edge.condition)
+            if edge.value:
+                for name, value in implied:
+                    if name in facts and facts[name] != value:
+                        return None
+                facts = {**facts, **dict(implied)}
+            elif len(implied) == 1 and implied[0][0] in facts and facts[implied[0][0]] == implied[0][1]:
+                # A single equality known to hold cannot be false
+                return None
+
+        target = self.blocks[edge.target]
+        if target.assigned:
+            facts = {name: value for name, value in facts.items() if name not in target.assigned}
+            facts.update(target.constants)
+        return facts
+
+    def best_path(
+        self, weights: Dict[int, int], call_weights: Optional[Dict[str, int]] = None
+    ) -> Tuple[int, List[int]]:
+        """
+        Heaviest feasible entry-to-exit path of the DAG
+
+        Feasibility is checked for equality conditions on variables (e.g. position == (1, 3) followed by
+        position == (1, 2) without reassigning position is infeasible); other conditions are assumed satisfiable.
+
+        Args:
+            weights: Weight of each line (e.g. 1 for uncovered lines), missing lines weigh 0
+            call_weights: Weight added to a block for each function it calls (e.g. the callee's best path weight)
+
+        Returns:
+            Tuple of (weight, block ids of the path)
+        """
+        memo: Dict[Tuple[int, Facts], Tuple[int, List[int]]] = {}
+
+        call_weights = call_weights or {}
+
+        def block_weight(block_id: int) -> int:
+            block = self.blocks[block_id]
+            return sum(weights.get(line, 0) for line in block.lines) + sum(
+                call_weights.get(name, 0) for name in block.calls
+            )
+
+        def search(block_id: int, facts: Dict[str, Any]) -> Tuple[int, List[int]]:
+            key = (block_id, frozenset(facts.items()))
+            if key in memo:
+                return memo[key]
+            best: Tuple[int, List[int]] = (0, [])
+            if len(memo) < MAX_SEARCH_STATES:
+                for edge in self.successors[block_id]:
+                    next_facts = self._follow(edge, facts)
+                    if next_facts is None:
+                        continue
+                    weight, path = search(edge.target, next_facts)
+                    if weight > best[0] or not best[1]:
+                        best = (weight, path)
+            memo[key] = (block_weight(block_id) + best[0], [block_id] + best[1])
+            return memo[key]
+
+        try:
+            return search(self.entry, {})
+        except (TypeError, RecursionError):
+            # Unhashable literals or very deep graphs, fall back to ignoring feasibility
+            memo.clear()
+            return self._best_path_unchecked(block_weight)
+
+    def _best_path_unchecked(self, block_weight: Callable[[int], int]) -> Tuple[int, List[int]]:
+        """Heaviest entry-to-exit path without feasibility checks (iterative, in reverse topological order)"""
+        order, visited, stack = [], set(), [(self.entry, False)]
+        while stack:
+            block_id, expanded = stack.pop()
+            if expanded:
+                order.append(block_id)
+                continue
+            if block_id in visited:
+                continue
+            visited.add(block_id)
+            stack.append((block_id, True))
+            stack.extend((edge.target, False) for edge in self.successors[block_id] if edge.target not in visited)
+
+        best: Dict[int, Tuple[int, List[int]]] = {}
+        for block_id in order:
+            own = block_weight(block_id)
+            successors = [best[edge.target] for edge in self.successors[block_id] if edge.target in best]
+            weight, path = max(successors, key=lambda item: item[0], default=(0, []))
+            best[block_id] = (own + weight, [block_id] + path)
+        return best[self.entry]
+
+
+def build_control_flow_graphs(code: str) -> List[ControlFlowGraph]:
+    """Build control flow graphs for the module body and every (nested) function in the code"""
+    tree = ast.parse(code)
+    graphs = [ControlFlowGraph("<module>", tree.body)]
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            graphs.append(ControlFlowGraph(node.name, node.body))
+    return graphs
+
+
+def get_line_owners(code: str) -> Dict[int, int]:
+    """Map every line of a (multi-line) statement to the first line of the statement, which coverage.py reports"""
+    return {line: owner for graph in build_control_flow_graphs(code) for line, owner in graph.line_owner.items()}
+
+
+def group_uncovered_lines_by_path(
+    code_to_test: str, uncovered_lines: List[Dict[str, Any]], max_paths: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    Group uncovered lines into feasible control flow paths, heaviest path first
+
+    Each group holds the uncovered lines one execution can reach together, so a single test can target a whole path
+    instead of one branch at a time. Paths are picked greedily: the path covering the most remaining uncovered lines
+    over all functions is taken, its lines are removed and the search repeats. A path includes the lines its calls of
+    local (e.g. nested) functions reach. Uncovered lines outside any graph end up in a last group.
+
+    Args:
+        code_to_test: Source code being tested
+        uncovered_lines: Uncovered lines as returned by the coverage analysis
+        max_paths: Maximum number of groups to return
+
+    Returns:
+        List of groups, each a list of uncovered lines in source order
+    """
+    if not uncovered_lines or max_paths <= 0:
+        return []
+    try:
+        graphs = build_control_flow_graphs(code_to_test)
+    except SyntaxError:
+        return [sorted(uncovered_lines, key=lambda line: line["line_number"])]
+
+    # Continuation lines of multi-line statements (docstrings, dict literals) belong to the statement's first line
+    line_owner = {line: owner for graph in graphs for line, owner in graph.line_owner.items()}
+    owned_lines: Dict[int, List[Dict[str, Any]]] = {}
+    for line in uncovered_lines:
+        owned_lines.setdefault(line_owner.get(line["line_number"], line["line_number"]), []).append(line)
+    graphs_by_name = {}
+    for graph in graphs:
+        graphs_by_name.setdefault(graph.name, graph)
+
+    # Module level statements run on import, every test covers them
+    module_lines = graphs[0].lines & set(owned_lines)
+    remaining = set(owned_lines) - module_lines
+    groups: List[List[Dict[str, Any]]] = []
+    while remaining and len(groups) < max_paths:
+        weights = {line: len(owned_lines[line]) for line in remaining}
+        paths: Dict[str, Tuple[int, Set[int]]] = {}
+
+        def heaviest_path(graph: ControlFlowGraph, calling: FrozenSet[str]) -> Tuple[int, Set[int]]:
+            """Best path of a graph and the lines it reaches, including those of called local functions"""
+            if graph.name in paths:
+                return paths[graph.name]
+            callees = {
+                name: heaviest_path(graphs_by_name[name], calling | {graph.name})
+                for block in graph.blocks.values()
+                for name in block.calls
+                if name in graphs_by_name and name not in calling and name != graph.name
+            }
+            weight, path = graph.best_path(weights, {name: callee[0] for name, callee in callees.items()})
+            lines = set()
+            for block_id in path:
+                lines.update(graph.blocks[block_id].lines)
+                for name in graph.blocks[block_id].calls & callees.keys():
+                    lines |= callees[name][1]
+            paths[graph.name] = (weight, lines)
+            return paths[graph.name]
+
+        best_weight, best_lines = 0, set()
+        for graph in graphs[1:]:
+            weight, lines = heaviest_path(graph, frozenset())
+            if weight > best_weight:
+                best_weight, best_lines = weight, lines & remaining
+        if not best_weight or not best_lines:
+            break
+        groups.append(
+            sorted((line for owner in best_lines for line in owned_lines[owner]), key=lambda line: line["line_number"])
+        )
+        remaining -= best_lines
+
+    if remaining and len(groups) < max_paths:
+        groups.append(
+            sorted((line for owner in remaining for line in owned_lines[owner]), key=lambda line: line["line_number"])
+        )
+    if module_lines:
+        first_group = (groups[0] if groups else []) + [line for owner in module_lines for line in owned_lines[owner]]
+        groups[:1] = [sorted(first_group, key=lambda line: line["line_number"])]
+    return groups
@@ -0,0 +1,191 @@
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from utils.code_processing import extract_unit_tests, get_test_hash
+from utils.metrics import compute_test_coverage, get_covered_lines
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    """Number of set bits per row of a uint64 matrix"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+    return np.unpackbits(bits.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def line_bitsets(line_sets: Sequence[Iterable[int]], line_count: int) -> np.ndarray:
+    """uint64 bitset matrix with one row per set of (1-based) line numbers, lines above `line_count` are dropped"""
+    words = max(1, -(-line_count // 64))
+    bits = np.zeros((len(line_sets), words * 64), dtype=np.uint8)
+    for row, lines in enumerate(line_sets):
+        bits[row, [line - 1 for line in lines if 0 < line <= line_count]] = 1
+    return np.packbits(bits, axis=1, bitorder="little").view(np.uint64)
+
+
+def bitset_lines(bitset: np.ndarray) -> Set[int]:
+    """(1-based) line numbers of one bitset row"""
+    return {int(bit) + 1 for bit in np.flatnonzero(np.unpackbits(bitset.view(np.uint8), bitorder="little"))}
+
+
+def unique_coverage(bitsets: np.ndarray) -> np.ndarray:
+    """
+    Lines every row covers alone: the row AND NOT the OR of all other rows, for all rows at once
+
+    The OR of the other rows is the OR of an exclusive prefix and suffix scan, so the matrix takes O(rows * words)
+    instead of one OR over all other rows per row.
+    """
+    if len(bitsets) < 2:
+        return bitsets.copy()
+    prefix = np.bitwise_or.accumulate(bitsets, axis=0)
+    suffix = np.bitwise_or.accumulate(bitsets[::-1], axis=0)[::-1]
+    others = np.zeros_like(bitsets)
+    others[1:] |= prefix[:-1]
+    others[:-1] |= suffix[1:]
+    return bitsets & ~others
+
+
+def _with_unique_names(tests: List[str]) -> List[str]:
+    """Prefix the test names with their position, so tests sharing a name get their own coverage column"""
+    return [re.sub(r"def test_", f"def test_{i}_", test, count=1) for i, test in enumerate(tests)]
+
+
+class CoverageIndex:
+    """
+    Bitset index of the lines every stored test covers
+
+    Tests exercising the same lines are behaviorally redundant even if their code looks different. The index mirrors
+    the stored tests by id (the coverage of new tests is computed in one run) and is reset when the code under test
+    changes. Covered lines are rows of a uint64 bitset matrix, so a Jaccard query is a vectorized AND/OR and popcount.
+    A line -> tests inverted index of the matrix columns finds the tests covering the lines before a target.
+
+    Usage:
+        index = CoverageIndex()
+        similar = index.similar_tests(code_to_test, unit_test, {id: document["text"] for ...}, k=5)
+        examples = index.neighborhood_tests(code_to_test, {id: document["text"] for ...}, target_lines, k=3)
+    """
+
+    def __init__(self):
+        self._code_hash: Optional[str] = None
+        self._words = 0
+        self._bitsets: Dict[str, np.ndarray] = {}
+        self._tests: Dict[str, str] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._tests_by_line: Optional[Dict[int, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._bitsets)
+
+    def bitset(self, lines: Iterable[int]) -> np.ndarray:
+        """Bitset of (1-based) line numbers of the code under test"""
+        return line_bitsets([lines], self._words * 64)[0]
+
+    def _reset(self, code_to_test: str):
+        self._code_hash = get_test_hash(code_to_test)
+        self._words = max(1, -(-len(code_to_test.splitlines()) // 64))
+        self._bitsets, self._tests, self._ids = {}, {}, []
+        self._invalidate()
+
+    def _invalidate(self):
+        self._matrix = None
+        self._tests_by_line = None
+
+    def sync(self, code_to_test: str, tests: Mapping[str, str]):
+        """Mirror a mapping of id to test (e.g. the vector store), only new tests are executed"""
+        if get_test_hash(code_to_test) != self._code_hash:
+            self._reset(code_to_test)
+        for id in [id for id in self._bitsets if id not in tests]:
+            del self._bitsets[id], self._tests[id]
+            self._invalidate()
+        new = {id: test for id, test in tests.items() if id not in self._bitsets}
+        if not new:
+            return
+        for (id, test), lines in zip(new.items(), self.covered_lines(code_to_test, list(new.values()))):
+            self._bitsets[id] = self.bitset(lines)
+            self._tests[id] = test
+        self._invalidate()
+
+    @staticmethod
+    def covered_lines(code_to_test: str, tests: List[str]) -> List[Set[int]]:
+        """Lines covered by every test, run together in one coverage analysis"""
+        if not tests:
+            return []
+        _, raw_results = compute_test_coverage(code_to_test, _with_unique_names(tests))
+        return [get_covered_lines(raw_results, i) for i in range(len(tests))]
+
+    def _get_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._ids = list(self._bitsets)
+            self._matrix = np.stack([self._bitsets[id] for id in self._ids])
+        return self._matrix
+
+    def tests_by_line(self) -> Dict[int, np.ndarray]:
+        """Inverted index: line number -> matrix rows of the tests covering it"""
+        if self._tests_by_line is None:
+            covered = np.unpackbits(self._get_matrix().view(np.uint8), axis=1, bitorder="little").astype(bool)
+            self._tests_by_line = {
+                int(column) + 1: np.flatnonzero(covered[:, column]) for column in np.flatnonzero(covered.any(axis=0))
+            }
+        return self._tests_by_line
+
+    def unique_coverage(self) -> Dict[str, int]:
+        """Number of lines every stored test covers alone (no other stored test covers them), by id"""
+        if not self._bitsets:
+            return {}
+        counts = _popcount(unique_coverage(self._get_matrix()))
+        return {id: int(count) for id, count in zip(self._ids, counts)}
+
+    def query(self, lines: Set[int], k: int) -> List[Tuple[str, float]]:
+        """Ids and Jaccard similarities of the (at most k) stored tests covering the most similar lines"""
+        if not self._bitsets or not lines or k <= 0:
+            return []
+        query = self.bitset(lines)
+        matrix = self._get_matrix()
+        intersection = _popcount(matrix & query)
+        union = _popcount(matrix | query)
+        similarity = intersection / np.maximum(union, 1)
+        top = np.argsort(-similarity, kind="stable")[:k]
+        return [(self._ids[row], float(similarity[row])) for row in top if intersection[row] > 0]
+
+    def similar_tests(
+        self, code_to_test: str, unit_test: str, tests: Mapping[str, str], k: int
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        Execute a candidate test and find the stored tests covering the most similar lines
+
+        Returns:
+            List of (stored test, Jaccard similarity), None if the candidate does not run or covers no lines
+        """
+        candidates = extract_unit_tests(unit_test)
+        if not candidates:
+            return None
+        self.sync(code_to_test, tests)
+        lines = set().union(*self.covered_lines(code_to_test, candidates))
+        if not lines:
+            return None
+        return [(self._tests[id], similarity) for id, similarity in self.query(lines, k)]
+
+    def neighborhood_tests(
+        self, code_to_test: str, tests: Mapping[str, str], target_lines: Iterable[int], k: int, window: int = 5
+    ) -> List[str]:
+        """
+        Stored tests covering the lines executed just before the first target line (e.g. the prefix of its path)
+
+        The `window` covered lines closest before the target are weighted by proximity (1, 1/2, 1/3, ...), so the
+        tests that reach furthest along the path towards the target rank first. They are the examples the LLM can
+        extend by one more step.
+        """
+        first_line = min(target_lines, default=None)
+        if first_line is None or not tests:
+            return []
+        self.sync(code_to_test, tests)
+        if not self._bitsets:
+            return []
+        tests_by_line = self.tests_by_line()
+        before = sorted((line for line in tests_by_line if line < first_line), reverse=True)[:window]
+        scores = np.zeros(len(self._ids))
+        for rank, line in enumerate(before):
+            scores[tests_by_line[line]] += 1 / (rank + 1)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [self._tests[self._ids[row]] for row in top if scores[row] > 0]
@@ -0,0 +1,209 @@
+import ast
+import hashlib
+import textwrap
+import zlib
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+# Length of the AST node label n-grams
+SHINGLE_SIZE = 3
+
+
+@dataclass
+class TestFingerprint:
+    """Structural fingerprint of a test"""
+
+    exact: str  # hash of the normalized AST (names and layout normalized, literals kept)
+    shingles: FrozenSet[str]  # AST label n-grams with literals abstracted and with their values
+    signature: np.ndarray  # MinHash signature of the shingles
+
+
+@dataclass
+class DuplicateMatch:
+    """Stored test a new test duplicates"""
+
+    id: str
+    test: str
+    similarity: float  # Jaccard similarity of the shingles
+    exact: bool
+
+
+class _Normalizer(ast.NodeTransformer):
+    """Drop docstrings and rename the test and the variables it assigns to positional names"""
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        node.name = "test"
+        first = node.body[0] if node.body else None
+        if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+            node.body = node.body[1:] or [ast.Pass()]
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if isinstance(node.ctx, ast.Store) or node.id in self.names:
+            node.id = self.names.setdefault(node.id, f"v{len(self.names)}")
+        return node
+
+
+def _label(node: ast.AST) -> str:
+    """Label of an AST node with literals abstracted to their type"""
+    if isinstance(node, ast.Constant):
+        return f"Constant:{type(node.value).__name__}"
+    if isinstance(node, ast.Call):
+        function = node.func
+        return f"Call:{function.attr if isinstance(function, ast.Attribute) else getattr(function, 'id', '')}"
+    if isinstance(node, ast.Attribute):
+        return f"Attribute:{node.attr}"
+    if isinstance(node, ast.Name):
+        return f"Name:{node.id}"
+    return type(node).__name__
+
+
+def _preorder(node: ast.AST) -> List[ast.AST]:
+    nodes = [node]
+    for child in ast.iter_child_nodes(node):
+        nodes.extend(_preorder(child))
+    return nodes
+
+
+def normalize_test_ast(test: str) -> Optional[ast.Module]:
+    """Parse a test and normalize names and docstrings, None if it does not parse"""
+    try:
+        tree = ast.parse(textwrap.dedent(test))
+    except SyntaxError:
+        return None
+    return _Normalizer().visit(tree)
+
+
+def _ngrams(labels: List[str]) -> Set[str]:
+    return {" ".join(labels[i : i + SHINGLE_SIZE]) for i in range(max(1, len(labels) - SHINGLE_SIZE + 1))}
+
+
+def get_shingles(tree: ast.AST) -> Set[str]:
+    """
+    AST label n-grams in pre-order of a normalized test, once with literals abstracted to their type and once with
+    their values, so tests that only differ in their inputs share the structure but are not near duplicates
+    """
+    nodes = _preorder(tree)
+    labels = [_label(node) for node in nodes]
+    shingles = _ngrams(labels)
+    shingles.update(
+        _ngrams(
+            [
+                f"{label}={node.value!r}" if isinstance(node, ast.Constant) else label
+                for node, label in zip(nodes, labels)
+            ]
+        )
+    )
+    return shingles
+
+
+class FingerprintIndex:
+    """
+    Near-duplicate index of tests based on structural fingerprints
+
+    Tests are compared by their normalized AST: docstrings, the test name and assigned variable names do not matter.
+    Exact duplicates (same normalized AST including literals) are found by hash. Near duplicates are found with
+    MinHash signatures of AST n-gram shingles and locality sensitive hashing (`bands` bands of the signature), the
+    candidates are confirmed with the exact Jaccard similarity of the shingles.
+
+    Usage:
+        index = FingerprintIndex(threshold=0.85)
+        index.sync({id: document["text"] for id, document in vector_store.store.items()})
+        match = index.find_duplicate(unit_test)
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions on 32 bit shingle hashes
+        self._a = rng.integers(1, 2**32, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**32, size=(num_perm, 1), dtype=np.uint64)
+        self._tests: Dict[str, str] = {}
+        self._fingerprints: Dict[str, TestFingerprint] = {}
+        self._exact: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def fingerprint(self, test: str) -> Optional[TestFingerprint]:
+        """Fingerprint of a test, None if it does not parse"""
+        tree = normalize_test_ast(test)
+        if tree is None:
+            return None
+        shingles = frozenset(get_shingles(tree))
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            signature = ((self._a * hashes + self._b) >> np.uint64(32)).min(axis=1)
+        exact = hashlib.sha256(ast.dump(tree).encode("utf-8")).hexdigest()
+        return TestFingerprint(exact, shingles, signature)
+
+    def _bands(self, fingerprint: TestFingerprint) -> List[Tuple[int, bytes]]:
+        return [
+            (band, fingerprint.signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, id: str, test: str):
+        """Index a test under an id (tests that do not parse are ignored)"""
+        fingerprint = self.fingerprint(test)
+        if fingerprint is None or id in self._fingerprints:
+            return
+        self._tests[id] = test
+        self._fingerprints[id] = fingerprint
+        self._exact.setdefault(fingerprint.exact, id)
+        for key in self._bands(fingerprint):
+            self._buckets.setdefault(key, set()).add(id)
+
+    def remove(self, id: str):
+        fingerprint = self._fingerprints.pop(id, None)
+        if fingerprint is None:
+            return
+        del self._tests[id]
+        if self._exact.get(fingerprint.exact) == id:
+            del self._exact[fingerprint.exact]
+            # Another indexed test may share the normalized AST
+            for other_id, other in self._fingerprints.items():
+                if other.exact == fingerprint.exact:
+                    self._exact[fingerprint.exact] = other_id
+                    break
+        for key in self._bands(fingerprint):
+            self._buckets[key].discard(id)
+            if not self._buckets[key]:
+                del self._buckets[key]
+
+    def sync(self, tests: Mapping[str, str]):
+        """Mirror a mapping of id to test (e.g. the vector store), only changed ids are (re)fingerprinted"""
+        for id in [id for id in self._fingerprints if id not in tests]:
+            self.remove(id)
+        for id, test in tests.items():
+            if id not in self._fingerprints:
+                self.add(id, test)
+
+    def find_duplicate(self, test: str) -> Optional[DuplicateMatch]:
+        """Most similar indexed test if the test is an exact or near duplicate of it, otherwise None"""
+        fingerprint = self.fingerprint(test)
+        if fingerprint is None:
+            return None
+        if fingerprint.exact in self._exact:
+            id = self._exact[fingerprint.exact]
+            return DuplicateMatch(id, self._tests[id], 1.0, True)
+
+        candidates = set().union(*(self._buckets.get(key, set()) for key in self._bands(fingerprint)))
+        best = None
+        for id in candidates:
+            shingles = self._fingerprints[id].shingles
+            similarity = len(fingerprint.shingles & shingles) / len(fingerprint.shingles | shingles)
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = DuplicateMatch(id, self._tests[id], similarity, False)
+        return best
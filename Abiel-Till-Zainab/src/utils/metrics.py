@@ -3,24 +3,44 @@ import io
 import os
 import sys
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import coverage
 import pandas as pd
 
+from utils.code_processing import assemble_test_script, extract_test_records
+
+
+# Tests are imported and traced in-process (sys.path, sys.modules), so only one analysis may run at a time
+_analysis_lock = threading.Lock()
+
 
 class CoverageMatrix:
-    def __init__(self, code_path: str, test_cases: List[str]):
+    def __init__(
+        self,
+        code_path: str,
+        test_cases: List[str],
+        stop_on_failure: bool = False,
+        coverage_target: Optional[float] = None,
+    ):
         self.code_path = code_path
         self.test_cases = test_cases
+        # Run the tests in the given order and stop after the first failing test or once the coverage target is reached
+        self.stop_on_failure = stop_on_failure
+        self.coverage_target = coverage_target
         # Remove the coverage instance from __init__ as we'll create fresh ones for each test
         self._matrix = []
         self._line_numbers = []
         self._total_lines = []
         self._missed_lines = []
         self._unexecuted_lines = []
+        self._outcomes = []
+        self._durations = []
+        self._arcs = []
 
     def _get_code_lines(self) -> Tuple[List[int], int, List[str]]:
         """Get line numbers and content from the code file"""
@@ -37,12 +57,21 @@ class CoverageMatrix:
 
     def analyze(self) -> Dict[str, Any]:
         """Analyze code coverage and generate coverage matrix"""
+        with _analysis_lock:
+            return self._analyze()
+
+    def _analyze(self) -> Dict[str, Any]:
         self._line_numbers, total_line_count, self._total_lines = self._get_code_lines()
 
         # Initialize storage
         self._missed_lines = []
         self._unexecuted_lines = []
         self._matrix = []
+        self._outcomes = []
+        self._durations = []
+        self._arcs = []
+        covered_lines = set()
+        stopped = None
 
         # Get the directory containing the test file
         test_dir = os.path.dirname(os.path.abspath(self.code_path))
@@ -109,7 +138,10 @@ class CoverageMatrix:
 
                             # Run the test
                             runner = unittest.TextTestRunner(stream=io.StringIO())
-                            runner.run(suite)
+                            start = time.perf_counter()
+                            test_result = runner.run(suite)
+                            self._durations.append(time.perf_counter() - start)
+                            self._outcomes.append("passed" if test_result.wasSuccessful() else "failed")
 
                             # Stop coverage and save
                             test_cov.stop()
@@ -119,6 +151,12 @@ class CoverageMatrix:
                             analysis = test_cov.analysis(code_to_test_path)  # Updated path
                             _, _, missing_lines, _ = analysis
                             self._missed_lines.append(missing_lines)
+                            # Executed arcs (line transitions, negative lines are entries and exits of code objects)
+                            data = test_cov.get_data()
+                            measured_file = next(
+                                (path for path in data.measured_files() if path.endswith("code_to_test.py")), None
+                            )
+                            self._arcs.append(sorted(data.arcs(measured_file) or []) if measured_file else [])
 
                             # Get unexecuted lines for this test
                             for line_num in missing_lines:
@@ -134,11 +172,25 @@ class CoverageMatrix:
                     except Exception as e:
                         print(f"Error running test {test_case}: {str(e)}")
                         self._missed_lines.append([])  # Add empty missing lines for failed test
+                        self._outcomes.append("error")
+                        if len(self._durations) < len(self._outcomes):
+                            self._durations.append(None)
+                        if len(self._arcs) < len(self._missed_lines):
+                            self._arcs.append([])
                     finally:
                         test_cov.stop()
                         test_cov.erase()
                         del test_cov
 
+                    if self.stop_on_failure and self._outcomes and self._outcomes[-1] != "passed":
+                        stopped = "failure"
+                        break
+                    if self.coverage_target is not None and self._outcomes and self._outcomes[-1] != "error":
+                        covered_lines.update(set(self._line_numbers) - set(self._missed_lines[-1]))
+                        if len(covered_lines) / len(self._line_numbers) >= self.coverage_target:
+                            stopped = "coverage_target"
+                            break
+
             finally:
                 # Clean up sys.path
                 if temp_dir in sys.path:
@@ -179,6 +231,11 @@ class CoverageMatrix:
                 "unexecuted_lines": self._unexecuted_lines,
                 "total_lines": self._total_lines,
                 "line_coverage": line_coverage,
+                "outcomes": self._outcomes,
+                "durations": self._durations,
+                "arcs": self._arcs,
+                "test_names": [test_case.split(".")[-1] for test_case in self.test_cases[: len(self._missed_lines)]],
+                "stopped": stopped,
             }
 
     def _get_line_context(self, line_num: int, context_lines: int = 2) -> List[str]:
@@ -187,10 +244,11 @@ class CoverageMatrix:
         end = min(len(self._total_lines), line_num + context_lines)
         return self._total_lines[start:end]
 
-    def format_matrix(self, analysis_results: Dict[str, Any]) -> pd.DataFrame:
+    @staticmethod
+    def format_matrix(analysis_results: Dict[str, Any]) -> pd.DataFrame:
         """Format the coverage matrix as a pandas DataFrame"""
         # Create column names for tests
-        test_cols = [f"Test{i+1}" for i in range(len(self._missed_lines))]
+        test_cols = [f"Test{i+1}" for i in range(len(analysis_results["col_sums"]))]
 
         # Create the DataFrame with line numbers as index
         df = pd.DataFrame(
@@ -215,7 +273,11 @@ class CoverageMatrix:
 
 
 def analyze_test_coverage(
-    code_path: str, test_module: str, test_cases: List[str]
+    code_path: str,
+    test_module: str,
+    test_cases: List[str],
+    stop_on_failure: bool = False,
+    coverage_target: Optional[float] = None,
 ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     """
     Analyze test coverage and return formatted matrix and raw results
@@ -223,12 +285,174 @@ def analyze_test_coverage(
     Args:
         code_path: Path to the code file being tested
         test_module: Full module path of the test file
-        test_cases: List of test case names to analyze
+        test_cases: List of test case names to analyze, in execution order
+        stop_on_failure: Stop after the first failing test
+        coverage_target: Stop once the tests run so far reach this line coverage
 
     Returns:
-        Tuple of (formatted matrix string, raw analysis results)
+        Tuple of (formatted matrix string, raw analysis results), the results only hold the tests that ran
     """
-    coverage_matrix = CoverageMatrix(code_path, [f"{test_module}.{tc}" for tc in test_cases])
+    coverage_matrix = CoverageMatrix(
+        code_path, [f"{test_module}.{tc}" for tc in test_cases], stop_on_failure, coverage_target
+    )
     results = coverage_matrix.analyze()
     formatted_matrix = coverage_matrix.format_matrix(results)
     return formatted_matrix, results
+
+
+def get_test_case_names(tests: List[str]) -> List[str]:
+    """Get the test method names of extracted test case functions (sync or async, with their decorators)"""
+    return [record.name for test in tests for record in extract_test_records(test)]
+
+
+def compute_test_coverage(
+    code_to_test: str,
+    tests: List[str],
+    stop_on_failure: bool = False,
+    coverage_target: Optional[float] = None,
+    test_names: Optional[List[str]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Run extracted test case functions against the code under test and analyze their coverage
+
+    Args:
+        code_to_test: Source code being tested
+        tests: List of extracted test case functions, in execution order
+        stop_on_failure: Stop after the first failing test
+        coverage_target: Stop once the tests run so far reach this line coverage
+        test_names: Method names of the tests (e.g. `TestSuite.names`), default: parsed from the tests
+
+    Returns:
+        Tuple of (formatted matrix, raw analysis results including the uncovered lines)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir_path = Path(temp_dir)
+        code_file = temp_dir_path / "code_to_test.py"
+        test_file = temp_dir_path / "combined_test_script.py"
+
+        with open(code_file, "w") as f:
+            f.write(code_to_test)
+
+        with open(test_file, "w") as f:
+            f.write(assemble_test_script("code_to_test.py", tests, ""))
+
+        matrix_df, raw_results = analyze_test_coverage(
+            str(code_file),
+            "combined_test_script",
+            test_names if test_names is not None else get_test_case_names(tests),
+            stop_on_failure,
+            coverage_target,
+        )
+
+    # Extract uncovered lines
+    uncovered_lines = []
+    for idx, row in matrix_df.iterrows():
+        if idx != "Col Sum" and row["Coverage"] == 0:
+            uncovered_lines.append({"line_number": idx, "line": row["Code"].strip()})
+    raw_results["uncovered_lines"] = uncovered_lines
+
+    return matrix_df, raw_results
+
+
+def coverage_results(
+    code_to_test: str,
+    columns: List[set],
+    outcomes: Optional[List[Optional[str]]] = None,
+    durations: Optional[List[Optional[float]]] = None,
+    arcs: Optional[List[list]] = None,
+    test_names: Optional[List[str]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Coverage matrix and raw results (as returned by compute_test_coverage) from known coverage columns
+
+    Args:
+        code_to_test: Source code being tested
+        columns: Covered line numbers of every test
+        outcomes, durations, arcs, test_names: Recorded per test metadata
+
+    Returns:
+        Tuple of (formatted matrix, raw analysis results including the uncovered lines)
+    """
+    lines = code_to_test.splitlines()
+    total_lines = [line.strip() for line in lines]
+    line_numbers = [i for i, line in enumerate(total_lines, 1) if line and not line.startswith("#")]
+    matrix = [[1 if line in column else 0 for column in columns] for line in line_numbers]
+    row_sums = [sum(row) for row in matrix]
+    uncovered_lines = [
+        {"line_number": line, "line": total_lines[line - 1]}
+        for line, row_sum in zip(line_numbers, row_sums)
+        if row_sum == 0
+    ]
+    raw_results = {
+        "matrix": matrix,
+        "line_numbers": line_numbers,
+        "row_sums": row_sums,
+        "col_sums": [sum(1 for line in line_numbers if line in column) for column in columns],
+        "unexecuted_lines": [{"line": line["line"], "line_number": line["line_number"]} for line in uncovered_lines],
+        "total_lines": total_lines,
+        "line_coverage": sum(1 for row_sum in row_sums if row_sum > 0) / len(line_numbers) if line_numbers else 0,
+        "outcomes": outcomes or [None] * len(columns),
+        "durations": durations or [None] * len(columns),
+        "arcs": arcs or [[] for _ in columns],
+        "test_names": test_names or [],
+        "stopped": None,
+        "uncovered_lines": uncovered_lines,
+    }
+    return CoverageMatrix.format_matrix(raw_results), raw_results
+
+
+def measured_lines(code_to_test: str) -> Set[int]:
+    """
+    Lines coverage measures in the code (statements without excluded lines), the analysis counts the other code lines
+    (e.g. continuation lines or unreachable code) as covered by every test
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        code_path = Path(temp_dir) / "code_to_test.py"
+        code_path.write_text(code_to_test)
+        _, statements, _, _ = coverage.Coverage(branch=True, data_file=None).analysis(str(code_path))
+    return set(statements)
+
+
+def get_covered_lines(raw_results: Dict[str, Any], test_index: int) -> set:
+    """Get the line numbers covered by a single test (column) of the coverage matrix"""
+    return {
+        line_number
+        for line_number, row in zip(raw_results["line_numbers"], raw_results["matrix"])
+        if row[test_index]
+    }
+
+
+def cluster_uncovered_lines(
+    code_to_test: str, uncovered_lines: List[Dict[str, Any]], max_clusters: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    Group uncovered lines into disjoint regions of consecutive uncovered code lines
+
+    Two uncovered lines belong to the same region if only empty lines or comments lie between them.
+
+    Args:
+        code_to_test: Source code being tested
+        uncovered_lines: Uncovered lines as returned by the coverage analysis
+        max_clusters: Maximum number of regions to return (the first regions in source order are kept)
+
+    Returns:
+        List of regions, each a list of uncovered lines
+    """
+    source_lines = code_to_test.splitlines()
+    clusters: List[List[Dict[str, Any]]] = []
+    previous_line_number = None
+
+    for line in sorted(uncovered_lines, key=lambda item: item["line_number"]):
+        line_number = line["line_number"]
+        if previous_line_number is not None:
+            in_between = source_lines[previous_line_number : line_number - 1]
+            if all(not text.strip() or text.strip().startswith("#") for text in in_between):
+                clusters[-1].append(line)
+                previous_line_number = line_number
+                continue
+        if len(clusters) >= max_clusters:
+            break
+        clusters.append([line])
+        previous_line_number = line_number
+
+    return clusters
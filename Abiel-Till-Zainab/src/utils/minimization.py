@@ -0,0 +1,150 @@
+import heapq
+import time
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, Hashable, List, Optional, Sequence, Set
+
+# Reduced instances with at most this many candidate tests are solved exactly in "auto" mode
+EXACT_LIMIT = 20
+MINIMIZATION_METHODS = ["auto", "greedy", "exact"]
+
+
+@dataclass
+class MinimizationResult:
+    """Smallest subset of a test suite found that covers the same requirements"""
+
+    selected: List[int]  # indices of the kept tests, in suite order
+    removed: List[int]  # indices of the redundant tests
+    requirements: int  # covered lines (and arcs) preserved by the kept tests
+    method: str  # "greedy" or "exact" (exact results are a minimum size cover)
+    runtime_s: float  # time spent minimizing
+    execution_time_s: float  # summed durations of all tests (missing durations count as 0)
+    saved_execution_time_s: float  # summed durations of the removed tests
+
+    @property
+    def reduction(self) -> float:
+        total = len(self.selected) + len(self.removed)
+        return len(self.removed) / total if total else 0.0
+
+
+def _reduce(masks: Dict[int, int], costs: Sequence[float]) -> Dict[int, int]:
+    """Drop tests whose requirements are a subset of another test's (equal sets keep the cheapest, then the first)"""
+    ordered = sorted(masks, key=lambda i: (-bin(masks[i]).count("1"), costs[i], i))
+    kept: Dict[int, int] = {}
+    for i in ordered:
+        if not any(masks[i] & ~other == 0 for other in kept.values()):
+            kept[i] = masks[i]
+    return kept
+
+
+def _greedy(masks: Dict[int, int], universe: int, costs: Sequence[float]) -> List[int]:
+    """
+    Greedy set cover with lazy evaluation: gains only shrink, so a popped test whose recomputed gain still beats the
+    next stale gain in the heap is the best choice without recomputing all gains
+    """
+    heap = [(-bin(mask).count("1"), costs[i], i) for i, mask in masks.items()]
+    heapq.heapify(heap)
+    uncovered, selected = universe, []
+    while uncovered and heap:
+        _, cost, i = heapq.heappop(heap)
+        gain = bin(masks[i] & uncovered).count("1")
+        if not gain:
+            continue
+        if heap and (-gain, cost, i) > heap[0]:
+            heapq.heappush(heap, (-gain, cost, i))
+            continue
+        selected.append(i)
+        uncovered &= ~masks[i]
+    # Drop tests made redundant by later choices, most expensive first
+    for i in sorted(selected, key=lambda i: (-costs[i], -i)):
+        others = 0
+        for j in selected:
+            if j != i:
+                others |= masks[j]
+        if universe & ~others == 0:
+            selected.remove(i)
+    return selected
+
+
+def _exact(masks: Dict[int, int], universe: int, costs: Sequence[float], upper_bound: List[int]) -> List[int]:
+    """Minimum size cover (cheapest among them) by enumerating subsets of increasing size below the greedy bound"""
+    candidates = list(masks)
+    for size in range(1, len(upper_bound)):
+        best: Optional[tuple] = None
+        for subset in combinations(candidates, size):
+            covered = 0
+            for i in subset:
+                covered |= masks[i]
+            if covered == universe:
+                cost = sum(costs[i] for i in subset)
+                if best is None or cost < best[0]:
+                    best = (cost, list(subset))
+        if best is not None:
+            return best[1]
+    return upper_bound
+
+
+def minimize_suite(
+    coverage: Sequence[Set[Hashable]],
+    durations: Optional[Sequence[Optional[float]]] = None,
+    method: str = "auto",
+    exact_limit: int = EXACT_LIMIT,
+) -> MinimizationResult:
+    """
+    Find the smallest subset of tests that covers every requirement (line, arc, ...) any test covers
+
+    Tests that are the only ones covering a requirement are kept first, tests covering a subset of another test's
+    requirements are dropped. The rest is solved with lazy greedy set cover, or exactly if `method` is "exact" or
+    "auto" and at most `exact_limit` candidates remain. Ties are broken by the test durations (cheaper tests first).
+
+    Args:
+        coverage: Requirements covered by every test (e.g. covered lines, or lines and arcs)
+        durations: Execution time of every test in seconds
+        method: "auto", "greedy" or "exact"
+        exact_limit: Maximum number of candidate tests solved exactly in "auto" mode
+    """
+    if method not in MINIMIZATION_METHODS:
+        raise ValueError(f"Unknown minimization method {method!r}, expected one of {MINIMIZATION_METHODS}")
+    start = time.perf_counter()
+    costs = [duration or 0.0 for duration in durations] if durations else [0.0] * len(coverage)
+
+    # Requirements as bits of one integer per test
+    bits: Dict[Hashable, int] = {}
+    masks: Dict[int, int] = {}
+    coverers: Dict[int, List[int]] = {}
+    for i, requirements in enumerate(coverage):
+        mask = 0
+        for requirement in set(requirements):
+            bit = bits.setdefault(requirement, len(bits))
+            mask |= 1 << bit
+            coverers.setdefault(bit, []).append(i)
+        if mask:
+            masks[i] = mask
+    universe = (1 << len(bits)) - 1
+
+    # Tests that are the only ones covering a requirement are part of every cover
+    essential = sorted({tests[0] for tests in coverers.values() if len(tests) == 1})
+    covered = 0
+    for i in essential:
+        covered |= masks[i]
+    remaining = universe & ~covered
+    candidates = _reduce(
+        {i: mask & remaining for i, mask in masks.items() if i not in essential and mask & remaining}, costs
+    )
+
+    used_method = "exact" if method == "exact" or (method == "auto" and len(candidates) <= exact_limit) else "greedy"
+    selected = _greedy(candidates, remaining, costs) if remaining else []
+    if remaining and used_method == "exact":
+        selected = _exact(candidates, remaining, costs, selected)
+
+    kept = sorted(essential + selected)
+    removed = sorted(set(range(len(coverage))) - set(kept))
+    return MinimizationResult(
+        selected=kept,
+        removed=removed,
+        requirements=len(bits),
+        method=used_method,
+        runtime_s=time.perf_counter() - start,
+        execution_time_s=sum(costs),
+        saved_execution_time_s=sum(costs[i] for i in removed),
+    )
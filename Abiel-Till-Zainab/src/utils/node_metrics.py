@@ -0,0 +1,323 @@
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Iterator, List,
+                    Optional, Tuple)
+
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+
+if TYPE_CHECKING:
+    from core.scheduler import ProviderScheduler
+
+
+@dataclass
+class NodeRecord:
+    """Metrics of one node for one generated test (LLM metrics are recorded per model)"""
+
+    test_index: int
+    node: str
+    model: str = ""  # model of the LLM calls, empty for the node's own metrics (wall time, embeddings, ...)
+    calls: int = 0
+    retries: int = 0  # re-executions of the node for the same test (e.g. the router after a smell fix)
+    wall_time_s: float = 0.0
+    llm_time_s: float = 0.0  # includes the queue wait
+    queue_wait_s: float = 0.0  # waiting for the provider scheduler (rate limits, in-flight bound)
+    llm_calls: int = 0
+    request_retries: int = 0  # LLM requests retried by the provider scheduler
+    streamed_calls: int = 0
+    time_to_first_token_s: float = 0.0  # summed over the streamed calls
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_calls: int = 0
+    skipped_llm_calls: int = 0  # LLM calls replaced by a local decision (e.g. the static smell analysis)
+    escalations: int = 0  # candidates regenerated with the escalation model
+    duplicate_checks: int = 0  # candidates checked against the structural fingerprints of the stored tests
+    duplicates: int = 0  # candidates found to be exact or near duplicates of a stored test
+
+
+KEY_COLUMNS = ["test_index", "node", "model"]
+METRIC_COLUMNS = [field.name for field in fields(NodeRecord) if field.name not in KEY_COLUMNS]
+MODEL_COLUMNS = ["llm_calls", "llm_time_s", "queue_wait_s", "request_retries", "prompt_tokens", "completion_tokens"]
+
+
+def _raw_message(response: Any) -> Any:
+    """Get the raw message of a response (structured output created with include_raw=True is a dict)"""
+    return response["raw"] if isinstance(response, dict) and "raw" in response else response
+
+
+def get_token_usage(message: Any) -> Tuple[int, int]:
+    """Get (prompt tokens, completion tokens) from the metadata of an LLM response"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+
+class NodeMetrics:
+    """
+    Collects wall time, LLM time, token usage, retries and embedding calls per graph node and generated test
+
+    LLM time and token usage are additionally broken down by model (see `per_model`).
+
+    Usage:
+        metrics.start_test()
+        with metrics.node("write_initial_test"):
+            response = metrics.invoke(llm, prompt)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Drop all collected metrics"""
+        self._records: Dict[Tuple[int, str, str], NodeRecord] = {}
+        self._node_stack: List[str] = []
+        self.test_index = 0
+
+    def start_test(self) -> int:
+        """Start collecting metrics for the next generated test"""
+        self.test_index += 1
+        return self.test_index
+
+    def _record(self, node: Optional[str] = None, model: str = "") -> NodeRecord:
+        node = node or (self._node_stack[-1] if self._node_stack else "outside_graph")
+        key = (self.test_index, node, model)
+        if key not in self._records:
+            self._records[key] = NodeRecord(test_index=self.test_index, node=node, model=model)
+        return self._records[key]
+
+    @contextmanager
+    def node(self, name: str) -> Iterator[NodeRecord]:
+        """Measure the execution of a node"""
+        record = self._record(name)
+        if record.calls:
+            record.retries += 1
+        record.calls += 1
+        self._node_stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall_time_s += time.perf_counter() - start
+            self._node_stack.pop()
+
+    @contextmanager
+    def llm_call(self, model: str = "") -> Iterator[NodeRecord]:
+        """Measure the time blocked on an LLM call of the current node"""
+        record = self._record(model=model)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.llm_time_s += time.perf_counter() - start
+            record.llm_calls += 1
+
+    def add_token_usage(self, message: Any, model: str = ""):
+        """Add the token usage of an LLM response to the current node"""
+        prompt_tokens, completion_tokens = get_token_usage(message)
+        record = self._record(model=model)
+        record.prompt_tokens += prompt_tokens
+        record.completion_tokens += completion_tokens
+
+    def add_embedding_calls(self, count: int = 1):
+        """Add embedding requests to the current node"""
+        self._record().embedding_calls += count
+
+    def skip_llm_call(self):
+        """Record an LLM call of the current node that was replaced by a local decision"""
+        self._record().skipped_llm_calls += 1
+
+    def escalate(self):
+        """Record a candidate of the current node that is regenerated with the escalation model"""
+        self._record().escalations += 1
+
+    def add_duplicate_check(self, duplicate: bool):
+        """Record a structural duplicate check of a candidate in the current node"""
+        record = self._record()
+        record.duplicate_checks += 1
+        record.duplicates += int(duplicate)
+
+    def duplicate_rate(self) -> float:
+        """Share of the checked candidates of the run that duplicated a stored test"""
+        df = self.to_dataframe()
+        checks = df["duplicate_checks"].sum()
+        return float(df["duplicates"].sum() / checks) if checks else 0.0
+
+    def _schedule(
+        self, request: Callable[[], Any], prompt: Any, scheduler: Optional["ProviderScheduler"], record: NodeRecord
+    ) -> Any:
+        """Run an LLM request, through the provider scheduler if one is given"""
+        if scheduler is None:
+            return request()
+        response, stats = scheduler.submit(
+            request,
+            prompt_tokens=len(str(prompt)) // 4,
+            get_used_tokens=lambda response: sum(get_token_usage(_raw_message(response))),
+        )
+        record.queue_wait_s += stats.queue_wait_s
+        record.request_retries += stats.retries
+        return response
+
+    def invoke(
+        self, runnable: Runnable, prompt: Any, scheduler: Optional["ProviderScheduler"] = None, model: str = ""
+    ) -> Any:
+        """
+        Invoke an LLM (or structured output runnable created with include_raw=True) and record time and tokens
+
+        Structured output is returned parsed, parsing errors are raised like without include_raw.
+        """
+        with self.llm_call(model) as record:
+            response = self._schedule(lambda: runnable.invoke(prompt), prompt, scheduler, record)
+        self.add_token_usage(_raw_message(response), model)
+        if isinstance(response, dict) and "raw" in response:
+            if response.get("parsing_error"):
+                raise response["parsing_error"]
+            return response["parsed"]
+        return response
+
+    def stream(
+        self,
+        llm: Runnable,
+        prompt: Any,
+        on_text: Callable[[str], None],
+        scheduler: Optional["ProviderScheduler"] = None,
+        model: str = "",
+    ) -> Any:
+        """
+        Stream an LLM response, passing the text received so far to `on_text` after every chunk
+
+        Records time and tokens like `invoke` and additionally the time to the first token.
+
+        Returns:
+            The aggregated response message
+        """
+        with self.llm_call(model) as record:
+
+            def request() -> Any:
+                start = time.perf_counter()
+                response = None
+                received_first_token = False
+                for chunk in llm.stream(prompt):
+                    response = chunk if response is None else response + chunk
+                    if not chunk.content:
+                        continue
+                    if not received_first_token:
+                        record.time_to_first_token_s += time.perf_counter() - start
+                        record.streamed_calls += 1
+                        received_first_token = True
+                    on_text(str(response.content))
+                return response
+
+            response = self._schedule(request, prompt, scheduler, record)
+        self.add_token_usage(response, model)
+        return response
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """All records, one row per generated test and node"""
+        return pd.DataFrame(
+            [asdict(record) for record in self._records.values()],
+            columns=KEY_COLUMNS + METRIC_COLUMNS,
+        )
+
+    def per_test(self) -> pd.DataFrame:
+        """Metrics aggregated per generated test"""
+        return self.to_dataframe().drop(columns=["node", "model"]).groupby("test_index").sum()
+
+    def per_node(self) -> pd.DataFrame:
+        """Metrics aggregated per node over the whole run"""
+        df = self.to_dataframe().drop(columns=["test_index", "model"]).groupby("node").sum()
+        # Nodes without calls (e.g. time outside the graph) have no mean
+        df["mean_wall_time_s"] = (df["wall_time_s"] / df["calls"].where(df["calls"] > 0)).fillna(0.0)
+        streamed_calls = df["streamed_calls"].where(df["streamed_calls"] > 0)
+        df["mean_time_to_first_token_s"] = (df["time_to_first_token_s"] / streamed_calls).fillna(0.0)
+        return df
+
+    def per_model(self, prices: Optional[Dict[str, Dict[str, float]]] = None) -> pd.DataFrame:
+        """
+        LLM calls, latency and token spend aggregated per model over the whole run
+
+        Args:
+            prices: Optional USD prices per million tokens by model, e.g. {"gpt-4o": {"prompt": 2.5, "completion": 10}}
+        """
+        df = self.to_dataframe()
+        df = df[df["model"] != ""].groupby("model")[MODEL_COLUMNS].sum()
+        calls = df["llm_calls"].where(df["llm_calls"] > 0)
+        df["mean_latency_s"] = ((df["llm_time_s"] - df["queue_wait_s"]) / calls).fillna(0.0)
+        df["tokens_per_call"] = ((df["prompt_tokens"] + df["completion_tokens"]) / calls).fillna(0.0)
+        if prices:
+            df["cost_usd"] = [
+                (
+                    prices.get(model, {}).get("prompt", 0.0) * row["prompt_tokens"]
+                    + prices.get(model, {}).get("completion", 0.0) * row["completion_tokens"]
+                )
+                / 1e6
+                for model, row in df.iterrows()
+            ]
+        return df
+
+    def skipped_llm_call_savings(self) -> pd.DataFrame:
+        """
+        Skip rate and estimated savings per node with skipped LLM calls
+
+        Savings are estimated with the mean latency and token usage of the node's LLM calls that were not skipped.
+        """
+        df = self.per_node()
+        df = df[df["skipped_llm_calls"] > 0]
+        decisions = df["skipped_llm_calls"] + df["llm_calls"]
+        mean_llm_time = (df["llm_time_s"] / df["llm_calls"]).where(df["llm_calls"] > 0, 0.0)
+        mean_tokens = ((df["prompt_tokens"] + df["completion_tokens"]) / df["llm_calls"]).where(df["llm_calls"] > 0, 0.0)
+        return pd.DataFrame(
+            {
+                "decisions": decisions,
+                "skipped_llm_calls": df["skipped_llm_calls"],
+                "skip_rate": df["skipped_llm_calls"] / decisions,
+                "estimated_time_saved_s": df["skipped_llm_calls"] * mean_llm_time,
+                "estimated_tokens_saved": (df["skipped_llm_calls"] * mean_tokens).round().astype(int),
+            }
+        )
+
+    def test_summary(self, test_index: Optional[int] = None) -> str:
+        """One line summary of a generated test (defaults to the current one)"""
+        df = self.to_dataframe()
+        df = df[df["test_index"] == (test_index or self.test_index)]
+        return (
+            f"{df['wall_time_s'].sum():.2f}s in nodes ({df['llm_time_s'].sum():.2f}s LLM), "
+            f"{df['llm_calls'].sum()} LLM calls, {df['prompt_tokens'].sum()} prompt + "
+            f"{df['completion_tokens'].sum()} completion tokens, {df['embedding_calls'].sum()} embedding calls, "
+            f"{df['skipped_llm_calls'].sum()} skipped LLM calls, {df['escalations'].sum()} escalations, "
+            f"{df['duplicates'].sum()} duplicates"
+        )
+
+    def save(self, run_dir: Path) -> Dict[str, Any]:
+        """
+        Write node_metrics.csv (per test, node and model), test_metrics.csv (per test) and model_metrics.csv (per
+        model) into the run directory
+
+        Returns:
+            Run summary per node as a dictionary
+        """
+        self.to_dataframe().to_csv(run_dir / "node_metrics.csv", index=False)
+        self.per_test().to_csv(run_dir / "test_metrics.csv")
+        self.per_model().to_csv(run_dir / "model_metrics.csv")
+        return self.per_node().to_dict(orient="index")
+
+
+class MeteredEmbeddings(Embeddings):
+    """Embedding model wrapper counting embedding requests per node"""
+
+    def __init__(self, embeddings: Embeddings, metrics: NodeMetrics):
+        self.embeddings = embeddings
+        self.metrics = metrics
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if texts:
+            self.metrics.add_embedding_calls()
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.metrics.add_embedding_calls()
+        return self.embeddings.embed_query(text)
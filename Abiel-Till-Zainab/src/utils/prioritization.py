@@ -0,0 +1,192 @@
+import heapq
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Sequence, Set
+
+PRIORITIZATION_STRATEGIES = ["declaration", "additional_coverage", "coverage_per_time"]
+
+
+@dataclass
+class ExecutionReport:
+    """Early detection metrics of one prioritized test execution"""
+
+    strategy: str
+    executed: int  # tests run before the execution stopped
+    total: int  # tests in the prioritized order
+    stopped: Optional[str]  # "failure", "coverage_target" or None if every test ran
+    failures: int  # failed (or erroring) tests among the executed ones
+    apfd: Optional[float]  # average percentage of faults detected, None without failures
+    apfd_c: Optional[float]  # cost-cognizant APFD (weighted by test durations), None without failures or durations
+    apfc: float  # average percentage of line coverage reached over the order
+    time_to_first_failure_s: Optional[float]
+    execution_time_s: float
+
+
+def _masks(coverage: Sequence[Optional[Set[Hashable]]]) -> List[int]:
+    """Covered requirements of every test as bits of one integer (tests without coverage data get 0)"""
+    bits: Dict[Hashable, int] = {}
+    masks = []
+    for requirements in coverage:
+        mask = 0
+        for requirement in requirements or ():
+            mask |= 1 << bits.setdefault(requirement, len(bits))
+        masks.append(mask)
+    return masks
+
+
+def _costs(durations: Optional[Sequence[Optional[float]]], count: int) -> List[float]:
+    """Test durations, missing durations are the mean of the known ones (1s without any)"""
+    known = [duration for duration in durations or () if duration is not None]
+    default = sum(known) / len(known) if known else 1.0
+    return [max(duration if duration is not None else default, 1e-6) for duration in (durations or [None] * count)]
+
+
+def _additional_greedy(masks: List[int], candidates: List[int], costs: Optional[List[float]]) -> List[int]:
+    """
+    Additional-greedy order: the test adding the most not yet covered lines (per second with costs) comes next. Once
+    no test adds coverage, coverage is reset and the remaining tests are ordered again. Gains only shrink between
+    resets, so stale gains in the heap are upper bounds and only the popped test is recomputed (lazy evaluation).
+    """
+    order: List[int] = []
+    remaining = list(candidates)
+    universe = 0
+    for i in remaining:
+        universe |= masks[i]
+
+    def score(gain: int, i: int) -> float:
+        return gain / costs[i] if costs else gain
+
+    # After a reset every test adds all of its lines
+    sizes = {i: bin(masks[i]).count("1") for i in remaining}
+    while remaining:
+        uncovered = universe
+        heap = [(-score(sizes[i], i), i) for i in remaining]
+        heapq.heapify(heap)
+        selected: List[int] = []
+        while heap:
+            _, i = heapq.heappop(heap)
+            current = score(bin(masks[i] & uncovered).count("1"), i)
+            if heap and (-current, i) > heap[0]:
+                heapq.heappush(heap, (-current, i))
+                continue
+            if not current:
+                break
+            selected.append(i)
+            uncovered &= ~masks[i]
+        if not selected:
+            # Tests covering nothing keep their order (cheapest first with costs)
+            order += sorted(remaining, key=lambda i: (costs[i], i)) if costs else remaining
+            break
+        order += selected
+        chosen = set(selected)
+        remaining = [i for i in remaining if i not in chosen]
+    return order
+
+
+def prioritize(
+    coverage: Sequence[Optional[Set[Hashable]]],
+    durations: Optional[Sequence[Optional[float]]] = None,
+    strategy: str = "additional_coverage",
+) -> List[int]:
+    """
+    Execution order of a test suite (indices into `coverage`)
+
+    Strategies:
+        declaration: The suite order
+        additional_coverage: Additional-greedy, the test covering the most lines not covered by the tests before it
+            comes next (ties keep the suite order)
+        coverage_per_time: Additional-greedy by additional lines per second of the recorded test durations, so
+            cheap tests with high coverage run first
+
+    Tests without coverage data (not analyzed yet, e.g. new tests) run first in suite order.
+    """
+    if strategy not in PRIORITIZATION_STRATEGIES:
+        raise ValueError(f"Unknown prioritization strategy {strategy!r}, expected one of {PRIORITIZATION_STRATEGIES}")
+    if strategy == "declaration":
+        return list(range(len(coverage)))
+    unknown = [i for i, requirements in enumerate(coverage) if requirements is None]
+    known = [i for i, requirements in enumerate(coverage) if requirements is not None]
+    costs = _costs(durations, len(coverage)) if strategy == "coverage_per_time" else None
+    return unknown + _additional_greedy(_masks(coverage), known, costs)
+
+
+def apfd(failed: Sequence[bool], total: Optional[int] = None) -> Optional[float]:
+    """
+    Average percentage of faults detected of an execution order, every failing test counted as one fault
+
+    APFD = 1 - sum(TF_i) / (n * m) + 1 / (2n) with the position TF_i of the i-th failing test, n tests in the order
+    (`total`, tests that did not run count as passing) and m failures. None without failures.
+    """
+    n = total if total is not None else len(failed)
+    positions = [position for position, failure in enumerate(failed, 1) if failure]
+    if not positions or not n:
+        return None
+    return 1 - sum(positions) / (n * len(positions)) + 1 / (2 * n)
+
+
+def apfd_c(failed: Sequence[bool], durations: Sequence[Optional[float]]) -> Optional[float]:
+    """
+    Cost-cognizant APFD (equal fault severities): the share of the execution time left after every failure is
+    detected, averaged over the failures. `durations` covers the whole order, None if a duration is missing.
+    """
+    positions = [position for position, failure in enumerate(failed) if failure]
+    if not positions or any(duration is None for duration in durations) or not sum(durations):
+        return None
+    total_time = sum(durations)
+    return sum(sum(durations[position:]) - durations[position] / 2 for position in positions) / (
+        total_time * len(positions)
+    )
+
+
+def apfc(coverage: Sequence[Set[Hashable]], total: Optional[int] = None) -> float:
+    """
+    Average percentage of (line) coverage: APFD over the covered lines instead of faults, TL_j is the position of
+    the first test covering line j. Lines no test covers are not counted.
+    """
+    n = total if total is not None else len(coverage)
+    first_position: Dict[Hashable, int] = {}
+    for position, requirements in enumerate(coverage, 1):
+        for requirement in requirements:
+            first_position.setdefault(requirement, position)
+    if not first_position or not n:
+        return 0.0
+    return 1 - sum(first_position.values()) / (n * len(first_position)) + 1 / (2 * n)
+
+
+def execution_report(
+    strategy: str,
+    outcomes: Sequence[str],
+    coverage: Sequence[Set[Hashable]],
+    durations: Sequence[Optional[float]],
+    total: int,
+    stopped: Optional[str] = None,
+    order_durations: Optional[Sequence[Optional[float]]] = None,
+) -> ExecutionReport:
+    """
+    Metrics of an execution in prioritized order
+
+    Args:
+        strategy: Prioritization strategy of the order
+        outcomes: Outcome ("passed", "failed", "error") of every executed test, in execution order
+        coverage: Covered lines of every executed test
+        durations: Measured duration of every executed test
+        total: Number of tests in the whole order (executed or not)
+        stopped: Why the execution stopped early, if it did
+        order_durations: Durations of the whole order (measured or recorded) for APFDc, default: the executed tests
+    """
+    failed = [outcome != "passed" for outcome in outcomes]
+    executed_time = sum(duration or 0.0 for duration in durations)
+    first_failure = failed.index(True) if any(failed) else None
+    return ExecutionReport(
+        strategy=strategy,
+        executed=len(outcomes),
+        total=total,
+        stopped=stopped,
+        failures=sum(failed),
+        apfd=apfd(failed, total),
+        apfd_c=apfd_c(failed, list(order_durations) if order_durations is not None else list(durations)),
+        apfc=apfc(coverage, total),
+        time_to_first_failure_s=(
+            sum(duration or 0.0 for duration in durations[: first_failure + 1]) if first_failure is not None else None
+        ),
+        execution_time_s=executed_time,
+    )
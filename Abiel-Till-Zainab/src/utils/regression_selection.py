@@ -0,0 +1,146 @@
+import difflib
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from utils.metrics import compute_test_coverage, measured_lines
+from utils.test_suite import SuiteTest, TestSuite
+
+
+@dataclass
+class LineMapping:
+    """Line level diff of two versions of the code under test"""
+
+    old_to_new: Dict[int, int]  # unchanged old lines and their new line numbers
+    affected: Set[int]  # old code lines whose execution may differ: edited, removed or next to inserted code
+    added: Set[int]  # new lines without an old counterpart
+
+
+@dataclass
+class SelectionReport:
+    """Execution saved by re-running only the tests an edit affects"""
+
+    total: int  # tests in the suite
+    executed: int  # tests re-executed (affected by the edit or without coverage data)
+    reused: int  # tests whose coverage columns were remapped to the edited code
+    affected_lines: int  # old code lines affected by the edit
+    added_lines: int
+    runtime_s: float  # diffing, selection and re-execution
+    execution_time_s: float  # durations of the re-executed tests
+    saved_execution_time_s: float  # recorded durations of the reused tests
+
+    @property
+    def saved_share(self) -> float:
+        total = self.execution_time_s + self.saved_execution_time_s
+        return self.saved_execution_time_s / total if total else 0.0
+
+
+def _is_code(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith("#")
+
+
+def _code_lines(code: str) -> Set[int]:
+    return {i for i, line in enumerate(code.splitlines(), 1) if _is_code(line)}
+
+
+def map_lines(old_code: str, new_code: str) -> LineMapping:
+    """
+    Map the lines of the old code to the new code with difflib
+
+    Lines in equal blocks keep their coverage under their new number. Code lines in a changed block are affected, and
+    so are the nearest code lines before and after it, since the tests passing them may reach inserted code. Blocks
+    that only change blank or comment lines affect nothing.
+    """
+    old_lines, new_lines = old_code.splitlines(), new_code.splitlines()
+    old_to_new: Dict[int, int] = {}
+    affected: Set[int] = set()
+    added: Set[int] = set()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            old_to_new.update({i1 + k + 1: j1 + k + 1 for k in range(i2 - i1)})
+            continue
+        added.update(range(j1 + 1, j2 + 1))
+        if not any(map(_is_code, old_lines[i1:i2] + new_lines[j1:j2])):
+            continue
+        affected.update(i + 1 for i in range(i1, i2) if _is_code(old_lines[i]))
+        before = next((i for i in range(i1 - 1, -1, -1) if _is_code(old_lines[i])), None)
+        after = next((i for i in range(i2, len(old_lines)) if _is_code(old_lines[i])), None)
+        affected.update(i + 1 for i in (before, after) if i is not None)
+    return LineMapping(old_to_new, affected, added)
+
+
+def _remap_arc_line(line: int, old_to_new: Dict[int, int]) -> Optional[int]:
+    """New number of a line of a coverage arc, negative lines are the entry or exit of the code object starting there"""
+    if line == -1:
+        return -1  # the module always starts at line 1
+    new_line = old_to_new.get(abs(line))
+    return new_line if new_line is None or line > 0 else -new_line
+
+
+def select_tests(suite: TestSuite, old_code: str, new_code: str) -> Tuple[List[SuiteTest], LineMapping]:
+    """
+    Tests to re-execute after the code under test changed from `old_code` (the code of the last analysis)
+
+    Tests without coverage data, erroring tests (their column covers every line) and tests covering an affected line
+    are selected, their coverage is cleared. The coverage columns (and arcs) of the other tests are remapped to the
+    new line numbers in place. The analysis counts code lines coverage does not measure (e.g. unreachable code) as
+    covered by every test, so remapped columns take the unmeasured lines of the new code, and lines that become
+    measured are affected.
+    """
+    if old_code == new_code:
+        mapping = LineMapping({}, set(), set())
+    else:
+        mapping = map_lines(old_code, new_code)
+        old_measured, new_measured = measured_lines(old_code), measured_lines(new_code)
+        old_unmeasured = _code_lines(old_code) - old_measured
+        unmeasured = _code_lines(new_code) - new_measured
+        mapping.affected |= {line for line in old_unmeasured if mapping.old_to_new.get(line) in new_measured}
+    selected = []
+    for test in suite:
+        if test.covered_lines is None or test.outcome == "error" or test.covered_lines & mapping.affected:
+            test.covered_lines = test.covered_arcs = None
+            selected.append(test)
+        elif old_code != new_code:
+            test.covered_lines = frozenset(
+                mapping.old_to_new[line] for line in test.covered_lines if line in old_measured
+            ) | frozenset(unmeasured)
+            if test.covered_arcs is not None:
+                arcs = [tuple(_remap_arc_line(line, mapping.old_to_new) for line in arc) for arc in test.covered_arcs]
+                test.covered_arcs = frozenset(arcs) if all(all(arc) for arc in arcs) else None
+    return selected, mapping
+
+
+def compute_selective_coverage(suite: TestSuite, old_code: str, new_code: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Coverage of the suite for the edited code, re-executing only the tests the edit affects (see `select_tests`)
+
+    Returns:
+        Tuple of (formatted matrix, raw analysis results of the whole suite), the results hold a SelectionReport under
+        "selection_report"
+    """
+    start = time.perf_counter()
+    selected, mapping = select_tests(suite, old_code, new_code)
+    if selected:
+        _, raw_results = compute_test_coverage(
+            new_code, [test.source for test in selected], test_names=[test.name for test in selected]
+        )
+        suite.update_coverage(raw_results, selected)
+    matrix_df, raw_results = suite.coverage_results(new_code)
+
+    executed = {test.hash for test in selected}
+    reused = [test for test in suite if test.hash not in executed]
+    raw_results["selection_report"] = SelectionReport(
+        total=len(suite),
+        executed=len(selected),
+        reused=len(reused),
+        affected_lines=len(mapping.affected),
+        added_lines=len(mapping.added),
+        runtime_s=time.perf_counter() - start,
+        execution_time_s=sum(test.duration_s or 0.0 for test in selected),
+        saved_execution_time_s=sum(test.duration_s or 0.0 for test in reused),
+    )
+    return matrix_df, raw_results
@@ -0,0 +1,324 @@
+import ast
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Number of positional arguments before the msg argument of unittest assertion methods
+ASSERTION_MESSAGE_POSITIONS = {
+    "assertTrue": 1,
+    "assertFalse": 1,
+    "assertIsNone": 1,
+    "assertIsNotNone": 1,
+    "assertEqual": 2,
+    "assertNotEqual": 2,
+    "assertIs": 2,
+    "assertIsNot": 2,
+    "assertIn": 2,
+    "assertNotIn": 2,
+    "assertIsInstance": 2,
+    "assertNotIsInstance": 2,
+    "assertGreater": 2,
+    "assertGreaterEqual": 2,
+    "assertLess": 2,
+    "assertLessEqual": 2,
+    "assertCountEqual": 2,
+    "assertListEqual": 2,
+    "assertTupleEqual": 2,
+    "assertSetEqual": 2,
+    "assertDictEqual": 2,
+    "assertSequenceEqual": 3,
+    "assertMultiLineEqual": 2,
+    "assertRegex": 2,
+    "assertNotRegex": 2,
+    "assertAlmostEqual": 3,
+    "assertNotAlmostEqual": 3,
+}
+# Assertions used as context managers (with self.assertRaises(...):), they only take msg as keyword
+CONTEXT_MANAGER_ASSERTIONS = {"assertRaises", "assertRaisesRegex", "assertWarns", "assertWarnsRegex", "assertLogs"}
+
+ALLOWED_NUMBERS = {0, 1, -1}
+NON_DETERMINISTIC_CALLS = {"random", "randint", "choice", "shuffle", "uniform", "time", "now", "today", "uuid4"}
+UNCLEAR_TEST_NAME = re.compile(r"^test_?(\d+|something|it|test|case|function|func|f|a|b|x|example)?\d*$")
+
+
+@dataclass
+class TestSmell:
+    """A test smell found by static analysis"""
+
+    name: str
+    description: str
+    lines: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SmellReport:
+    """
+    Result of the static smell analysis of a single test
+
+    `conclusive` is True if the analysis can decide the routing without the LLM router, i.e. if smells were found. A
+    test without static smells still goes to the router, which also checks criteria the analysis cannot (e.g. complex
+    setup, unclear arrange-act-assert, non-realistic test data, brittle assertions).
+    """
+
+    smells: List[TestSmell]
+    conclusive: bool
+    reason: str = ""
+
+    @property
+    def destination(self) -> Optional[str]:
+        """Routing decision of a conclusive analysis, None if the LLM router has to decide"""
+        return "fix_test_smell" if self.conclusive else None
+
+    def format(self) -> str:
+        """Format the smells like the identified_smells of the LLM router"""
+        if not self.smells:
+            return "No test smells found."
+        blocks = []
+        for smell in self.smells:
+            lines = "".join(f"\n    {line}" for line in smell.lines)
+            blocks.append(f"{smell.name}: {smell.description}{lines}")
+        return "\n\n".join(blocks)
+
+
+def _is_self_call(node: ast.AST, names: Optional[set] = None) -> bool:
+    """Check if a node is a call of a self.<method> (optionally with one of the given names)"""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+        and (names is None or node.func.attr in names)
+    )
+
+
+def _is_assertion(node: ast.AST) -> bool:
+    return isinstance(node, ast.Assert) or (
+        _is_self_call(node) and (node.func.attr.startswith("assert") or node.func.attr == "fail")
+    )
+
+
+def _has_message(node: ast.AST) -> Optional[bool]:
+    """Check if an assertion has a failure message, None if this cannot be decided"""
+    if isinstance(node, ast.Assert):
+        return node.msg is not None
+    name = node.func.attr
+    if any(keyword.arg == "msg" for keyword in node.keywords):
+        return True
+    if name in ASSERTION_MESSAGE_POSITIONS:
+        return len(node.args) > ASSERTION_MESSAGE_POSITIONS[name]
+    if name == "fail":
+        return bool(node.args)
+    return None
+
+
+def _is_constant_assertion(node: ast.AST) -> bool:
+    """Check if an assertion only compares literals (e.g. assert True, self.assertEqual(1, 1))"""
+    if isinstance(node, ast.Assert):
+        operands = [node.test]
+        if isinstance(node.test, ast.Compare):
+            operands = [node.test.left, *node.test.comparators]
+    elif node.func.attr in ASSERTION_MESSAGE_POSITIONS:
+        operands = node.args[: ASSERTION_MESSAGE_POSITIONS[node.func.attr]]
+    else:
+        return False
+    return bool(operands) and all(isinstance(operand, ast.Constant) for operand in operands)
+
+
+def _number(node: ast.AST) -> Optional[float]:
+    """Get the value of a numeric literal (including negative numbers)"""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _number(node.operand)
+        return -value if value is not None else None
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex):
+        return node.value
+    return None
+
+
+def _is_numeric_literal(node: ast.AST) -> bool:
+    """Check if a node is a number or a tuple/list of numbers"""
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return all(_is_numeric_literal(element) for element in node.elts)
+    return _number(node) is not None
+
+
+def _magic_numbers(function: ast.FunctionDef) -> List[ast.AST]:
+    """
+    Numeric literals used directly instead of being named by a variable
+
+    Subscripts and expected values of assertions (e.g. self.assertEqual(result, 45, ...)) are allowed.
+    """
+    named, allowed = set(), set()
+    for node in ast.walk(function):
+        # name = 15, name = (3, 4), name = [3, 4]
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if all(isinstance(target, ast.Name) for target in targets) and _is_numeric_literal(node.value):
+                named.update(id(child) for child in ast.walk(node.value))
+        elif isinstance(node, ast.Subscript):
+            allowed.update(id(child) for child in ast.walk(node.slice))
+        elif _is_assertion(node):
+            if isinstance(node, ast.Assert):
+                operands = [node.test.left, *node.test.comparators] if isinstance(node.test, ast.Compare) else []
+            else:
+                operands = node.args
+            for operand in operands:
+                if isinstance(operand, (ast.Tuple, ast.List)):
+                    allowed.update(id(child) for element in operand.elts for child in ast.walk(element))
+                allowed.update(id(child) for child in ast.walk(operand) if _number(child) is not None)
+
+    magic, seen = [], set()
+    for node in ast.walk(function):
+        value = _number(node)
+        if value is None or id(node) in seen or id(node) in named or id(node) in allowed:
+            continue
+        if isinstance(node, ast.UnaryOp):
+            seen.add(id(node.operand))
+        if value not in ALLOWED_NUMBERS:
+            magic.append(node)
+    return magic
+
+
+def _find_test_function(tree: ast.Module) -> Optional[ast.FunctionDef]:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            return node
+    return None
+
+
+def analyze_test_smells(unit_test: str) -> SmellReport:
+    """
+    Statically detect the mechanically checkable smells of has_test_smell_router_prompt in a single test function
+
+    Detected: empty tests, tests without assertions, multiple assertions, assertions without messages, redundant
+    (constant) assertions, conditional test logic, magic numbers, non-deterministic calls, unclear test names and
+    missing docstrings.
+
+    Args:
+        unit_test: Source of a single test function
+
+    Returns:
+        SmellReport with the found smells and whether they decide the routing without the LLM
+    """
+    try:
+        tree = ast.parse(unit_test)
+    except SyntaxError:
+        return SmellReport([], conclusive=False, reason="test does not parse")
+    function = _find_test_function(tree)
+    if function is None:
+        return SmellReport([], conclusive=False, reason="no test function found")
+
+    source_lines = unit_test.splitlines()
+
+    def source(node: ast.AST) -> str:
+        return source_lines[node.lineno - 1].strip() if 0 < node.lineno <= len(source_lines) else ""
+
+    smells = []
+    docstring = ast.get_docstring(function)
+    statements = function.body[1:] if docstring is not None else function.body
+    executable = [
+        statement
+        for statement in statements
+        if not isinstance(statement, ast.Pass)
+        and not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant))
+    ]
+    if not executable:
+        smells.append(TestSmell("Empty Test", f"The test function '{function.name}' does not contain executable code."))
+        return SmellReport(smells, conclusive=True)
+
+    assertions = [node for node in ast.walk(function) if _is_assertion(node)]
+    context_assertions = [
+        item.context_expr
+        for node in ast.walk(function)
+        if isinstance(node, (ast.With, ast.AsyncWith))
+        for item in node.items
+        if _is_self_call(item.context_expr, CONTEXT_MANAGER_ASSERTIONS)
+    ]
+    assertions = [node for node in assertions if not any(node is other for other in context_assertions)]
+    assertions.sort(key=lambda node: (node.lineno, node.col_offset))
+    assertion_count = len(assertions) + len(context_assertions)
+
+    if not assertion_count:
+        smells.append(
+            TestSmell("Unknown Test", f"The test function '{function.name}' does not contain any assertions.")
+        )
+    elif assertion_count > 1:
+        smells.append(
+            TestSmell(
+                "Multiple Assertions",
+                f"{assertion_count} assertions in one test case, only the first assertion should be kept:",
+                [source(node) for node in sorted(assertions + context_assertions, key=lambda node: node.lineno)],
+            )
+        )
+
+    messages = [_has_message(node) for node in assertions]
+    without_message = [node for node, has_message in zip(assertions, messages) if has_message is False]
+    if without_message:
+        smells.append(
+            TestSmell(
+                "Missing Assertion Messages",
+                "Assertions without failure messages in:",
+                [source(node) for node in without_message],
+            )
+        )
+
+    redundant = [node for node in assertions if _is_constant_assertion(node)]
+    if redundant:
+        smells.append(
+            TestSmell(
+                "Redundant Assertions",
+                "Assertions that only compare literals in:",
+                [source(node) for node in redundant],
+            )
+        )
+
+    conditionals = sorted(
+        (node for node in ast.walk(function) if isinstance(node, (ast.If, ast.For, ast.While, ast.IfExp, ast.Match))),
+        key=lambda node: node.lineno,
+    )
+    if conditionals:
+        smells.append(
+            TestSmell("Conditional Test Logic", "Control flow in the test in:", [source(node) for node in conditionals])
+        )
+
+    magic = _magic_numbers(function)
+    if magic:
+        smells.append(
+            TestSmell(
+                "Magic Number Test",
+                "Unexplained numeric literals in:",
+                list(dict.fromkeys(source(node) for node in sorted(magic, key=lambda node: node.lineno))),
+            )
+        )
+
+    non_deterministic = [
+        node
+        for node in ast.walk(function)
+        if isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr in NON_DETERMINISTIC_CALLS
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id in ("random", "time", "datetime", "date", "uuid")
+    ]
+    if non_deterministic:
+        smells.append(
+            TestSmell(
+                "Non-Deterministic Elements",
+                "Results may differ between runs because of:",
+                [source(node) for node in non_deterministic],
+            )
+        )
+
+    if UNCLEAR_TEST_NAME.match(function.name):
+        smells.append(
+            TestSmell("Bad Test Name", f"The test function name '{function.name}' does not describe its purpose.")
+        )
+    if docstring is None:
+        smells.append(
+            TestSmell(
+                "Missing Docstring", f"The test function '{function.name}' has no docstring explaining its purpose."
+            )
+        )
+
+    if smells:
+        return SmellReport(smells, conclusive=True)
+    return SmellReport([], conclusive=False, reason="no static smells, the remaining criteria need the LLM router")
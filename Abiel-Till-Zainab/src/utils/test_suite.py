@@ -0,0 +1,243 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.code_processing import TestRecord, assemble_test_script, extract_test_records
+from utils.coverage_index import bitset_lines, line_bitsets, unique_coverage
+from utils.metrics import coverage_results, get_covered_lines
+from utils.minimization import MinimizationResult, minimize_suite
+from utils.prioritization import prioritize
+
+
+@dataclass
+class SuiteTest:
+    """Test of a suite with its metadata"""
+
+    id: str  # stable within the suite and its saved history (t1, t2, ...)
+    record: TestRecord  # name, source, span and content hash from the single parse of the test
+    origin: str = "user"  # "user" or the model (or local generator) that wrote the test
+    covered_lines: Optional[FrozenSet[int]] = None  # coverage matrix column, None until the suite is analyzed
+    covered_arcs: Optional[FrozenSet[Tuple[int, int]]] = None  # executed line transitions (branch coverage)
+    outcome: Optional[str] = None  # "passed", "failed" or "error" in the last coverage analysis
+    duration_s: Optional[float] = None  # run time in the last coverage analysis
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.record.name
+
+    @property
+    def source(self) -> str:
+        return self.record.source
+
+    @property
+    def hash(self) -> str:
+        return self.record.hash
+
+
+class TestSuite:
+    """
+    Parsed tests with stable ids, content hashes and per-test metadata
+
+    Every test is parsed once when it enters the suite (`extract_test_records`), tests are kept by content hash, so
+    syncing with unchanged inputs neither parses nor loses metadata. Test names are unique: the assembled test class
+    keeps only one method per name, so a test whose name is taken is not added. The assembled script is cached until the suite
+    changes. Consumers (vector store, coverage analysis, script assembly, run history) work from the records instead
+    of re-extracting and re-formatting strings.
+
+    Usage:
+        suite = TestSuite()
+        suite.sync(st.session_state.existing_tests)
+        suite.add(generated_test_case, origin="gpt-4o-mini")
+        matrix_df, raw_results = compute_test_coverage(code_to_test, suite.sources, test_names=suite.names)
+        suite.update_coverage(raw_results)
+        script = suite.script()
+    """
+
+    def __init__(self):
+        self._tests: Dict[str, SuiteTest] = {}  # by content hash, in suite order
+        self._next_id = 1
+        self._scripts: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._tests)
+
+    def __iter__(self) -> Iterator[SuiteTest]:
+        return iter(list(self._tests.values()))
+
+    def __contains__(self, test_hash: str) -> bool:
+        return test_hash in self._tests
+
+    @property
+    def records(self) -> List[TestRecord]:
+        return [test.record for test in self._tests.values()]
+
+    @property
+    def sources(self) -> List[str]:
+        return [test.source for test in self._tests.values()]
+
+    @property
+    def names(self) -> List[str]:
+        return [test.name for test in self._tests.values()]
+
+    def get(self, test_hash: str) -> Optional[SuiteTest]:
+        return self._tests.get(test_hash)
+
+    def _changed(self):
+        self._scripts = {}
+
+    def _insert(self, record: TestRecord, origin: str) -> Optional[SuiteTest]:
+        if record.hash in self._tests or any(test.name == record.name for test in self._tests.values()):
+            return None
+        test = SuiteTest(f"t{self._next_id}", record, origin)
+        self._next_id += 1
+        self._tests[record.hash] = test
+        self._changed()
+        return test
+
+    def add(self, code: str, origin: str = "user", origins: Optional[Dict[str, str]] = None) -> List[SuiteTest]:
+        """
+        Add the tests of a test function or script, tests already in the suite and tests whose name is taken are
+        skipped
+
+        `origins` maps test hashes to their origin (e.g. "origins" of a generation result), other tests get `origin`
+        """
+        origins = origins or {}
+        records = extract_test_records(code)
+        return [test for test in (self._insert(record, origins.get(record.hash, origin)) for record in records) if test]
+
+    def remove(self, test_hash: str):
+        if self._tests.pop(test_hash, None) is not None:
+            self._changed()
+
+    def sync(self, inputs: Iterable[str], origin: str = "user") -> "TestSuite":
+        """
+        Mirror test inputs (e.g. the text areas of the app): unchanged tests keep their id and metadata, new tests are
+        added with the origin, removed tests are dropped and the order follows the inputs (of tests with the same
+        name, the first one is kept)
+        """
+        records: Dict[str, TestRecord] = {}
+        names = set()
+        for record in (record for code in inputs if code.strip() for record in extract_test_records(code)):
+            if record.name not in names:
+                records.setdefault(record.hash, record)
+                names.add(record.name)
+        if list(records) == list(self._tests):
+            return self
+        for test_hash in [test_hash for test_hash in self._tests if test_hash not in records]:
+            del self._tests[test_hash]
+        for record in records.values():
+            self._insert(record, origin)
+        self._tests = {test_hash: self._tests[test_hash] for test_hash in records}
+        self._changed()
+        return self
+
+    def script(self, code_to_test_path: str = "code_to_test.py", format_script: bool = False) -> str:
+        """Assembled unittest script of the suite (cached until the suite changes, exports are not cached)"""
+        if format_script:
+            return assemble_test_script(code_to_test_path, self.sources, "", format_script=True)
+        if code_to_test_path not in self._scripts:
+            self._scripts[code_to_test_path] = assemble_test_script(code_to_test_path, self.sources, "")
+        return self._scripts[code_to_test_path]
+
+    def update_coverage(self, raw_results: Dict[str, Any], tests: Optional[List[SuiteTest]] = None):
+        """
+        Store the coverage column, outcome and duration of every test from a coverage analysis of `sources` (or of
+        the given tests, e.g. in prioritized order)
+        """
+        outcomes = raw_results.get("outcomes", [])
+        durations = raw_results.get("durations", [])
+        arcs = raw_results.get("arcs", [])
+        for i, test in enumerate(self._tests.values() if tests is None else tests):
+            if i >= len(raw_results.get("col_sums", [])):
+                break
+            test.covered_lines = frozenset(get_covered_lines(raw_results, i))
+            test.outcome = outcomes[i] if i < len(outcomes) else None
+            test.duration_s = durations[i] if i < len(durations) else None
+            test.covered_arcs = frozenset(map(tuple, arcs[i])) if i < len(arcs) else None
+
+    def coverage_results(self, code_to_test: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Coverage matrix and raw results of the whole suite from the stored columns, without running a test (every
+        test needs coverage data of `code_to_test`)
+        """
+        tests = list(self._tests.values())
+        if any(test.covered_lines is None for test in tests):
+            raise ValueError("Every test of the suite needs coverage data to assemble its coverage matrix")
+        return coverage_results(
+            code_to_test,
+            [set(test.covered_lines) for test in tests],
+            [test.outcome for test in tests],
+            [test.duration_s for test in tests],
+            [sorted(test.covered_arcs or ()) for test in tests],
+            [test.name for test in tests],
+        )
+
+    def prioritize(self, strategy: str = "additional_coverage") -> List[SuiteTest]:
+        """Tests in execution order by the coverage and durations of the last analysis (see `prioritize`)"""
+        tests = list(self._tests.values())
+        order = prioritize([test.covered_lines for test in tests], [test.duration_s for test in tests], strategy)
+        return [tests[i] for i in order]
+
+    def unique_lines(self) -> Dict[str, FrozenSet[int]]:
+        """Lines every test covers alone (no other test of the suite covers them) in the last analysis, by hash"""
+        tests = list(self._tests.values())
+        if any(test.covered_lines is None for test in tests):
+            raise ValueError("The coverage of the suite has to be analyzed before ranking its tests")
+        line_count = max((max(test.covered_lines, default=0) for test in tests), default=0)
+        unique = unique_coverage(line_bitsets([test.covered_lines for test in tests], line_count))
+        return {test.hash: frozenset(bitset_lines(row)) for test, row in zip(tests, unique)}
+
+    def minimize(self, include_arcs: bool = False, method: str = "auto") -> MinimizationResult:
+        """
+        Smallest subset of the tests that preserves the line (and arc) coverage of the last analysis, the indices of
+        the result refer to the suite order
+        """
+        tests = list(self._tests.values())
+        if any(test.covered_lines is None for test in tests):
+            raise ValueError("The coverage of the suite has to be analyzed before minimizing it")
+        coverage = [
+            {("line", line) for line in test.covered_lines}
+            | ({("arc", arc) for arc in test.covered_arcs or ()} if include_arcs else set())
+            for test in tests
+        ]
+        return minimize_suite(coverage, [test.duration_s for test in tests], method)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """JSON serializable tests with their metadata (for the run history)"""
+        return [
+            {
+                "id": test.id,
+                "name": test.name,
+                "hash": test.hash,
+                "source": test.source,
+                "origin": test.origin,
+                "covered_lines": sorted(test.covered_lines) if test.covered_lines is not None else None,
+                "covered_arcs": sorted(test.covered_arcs) if test.covered_arcs is not None else None,
+                "outcome": test.outcome,
+                "duration_s": test.duration_s,
+                "metadata": test.metadata,
+            }
+            for test in self._tests.values()
+        ]
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "TestSuite":
+        """Restore a suite saved with `to_records`"""
+        suite = cls()
+        for data in records:
+            for record in extract_test_records(data["source"]):
+                test = suite._insert(record, data.get("origin", "user"))
+                if test is None:
+                    continue
+                test.id = data.get("id", test.id)
+                test.covered_lines = frozenset(data["covered_lines"]) if data.get("covered_lines") is not None else None
+                if data.get("covered_arcs") is not None:
+                    test.covered_arcs = frozenset(map(tuple, data["covered_arcs"]))
+                test.outcome = data.get("outcome")
+                test.duration_s = data.get("duration_s")
+                test.metadata = data.get("metadata", {})
+        ids = [int(data["id"][1:]) for data in records if str(data.get("id", ""))[1:].isdigit()]
+        suite._next_id = max([suite._next_id, *(i + 1 for i in ids)])
+        return suite
@@ -0,0 +1,119 @@
+import copy
+import sys
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+# Edge from the previous line of the same frame (the first line of the code object on entry) to the current line
+Edge = Tuple[int, int]
+
+CODE_FILENAME = "<code_to_test>"
+# Line events a traced call may execute before it is aborted (inputs that never terminate would hang the caller)
+MAX_TRACED_LINES = 100000
+
+
+class ExecutionLimitExceeded(BaseException):
+    """
+    Raised into a traced call that executed more lines than its limit
+
+    Derives from BaseException, so the code under test cannot catch it with `except Exception`.
+    """
+
+
+@dataclass
+class TraceResult:
+    """Lines executed by a traced call and its outcome"""
+
+    lines: Set[int] = field(default_factory=set)
+    edges: Set[Edge] = field(default_factory=set)
+    result: Any = None
+    exception: Optional[BaseException] = None
+    timed_out: bool = False  # aborted after the line limit
+
+
+class LineTracer:
+    """
+    Lightweight line tracer (sys.settrace) recording the executed lines of code compiled with a given filename
+
+    Much cheaper than a coverage run for checking which lines a single input reaches. With `edges`, transitions
+    between consecutive lines of a frame are recorded, too (branch-sensitive feedback for fuzzing). With `max_lines`,
+    ExecutionLimitExceeded is raised into the traced code once it executed more lines.
+
+    Usage:
+        with LineTracer() as tracer:
+            function(*args)
+        tracer.lines
+    """
+
+    def __init__(self, filename: str = CODE_FILENAME, edges: bool = False, max_lines: Optional[int] = None):
+        self.filename = filename
+        self.max_lines = max_lines
+        self.line_count = 0
+        self.lines: Set[int] = set()
+        self.edges: Set[Edge] = set()
+        self.track_edges = edges
+        self._last_lines: Dict[int, int] = {}
+        self._previous: Optional[Callable] = None
+
+    def _trace(self, frame: FrameType, event: str, arg: Any) -> Optional[Callable]:
+        if frame.f_code.co_filename != self.filename:
+            return None
+        if event == "line":
+            self.line_count += 1
+            if self.max_lines is not None and self.line_count > self.max_lines:
+                raise ExecutionLimitExceeded(f"More than {self.max_lines} lines executed")
+            self.lines.add(frame.f_lineno)
+            if self.track_edges:
+                previous = self._last_lines.get(id(frame), frame.f_code.co_firstlineno)
+                self.edges.add((previous, frame.f_lineno))
+                self._last_lines[id(frame)] = frame.f_lineno
+        elif event == "return" and self.track_edges:
+            self._last_lines.pop(id(frame), None)
+        return self._trace
+
+    def __enter__(self) -> "LineTracer":
+        self._previous = sys.gettrace()
+        sys.settrace(self._trace)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.settrace(self._previous)
+
+
+def load_code(code: str, filename: str = CODE_FILENAME) -> Tuple[Dict[str, Any], Set[int]]:
+    """
+    Execute source code in a fresh namespace
+
+    Returns:
+        Tuple of (module namespace, lines executed at import time)
+    """
+    namespace: Dict[str, Any] = {"__name__": "code_to_test"}
+    with LineTracer(filename) as tracer:
+        exec(compile(code, filename, "exec"), namespace)
+    return namespace, tracer.lines
+
+
+def trace_call(
+    function: Callable,
+    args: Dict[str, Any],
+    filename: str = CODE_FILENAME,
+    edges: bool = False,
+    max_lines: Optional[int] = MAX_TRACED_LINES,
+) -> TraceResult:
+    """
+    Call a function with (deep copied) keyword arguments and record the lines (and edges) it executes
+
+    Calls executing more than `max_lines` lines are aborted and marked as timed out.
+    """
+    trace = TraceResult()
+    with LineTracer(filename, edges, max_lines) as tracer:
+        try:
+            trace.result = function(**copy.deepcopy(args))
+        except Exception as e:
+            trace.exception = e
+        except ExecutionLimitExceeded as e:
+            trace.exception = e
+            trace.timed_out = True
+    trace.lines = tracer.lines
+    trace.edges = tracer.edges
+    return trace
@@ -0,0 +1,20 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from core.fuzzer import Fuzzer  # noqa: E402
+
+# Negative inputs never reach 0
+COUNTDOWN = "def countdown(n: int) -> int:\n    steps = 0\n    while n != 0:\n        n -= 1\n        steps += 1\n    return steps\n"
+
+
+def test_non_terminating_inputs_time_out():
+    fuzzer = Fuzzer(COUNTDOWN)
+    start = time.perf_counter()
+    # Without target lines the fuzzer runs until its budget is used up or it stops finding new edges
+    stats = fuzzer.run(time_budget_s=1.0)
+    assert time.perf_counter() - start < 10
+    assert stats[0].timeouts > 0
+    assert all(not entry.trace.timed_out for entry in fuzzer.functions["countdown"].corpus)
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.metrics import compute_test_coverage, get_test_case_names  # noqa: E402
+from utils.test_suite import TestSuite as Suite  # noqa: E402
+
+CODE_TO_TEST = "def sign(x):\n    if x > 0:\n        return 1\n    return -1\n"
+
+TESTS = '''
+@unittest.skipIf(False, "never skipped")
+def test_pos(self):
+    self.assertEqual(sign(1), 1)
+
+async def test_async(self):
+    self.assertEqual(sign(0), -1)
+
+def test_neg(self):
+    self.assertEqual(sign(-1), -1)
+'''
+
+
+def test_decorated_and_async_tests_keep_their_coverage_column():
+    suite = Suite()
+    suite.add(TESTS)
+    assert get_test_case_names(suite.sources) == ["test_pos", "test_async", "test_neg"]
+
+    _, raw_results = compute_test_coverage(CODE_TO_TEST, suite.sources, test_names=suite.names)
+    suite.update_coverage(raw_results)
+
+    assert raw_results["test_names"] == ["test_pos", "test_async", "test_neg"]
+    pos, async_test, neg = suite
+    assert pos.covered_lines == {1, 2, 3}
+    assert neg.covered_lines == {1, 2, 4}
+    # The coroutine of an async method is not awaited by unittest.TestCase, only the module lines run
+    assert async_test.covered_lines == {1}
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.metrics import compute_test_coverage  # noqa: E402
+from utils.test_suite import TestSuite as Suite  # noqa: E402
+
+CODE_TO_TEST = "def f(x):\n    if x > 0:\n        return 1\n    return -1\n"
+
+FIRST = "def test_f(self):\n    self.assertEqual(f(1), 1)\n"
+SECOND = "def test_f(self):\n    self.assertEqual(f(-1), -1)\n"
+
+
+def test_tests_with_a_taken_name_are_not_added():
+    suite = Suite()
+    suite.add(FIRST)
+    assert suite.add(SECOND) == []
+    assert suite.names == ["test_f"]
+
+    _, raw_results = compute_test_coverage(CODE_TO_TEST, suite.sources, test_names=suite.names)
+    suite.update_coverage(raw_results)
+    (test,) = suite
+    assert test.covered_lines == {1, 2, 3}
+    assert raw_results["line_coverage"] == 0.75
+
+
+def test_sync_keeps_the_first_test_of_a_name():
+    suite = Suite().sync([FIRST, SECOND])
+    assert [test.source for test in suite] == [FIRST.rstrip("\n")]
+    assert suite.sync([SECOND]).sources == [SECOND.rstrip("\n")]